@@ -0,0 +1,140 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import json
+import threading
+
+# Cloudify Imports
+from cloudify_aws import constants, tracing
+from cloudify import ctx
+
+# Budget keys that limit the totals of an operation rather than the calls
+# to one API.
+CALLS = 'calls'
+WALL_TIME = 'wall_time'
+
+
+class OperationCollector(object):
+    """Collects the trace summaries of the operations that run while it is
+    entered, by node template and operation, adding up the runs of an
+    operation that was retried.
+
+    Relationship operations are kept under 'source -> target'.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        tracing.listeners.append(self)
+        return self
+
+    def __exit__(self, *_):
+        tracing.listeners.remove(self)
+
+    def __call__(self, operation_name, summary):
+        node = self.node_key()
+        operation = operation_name.split('.').pop()
+        with self._lock:
+            result = self.results.setdefault(node, {}).setdefault(
+                operation, {'runs': 0, CALLS: 0, WALL_TIME: 0.0,
+                            'aws_time': 0.0, 'retries': 0, 'apis': {}})
+            result['runs'] += 1
+            for field in (CALLS, WALL_TIME, 'aws_time', 'retries'):
+                result[field] += summary[field]
+            for api, stats in summary['apis'].items():
+                result['apis'][api] = \
+                    result['apis'].get(api, 0) + stats['calls']
+
+    @staticmethod
+    def node_key():
+        if ctx.type == constants.RELATIONSHIP_INSTANCE:
+            return '{0} -> {1}'.format(ctx.source.node.id, ctx.target.node.id)
+        return ctx.node.id
+
+
+def load_budgets(path):
+    with open(path) as budgets_file:
+        return json.load(budgets_file)
+
+
+def record_budgets(path, results):
+    """Writes the API calls of every operation in results as its budget.
+    Wall time depends on the host, so it is only budgeted by hand.
+    """
+
+    budgets = dict(
+        (node, dict(
+            (operation, dict(result['apis'], calls=result[CALLS]))
+            for operation, result in operations.items()))
+        for node, operations in results.items())
+    with open(path, 'w') as budgets_file:
+        json.dump(budgets, budgets_file, indent=2, sort_keys=True,
+                  separators=(',', ': '))
+        budgets_file.write('\n')
+
+
+def over_budget(results, budgets):
+    """Compares the results of a run with the budgets, that hold the
+    maximal calls per API of an operation, and optionally its total calls
+    and wall time. APIs without a budget are not checked, but every
+    operation that ran must have a budget, so that new node types and
+    relationships are not left out of the benchmark.
+
+    :returns a message for every budget that was exceeded, and for every
+        operation that has none.
+    """
+
+    messages = []
+    for node, operations in sorted(results.items()):
+        for operation in sorted(operations):
+            if operation not in budgets.get(node, {}):
+                messages.append(
+                    '{0} {1} has no budget.'.format(node, operation))
+    for node, operations in sorted(budgets.items()):
+        for operation, budget in sorted(operations.items()):
+            result = results.get(node, {}).get(operation)
+            if result is None:
+                messages.append(
+                    '{0} {1} did not run.'.format(node, operation))
+                continue
+            for key, limit in sorted(budget.items()):
+                if key in (CALLS, WALL_TIME):
+                    value = result[key]
+                else:
+                    value = result['apis'].get(key, 0)
+                if value > limit:
+                    messages.append(
+                        '{0} {1}: {2} {3}, the budget is {4}.'
+                        .format(node, operation, value, key, limit))
+    return messages
+
+
+def format_results(results):
+    lines = []
+    for node, operations in sorted(results.items()):
+        for operation, result in sorted(operations.items()):
+            lines.append(
+                '{0} {1}: {2} calls in {3} runs, {4:.3f}s, '
+                '{5:.3f}s waiting on AWS, {6} retries{7}'.format(
+                    node, operation, result[CALLS], result['runs'],
+                    result[WALL_TIME], result['aws_time'],
+                    result['retries'],
+                    ''.join(', {0} x{1}'.format(api, calls)
+                            for api, calls in sorted(
+                                result['apis'].items()))))
+    return '\n'.join(lines)
@@ -0,0 +1,385 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Runs the lifecycle operations of many synthetic node instances at the
+same time, across a pool of processes with threads in each, against a
+local stand-in for AWS, and reports the latency of the operations, the
+AWS API calls per second and the retries.
+
+    python -m benchmarks.scale --node-type instance --instances 1000 \\
+        --processes 16 --threads 8 --latency 0.05 --throttle-rate 0.02 \\
+        --aws-config '{"describe_rate_limit": 20}'
+
+Faults that the stand-in injects, such as per-API latency distributions,
+are given with --faults, as JSON of the arguments of StandIn:
+
+    python -m benchmarks.scale --seed 7 --faults '{
+        "latency": {"default": 0.02, "RunInstances":
+                    {"distribution": "lognormal", "median": 0.5,
+                     "sigma": 0.4}},
+        "throttle_rate": {"default": 0.01, "DescribeInstances": 0.05},
+        "error_rate": 0.005, "not_found_window": 2}'
+"""
+
+# Built-in Imports
+import argparse
+import json
+import math
+import threading
+import time
+import uuid
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+# Cloudify Imports
+from benchmarks.standin import REQUESTS, StandIn
+from cloudify_aws import constants, tracing
+from cloudify_aws.ec2 import ebs, instance
+from cloudify import ctx
+from cloudify.mocks import MockCloudifyContext
+from cloudify.state import current_ctx
+from cloudify.exceptions import NonRecoverableError, RecoverableError
+
+LIFECYCLE = 'cloudify.interfaces.lifecycle.{0}'
+PERCENTILES = (50, 95, 99)
+
+# The node types that the harness can run, with the properties of their
+# node template, as in the unit tests of each type, and the inputs of
+# their operations, as in plugin.yaml.
+NODE_TYPES = {
+    'instance': {
+        'module': instance,
+        'operations': ['create', 'start', 'stop', 'delete'],
+        'type_hierarchy': ['cloudify.nodes.Root', 'cloudify.nodes.Compute',
+                           constants.INSTANCE['CLOUDIFY_NODE_TYPE']],
+        'properties': {
+            'image_id': 'ami-e214778a',
+            'instance_type': 't1.micro',
+            'name': '',
+            'tags': {},
+            'cloudify_agent': {},
+            'agent_config': {},
+            'use_password': False,
+            'parameters': {}
+        },
+        'inputs': {
+            'start': {'start_retry_interval': 30, 'private_key_path': ''}
+        }
+    },
+    'volume': {
+        'module': ebs,
+        'operations': ['create', 'start', 'delete'],
+        'type_hierarchy': ['cloudify.nodes.Root', 'cloudify.nodes.Volume',
+                           constants.EBS['CLOUDIFY_NODE_TYPE']],
+        'properties': {
+            'size': '1',
+            'zone': 'us-east-1b',
+            'device': '/dev/xvdf',
+            'tags': {}
+        },
+        'inputs': {
+            'create': {'args': {}},
+            'delete': {'args': {}}
+        }
+    }
+}
+
+# Set in each worker process by _init_worker.
+_settings = {}
+_traces = {}
+_traces_lock = threading.Lock()
+
+
+def mock_context(node_type, node_instance_id, deployment_id,
+                 runtime_properties, operation, retry_number):
+    """Creates the context of one run of an operation of a synthetic node
+    instance, like the mock contexts of the unit tests.
+    """
+
+    node = NODE_TYPES[node_type]
+    properties = dict(node['properties'],
+                      use_external_resource=False,
+                      resource_id='')
+    properties.update(_settings['properties'])
+    properties[constants.AWS_CONFIG_PROPERTY] = _settings['aws_config']
+
+    context = MockCloudifyContext(
+        node_id=node_instance_id,
+        node_name=node_type,
+        deployment_id=deployment_id,
+        properties=properties,
+        runtime_properties=runtime_properties,
+        operation={'name': LIFECYCLE.format(operation),
+                   'retry_number': retry_number},
+        provider_context={'resources': {}}
+    )
+    context.node.type_hierarchy = node['type_hierarchy']
+    return context
+
+
+def _record_trace(operation_name, summary):
+    """A tracing listener that adds up the calls of the runs of each
+    operation of each node instance in this process.
+    """
+
+    key = (ctx.instance.id, operation_name)
+    with _traces_lock:
+        totals = _traces.setdefault(
+            key, {'calls': 0, 'retries': 0, 'throttled': 0})
+        totals['calls'] += summary['calls']
+        totals['retries'] += summary['retries']
+        totals['throttled'] += sum(
+            count for stats in summary['apis'].values()
+            for code, count in stats['errors'].items()
+            if code in constants.THROTTLING_ERROR_CODES)
+
+
+def _init_worker(settings):
+    _settings.update(settings)
+    tracing.listeners.append(_record_trace)
+
+
+def run_operation(node_type, node_instance_id, deployment_id,
+                  runtime_properties, operation):
+    """Runs an operation of a node instance until it succeeds, retrying
+    it after the interval that it asks for, like a workflow would.
+
+    :returns a dict with the seconds the operation took, the number of
+        times it was retried, and the error that it failed with, if any.
+    """
+
+    function = getattr(NODE_TYPES[node_type]['module'], operation)
+    inputs = NODE_TYPES[node_type]['inputs'].get(operation, {})
+    started = time.time()
+    error = None
+    retry_number = 0
+
+    while True:
+        context = mock_context(node_type, node_instance_id, deployment_id,
+                               runtime_properties, operation, retry_number)
+        current_ctx.set(context)
+        try:
+            function(ctx=context, **inputs)
+            break
+        except RecoverableError as e:
+            if retry_number >= _settings['max_retries']:
+                error = str(e)
+                break
+            retry_number += 1
+            time.sleep(min(e.retry_after or _settings['retry_interval'],
+                           _settings['retry_interval']))
+        except NonRecoverableError as e:
+            error = str(e)
+            break
+        finally:
+            current_ctx.clear()
+            # MockCloudifyContext does not keep an empty dict of runtime
+            # properties, so they are copied back for the next operation.
+            properties = dict(context.instance.runtime_properties)
+            runtime_properties.clear()
+            runtime_properties.update(properties)
+
+    return {'time': time.time() - started,
+            'operation_retries': retry_number,
+            'error': error}
+
+
+def run_node_instance(arguments):
+    """Runs the lifecycle of a synthetic node instance, stopping at the
+    first operation that fails.
+    """
+
+    node_type, index, deployment_id = arguments
+    node_instance_id = '{0}_{1}'.format(node_type, index)
+    runtime_properties = {}
+    results = []
+
+    for operation in NODE_TYPES[node_type]['operations']:
+        result = run_operation(node_type, node_instance_id, deployment_id,
+                               runtime_properties, operation)
+        with _traces_lock:
+            result.update(_traces.pop(
+                (node_instance_id, LIFECYCLE.format(operation)), {}))
+        result['operation'] = operation
+        results.append(result)
+        if result['error']:
+            break
+
+    return results
+
+
+def run_batch(batch):
+    """Runs a batch of node instances in threads of a worker process.
+    """
+
+    pool = ThreadPool(_settings['threads'])
+    try:
+        return [result for results in pool.map(run_node_instance, batch)
+                for result in results]
+    finally:
+        pool.close()
+        pool.join()
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = int(math.ceil(percent / 100.0 * len(sorted_values))) - 1
+    return sorted_values[max(0, min(index, len(sorted_values) - 1))]
+
+
+def summarize(results, wall_time):
+    operations = {}
+    for result in results:
+        operations.setdefault(result['operation'], []).append(result)
+
+    summary = {
+        'wall_time': round(wall_time, 3),
+        'calls': sum(result.get('calls', 0) for result in results),
+        'operations': {}
+    }
+    summary['calls_per_second'] = \
+        round(summary['calls'] / wall_time, 1) if wall_time else None
+
+    for operation, operation_results in operations.items():
+        times = sorted(result['time'] for result in operation_results)
+        operation_summary = {
+            'count': len(operation_results),
+            'failed': sum(1 for result in operation_results
+                          if result['error']),
+            'calls': sum(result.get('calls', 0)
+                         for result in operation_results),
+            'retries': sum(result.get('retries', 0)
+                           for result in operation_results),
+            'throttled': sum(result.get('throttled', 0)
+                             for result in operation_results),
+            'operation_retries': sum(result['operation_retries']
+                                     for result in operation_results)
+        }
+        for percent in PERCENTILES:
+            operation_summary['p{0}'.format(percent)] = \
+                round(percentile(times, percent), 3)
+        summary['operations'][operation] = operation_summary
+    return summary
+
+
+def format_summary(summary, node_type):
+    lines = ['{0} API calls in {1:.1f}s, {2} calls per second.'.format(
+        summary['calls'], summary['wall_time'], summary['calls_per_second'])]
+    injected = dict((kind, sum(counts.values()))
+                    for kind, counts in summary.get('standin', {}).items()
+                    if kind != REQUESTS)
+    if injected:
+        lines.append('Injected by the stand-in: {0}.'.format(', '.join(
+            '{0} {1}'.format(count, kind)
+            for kind, count in sorted(injected.items()))))
+    for operation in NODE_TYPES[node_type]['operations']:
+        result = summary['operations'].get(operation)
+        if result is None:
+            continue
+        lines.append(
+            '{0}: {1} runs, {2} failed, p50 {3}s, p95 {4}s, p99 {5}s, '
+            '{6} calls, {7} throttled, {8} API retries, '
+            '{9} operation retries'.format(
+                operation, result['count'], result['failed'],
+                result['p50'], result['p95'], result['p99'],
+                result['calls'], result['throttled'], result['retries'],
+                result['operation_retries']))
+    return '\n'.join(lines)
+
+
+def run(node_type='instance', instances=100, processes=4, threads=8,
+        latency=0, throttle_rate=0, seed=None, aws_config=None,
+        properties=None, max_retries=60, retry_interval=5, faults=None):
+    """Runs the lifecycle of node instances of node_type against a
+    stand-in and returns the summary of their operations.
+
+    :param faults: A dict of more arguments of StandIn, such as
+        error_rate and not_found_window. They override latency and
+        throttle_rate.
+    """
+
+    standin_arguments = dict(latency=latency, throttle_rate=throttle_rate,
+                             seed=seed)
+    standin_arguments.update(faults or {})
+
+    with StandIn.from_config(standin_arguments) as standin:
+        settings = {
+            'aws_config': dict(standin.aws_config(), **(aws_config or {})),
+            'properties': properties or {},
+            'threads': threads,
+            'max_retries': max_retries,
+            'retry_interval': retry_interval
+        }
+        deployment_id = 'scale-{0}'.format(uuid.uuid4())
+        node_instances = [(node_type, index, deployment_id)
+                          for index in range(instances)]
+        batches = [node_instances[index::processes]
+                   for index in range(processes)]
+
+        pool = Pool(processes, _init_worker, (settings,))
+        started = time.time()
+        try:
+            results = [result for batch_results in
+                       pool.map(run_batch, [b for b in batches if b])
+                       for result in batch_results]
+        finally:
+            pool.close()
+            pool.join()
+        summary = summarize(results, time.time() - started)
+        summary['standin'] = standin.stats()
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--node-type', choices=sorted(NODE_TYPES),
+                        default='instance')
+    parser.add_argument('--instances', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='Node instances run at a time per process.')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds added to every AWS API request.')
+    parser.add_argument('--throttle-rate', type=float, default=0,
+                        help='Fraction of requests that are throttled.')
+    parser.add_argument('--faults', type=json.loads, default={},
+                        help='JSON of more StandIn arguments, such as '
+                             'error_rate, not_found_window or per-API '
+                             'latency distributions.')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--aws-config', type=json.loads, default={},
+                        help='JSON of aws_config keys, such as rate limits.')
+    parser.add_argument('--properties', type=json.loads, default={},
+                        help='JSON of node properties.')
+    parser.add_argument('--max-retries', type=int, default=60)
+    parser.add_argument('--retry-interval', type=float, default=5,
+                        help='Longest wait before an operation is retried.')
+    parser.add_argument('--output', help='Write the summary as JSON.')
+    options = parser.parse_args()
+
+    summary = run(options.node_type, options.instances, options.processes,
+                  options.threads, options.latency, options.throttle_rate,
+                  options.seed, options.aws_config, options.properties,
+                  options.max_retries, options.retry_interval,
+                  options.faults)
+    print(format_summary(summary, options.node_type))
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(summary, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import json
+import random
+import re
+import threading
+import time
+import urlparse
+from StringIO import StringIO
+
+# Third Party Imports
+from moto.backends import BACKENDS
+from moto.server import create_backend_app
+from werkzeug.serving import make_server
+
+# Both APIs are served on one port, because aws_config has one port for
+# all of the clients. Requests are sent to each API by the host name.
+EC2_HOST = '127.0.0.1'
+ELB_HOST = 'localhost'
+REGION = 'us-east-1'
+
+# The host names that moto is given for each API. moto takes the region
+# from the host name, or else from the signature, where boto puts a
+# region that it guessed from the IP address.
+AWS_HOSTS = {
+    EC2_HOST: 'ec2.{0}.amazonaws.com'.format(REGION),
+    ELB_HOST: 'elasticloadbalancing.{0}.amazonaws.com'.format(REGION)
+}
+
+REQUESTS = 'requests'
+THROTTLED = 'throttled'
+ERROR = 'error'
+NOT_FOUND = 'not_found'
+
+# The status and error code of each fault, by API.
+FAULT_ERRORS = {
+    EC2_HOST: {
+        THROTTLED: ('503 Service Unavailable', 'RequestLimitExceeded'),
+        ERROR: ('500 Internal Server Error', 'InternalError')
+    },
+    ELB_HOST: {
+        THROTTLED: ('400 Bad Request', 'Throttling'),
+        ERROR: ('503 Service Unavailable', 'ServiceUnavailable')
+    }
+}
+NOT_FOUND_STATUS = '400 Bad Request'
+
+EC2_ERROR = \
+    '<Response><Errors><Error><Code>{0}</Code>' \
+    '<Message>{1}</Message></Error></Errors>' \
+    '<RequestID>standin</RequestID></Response>'
+ELB_ERROR = \
+    '<ErrorResponse><Error><Type>Sender</Type><Code>{0}</Code>' \
+    '<Message>{1}</Message></Error>' \
+    '<RequestId>standin</RequestId></ErrorResponse>'
+
+# The NotFound error code of each EC2 resource ID prefix.
+NOT_FOUND_CODES = {
+    'i': 'InvalidInstanceID.NotFound',
+    'vol': 'InvalidVolume.NotFound',
+    'sg': 'InvalidGroup.NotFound',
+    'eni': 'InvalidNetworkInterfaceID.NotFound',
+    'eipalloc': 'InvalidAllocationID.NotFound',
+    'vpc': 'InvalidVpcID.NotFound',
+    'subnet': 'InvalidSubnetID.NotFound',
+    'igw': 'InvalidInternetGatewayID.NotFound',
+    'vgw': 'InvalidVpnGatewayID.NotFound',
+    'cgw': 'InvalidCustomerGatewayID.NotFound',
+    'acl': 'InvalidNetworkAclID.NotFound',
+    'dopt': 'InvalidDhcpOptionID.NotFound',
+    'rtb': 'InvalidRouteTableID.NotFound',
+    'pcx': 'InvalidVpcPeeringConnectionID.NotFound',
+    'vpn': 'InvalidVpnConnectionID.NotFound'
+}
+RESOURCE_ID_PATTERN = re.compile(
+    r'\b((?:{0})-[0-9a-f]{{8,17}})\b'.format(
+        '|'.join(sorted(NOT_FOUND_CODES, key=len, reverse=True))))
+CREATE_ACTIONS = re.compile('^(Create|RunInstances$|AllocateAddress$)')
+
+DEFAULT = 'default'
+
+
+def sample_latency(spec, rng):
+    """Returns the seconds to delay a request by a latency spec, that is
+    either a number of seconds or a dict with a distribution:
+    - {"distribution": "uniform", "min": 0.02, "max": 0.2}
+    - {"distribution": "lognormal", "median": 0.05, "sigma": 0.5}
+    - {"distribution": "exponential", "mean": 0.05}
+    """
+
+    if not spec:
+        return 0
+    if not isinstance(spec, dict):
+        return float(spec)
+    distribution = spec.get('distribution')
+    if distribution == 'uniform':
+        return rng.uniform(spec['min'], spec['max'])
+    elif distribution == 'lognormal':
+        return rng.lognormvariate(0, spec['sigma']) * spec['median']
+    elif distribution == 'exponential':
+        return rng.expovariate(1.0 / spec['mean'])
+    raise ValueError('Unknown latency distribution {0}.'.format(spec))
+
+
+def per_api(setting, action):
+    """Returns the value of a setting for an API. A setting is either one
+    value for all of the APIs, or a dict of values by API name, with the
+    value of the other APIs under "default".
+    """
+
+    if isinstance(setting, dict) and 'distribution' not in setting:
+        return setting.get(action, setting.get(DEFAULT))
+    return setting
+
+
+class StandIn(object):
+    """A local stand-in for the EC2 and ELB APIs, that serves moto's
+    backends over HTTP, so that the worker processes of a benchmark share
+    its resources, and that behaves like AWS under load:
+
+    - Requests are delayed by a latency distribution.
+    - A fraction of the requests are throttled.
+    - A fraction of the requests fail with a 5xx error.
+    - Requests that refer to a resource created less than
+      not_found_window seconds before fail with its NotFound error, like
+      AWS does until it is eventually consistent.
+
+    Every setting but not_found_window may be given per API, such as
+    {"default": 0.01, "DescribeInstances": 0.1}. With a seed, the faults
+    of a run that sends its requests in the same order are repeated.
+    """
+
+    def __init__(self, latency=0, throttle_rate=0, error_rate=0,
+                 not_found_window=0, seed=None, port=0):
+        """
+        :param latency: The seconds that every request is delayed, or a
+            latency distribution. See sample_latency.
+        :param throttle_rate: The fraction of the requests, such as 0.05,
+            that are throttled.
+        :param error_rate: The fraction of the requests that fail with a
+            5xx error.
+        :param not_found_window: The seconds after a resource is created
+            for which it is not found.
+        :param seed: A seed for the faults, to repeat a run.
+        :param port: The port to serve on. Defaults to a free port.
+        """
+
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.not_found_window = not_found_window
+        self.port = port
+        # moto keeps its resources in module globals, so each stand-in
+        # starts from empty backends.
+        for service in ('ec2', 'elb'):
+            for backend in BACKENDS[service].values():
+                backend.reset()
+        self.apps = {
+            EC2_HOST: create_backend_app('ec2'),
+            ELB_HOST: create_backend_app('elb')
+        }
+        self._random = random.Random(seed)
+        self._created = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a stand-in from a dict or a JSON file of the arguments
+        of StandIn, so that the faults of an experiment can be kept with
+        its results.
+        """
+
+        if not isinstance(config, dict):
+            with open(config) as config_file:
+                config = json.load(config_file)
+        return cls(**config)
+
+    def __call__(self, environ, start_response):
+        host = environ.get('HTTP_HOST', EC2_HOST).split(':')[0]
+        if host not in self.apps:
+            host = EC2_HOST
+        params = self._read_params(environ)
+        action = params.get('Action', '')
+
+        with self._lock:
+            delay = sample_latency(per_api(self.latency, action),
+                                   self._random)
+            fault = self._draw_fault(action)
+            if fault is not None:
+                fault = (fault,) + FAULT_ERRORS[host][fault]
+            elif host == EC2_HOST:
+                code = self._not_found_code(params)
+                if code:
+                    fault = NOT_FOUND, NOT_FOUND_STATUS, code
+            self._count(fault[0] if fault else REQUESTS, action)
+
+        if delay:
+            time.sleep(delay)
+        if fault is not None:
+            _, status, code = fault
+            return self._error(start_response, host, status, code)
+
+        environ['HTTP_HOST'] = AWS_HOSTS[host]
+        response = self.apps[host](environ, start_response)
+        if host != EC2_HOST or not self.not_found_window or \
+                not CREATE_ACTIONS.match(action):
+            return response
+
+        body = ''.join(response)
+        created = time.time()
+        with self._lock:
+            for resource_id in RESOURCE_ID_PATTERN.findall(body):
+                self._created[resource_id] = created
+        return [body]
+
+    def _draw_fault(self, action):
+        for kind, rate in ((THROTTLED, self.throttle_rate),
+                           (ERROR, self.error_rate)):
+            rate = per_api(rate, action)
+            if rate and self._random.random() < rate:
+                return kind
+        return None
+
+    def _not_found_code(self, params):
+        if not self.not_found_window or \
+                CREATE_ACTIONS.match(params.get('Action', '')):
+            return None
+        now = time.time()
+        for value in params.values():
+            created = self._created.get(value)
+            if created is not None and \
+                    now - created < self.not_found_window:
+                return NOT_FOUND_CODES[value.split('-')[0]]
+        return None
+
+    def _count(self, kind, action):
+        counts = self._counts.setdefault(kind, {})
+        counts[action] = counts.get(action, 0) + 1
+
+    @staticmethod
+    def _read_params(environ):
+        """Reads the query and form parameters of a request, and puts the
+        body back for moto.
+        """
+
+        body = environ['wsgi.input'].read(
+            int(environ.get('CONTENT_LENGTH') or 0))
+        environ['wsgi.input'] = StringIO(body)
+        params = dict(urlparse.parse_qsl(environ.get('QUERY_STRING', '')))
+        params.update(urlparse.parse_qsl(body))
+        return params
+
+    @staticmethod
+    def _error(start_response, host, status, code):
+        template = ELB_ERROR if host == ELB_HOST else EC2_ERROR
+        start_response(status, [('Content-Type', 'text/xml')])
+        return [template.format(code, 'Injected by the stand-in.')]
+
+    def stats(self):
+        """Returns the number of requests that were served and of each
+        fault that was injected, by API.
+        """
+
+        with self._lock:
+            return dict((kind, dict(counts))
+                        for kind, counts in self._counts.items())
+
+    def start(self):
+        self._server = make_server(EC2_HOST, self.port, self, threaded=True)
+        self.port = self._server.server_port
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def aws_config(self):
+        """Returns the aws_config that points the plugin's EC2, VPC and ELB
+        clients at the stand-in.
+        """
+
+        return {
+            'aws_access_key_id': 'standin',
+            'aws_secret_access_key': 'standin',
+            'ec2_region_name': REGION,
+            'ec2_region_endpoint': EC2_HOST,
+            'elb_region_name': REGION,
+            'elb_region_endpoint': ELB_HOST,
+            'port': self.port,
+            'is_secure': False
+        }
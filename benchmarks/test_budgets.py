@@ -0,0 +1,49 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import testtools
+
+# Cloudify Imports
+from benchmarks import budgets
+
+
+def result(calls, **apis):
+    return {'runs': 1, budgets.CALLS: calls, budgets.WALL_TIME: 0.1,
+            'aws_time': 0.1, 'retries': 0, 'apis': apis}
+
+
+class TestBudgets(testtools.TestCase):
+
+    def test_over_budget(self):
+        """ Tests that exceeded budgets, operations that did not run
+            and operations without a budget are all reported.
+        """
+        results = {
+            'volume': {'create': result(3, CreateVolume=1,
+                                        DescribeVolumes=2),
+                       'start': result(1, DescribeVolumes=1)},
+            'volume -> instance': {'establish': result(1, AttachVolume=1)}
+        }
+        limits = {
+            'volume': {'create': {'DescribeVolumes': 1, 'calls': 3},
+                       'delete': {'calls': 2}},
+            'volume -> instance': {'establish': {'calls': 1}}
+        }
+        self.assertEqual(
+            ['volume start has no budget.',
+             'volume create: 2 DescribeVolumes, the budget is 1.',
+             'volume delete did not run.'],
+            budgets.over_budget(results, limits))
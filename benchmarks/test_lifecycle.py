@@ -0,0 +1,92 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import os
+import tempfile
+import testtools
+
+# Third Party Imports
+import mock
+from moto import mock_ec2, mock_elb
+
+# Cloudify Imports
+from benchmarks import budgets
+from cloudify.workflows import local
+
+BLUEPRINT_PATH = os.path.join(
+    os.path.dirname(__file__), 'blueprint', 'blueprint.yaml')
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'budgets.json')
+
+# Set to rewrite budgets.json with the calls of this run instead of
+# checking them, after a change that is meant to change them.
+RECORD_BUDGETS_ENV_VAR = 'BENCHMARK_RECORD_BUDGETS'
+
+IGNORED_LOCAL_WORKFLOW_MODULES = (
+    'worker_installer.tasks',
+    'plugin_installer.tasks',
+    'cloudify_agent.operations',
+    'cloudify_agent.installer.operations',
+)
+
+
+class TestLifecycleBudgets(testtools.TestCase):
+
+    def execute(self, cfy_local, workflow_name):
+        cfy_local.execute(workflow_name,
+                          task_retries=10,
+                          task_retry_interval=0)
+
+    # The same operations as in the VPC workflow test are replaced,
+    # because moto does not implement their API calls.
+    @mock_ec2
+    @mock_elb
+    @mock.patch('cloudify_aws.vpc.dhcp.delete_dhcp_options',
+                return_value=True)
+    @mock.patch('cloudify_aws.vpc.dhcp.restore_dhcp_options')
+    @mock.patch('cloudify_aws.vpc.gateway.delete_customer_gateway',
+                return_value=True)
+    @mock.patch('cloudify_aws.vpc.gateway.delete_vpn_gateway',
+                return_value=True)
+    @mock.patch('cloudify_aws.vpc.networkacl.delete_network_acl',
+                return_value=True)
+    @mock.patch('cloudify_aws.vpc.gateway.CustomerGateway.get_resource_state',
+                return_value='available')
+    def test_install_uninstall(self, *_):
+        """ Runs install and uninstall of a node template of every
+            node type against moto, and checks the AWS API calls of
+            every operation against budgets.json.
+        """
+
+        cfy_local = local.init_env(
+            BLUEPRINT_PATH,
+            name=self._testMethodName,
+            inputs={'private_key_path': os.path.join(
+                tempfile.mkdtemp(), 'benchmark.pem')},
+            ignored_modules=IGNORED_LOCAL_WORKFLOW_MODULES)
+
+        with budgets.OperationCollector() as collector:
+            self.execute(cfy_local, 'install')
+            self.execute(cfy_local, 'uninstall')
+
+        print(budgets.format_results(collector.results))
+
+        if os.environ.get(RECORD_BUDGETS_ENV_VAR):
+            budgets.record_budgets(BUDGETS_PATH, collector.results)
+            return
+
+        exceeded = budgets.over_budget(
+            collector.results, budgets.load_budgets(BUDGETS_PATH))
+        self.assertEqual([], exceeded, '\n'.join(exceeded))
@@ -0,0 +1,58 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import testtools
+
+# Cloudify Imports
+from benchmarks import scale, standin
+
+
+class TestScale(testtools.TestCase):
+
+    def test_percentile(self):
+        """ Tests the nearest-rank percentiles of the report.
+        """
+        values = range(1, 101)
+        self.assertEqual(50, scale.percentile(values, 50))
+        self.assertEqual(99, scale.percentile(values, 99))
+        self.assertEqual(7, scale.percentile([7], 95))
+        self.assertIsNone(scale.percentile([], 50))
+
+    def test_run(self):
+        """ Tests that the lifecycle of a few volumes runs across
+            processes against the stand-in, with throttled requests
+            retried.
+        """
+        summary = scale.run('volume', instances=4, processes=2, threads=2,
+                            throttle_rate=0.5, seed=1,
+                            aws_config={'retry_base_delay': 0.01,
+                                        'retry_max_delay': 0.05,
+                                        'retry_max_attempts': 30},
+                            retry_interval=0.1)
+        self.assertEqual(['create', 'delete', 'start'],
+                         sorted(summary['operations']))
+        for operation in summary['operations'].values():
+            self.assertEqual(4, operation['count'])
+            self.assertEqual(0, operation['failed'])
+        self.assertGreater(summary['calls'], 0)
+        # boto does not retry the stand-in's 503s on pooled connections,
+        # so every throttled request is retried and counted by the plugin.
+        throttled = sum(summary['standin'][standin.THROTTLED].values())
+        self.assertGreater(throttled, 0)
+        self.assertEqual(
+            throttled,
+            sum(operation['throttled']
+                for operation in summary['operations'].values()))
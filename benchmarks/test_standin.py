@@ -0,0 +1,159 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import random
+import re
+import time
+import testtools
+from cloudify.state import current_ctx
+
+# Third Party Imports
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+# Cloudify Imports
+from benchmarks import standin
+from cloudify_aws import constants, connection
+from cloudify.mocks import MockCloudifyContext
+
+
+class TestStandIn(testtools.TestCase):
+
+    def request(self, app, host=standin.EC2_HOST, **params):
+        client = Client(app, Response)
+        return client.post('/', base_url='http://{0}/'.format(host),
+                           data=params)
+
+    def create_volume(self, app):
+        response = self.request(app, Action='CreateVolume', Size='1',
+                                AvailabilityZone='us-east-1b')
+        self.assertEqual(200, response.status_code)
+        return re.search('<volumeId>(.+?)</volumeId>',
+                         response.data).group(1)
+
+    def test_sample_latency(self):
+        """ Tests the latency of a fixed delay and of
+            each distribution.
+        """
+        rng = random.Random(1)
+        self.assertEqual(0, standin.sample_latency(None, rng))
+        self.assertEqual(0.5, standin.sample_latency(0.5, rng))
+        delay = standin.sample_latency(
+            {'distribution': 'uniform', 'min': 0.1, 'max': 0.2}, rng)
+        self.assertTrue(0.1 <= delay <= 0.2)
+        self.assertGreater(standin.sample_latency(
+            {'distribution': 'lognormal', 'median': 0.1, 'sigma': 0.5},
+            rng), 0)
+        self.assertGreater(standin.sample_latency(
+            {'distribution': 'exponential', 'mean': 0.1}, rng), 0)
+        self.assertRaises(ValueError, standin.sample_latency,
+                          {'distribution': 'pareto'}, rng)
+
+    def test_per_api(self):
+        """ Tests that a setting applies to every API or
+            to the APIs that it names.
+        """
+        latency = {'distribution': 'exponential', 'mean': 0.1}
+        self.assertEqual(0.1, standin.per_api(0.1, 'DescribeVolumes'))
+        self.assertEqual(latency, standin.per_api(latency, 'RunInstances'))
+        setting = {'default': 0.1, 'RunInstances': latency}
+        self.assertEqual(latency, standin.per_api(setting, 'RunInstances'))
+        self.assertEqual(0.1, standin.per_api(setting, 'DescribeVolumes'))
+        self.assertIsNone(standin.per_api({'RunInstances': 1}, 'Other'))
+
+    def test_throttle_per_api(self):
+        """ Tests that only the APIs that are given a
+            throttle rate are throttled.
+        """
+        app = standin.StandIn(throttle_rate={'DescribeVolumes': 1})
+        self.create_volume(app)
+        response = self.request(app, Action='DescribeVolumes')
+        self.assertEqual(503, response.status_code)
+        self.assertIn('<Code>RequestLimitExceeded</Code>', response.data)
+        self.assertEqual(
+            {standin.REQUESTS: {'CreateVolume': 1},
+             standin.THROTTLED: {'DescribeVolumes': 1}}, app.stats())
+
+    def test_errors_by_api(self):
+        """ Tests that the faults of each API have its
+            own status and error codes.
+        """
+        app = standin.StandIn(error_rate=1)
+        response = self.request(app, Action='DescribeVolumes')
+        self.assertEqual(500, response.status_code)
+        self.assertIn('<Code>InternalError</Code>', response.data)
+        app = standin.StandIn(throttle_rate=1)
+        response = self.request(app, host=standin.ELB_HOST,
+                                Action='DescribeLoadBalancers')
+        self.assertEqual(400, response.status_code)
+        self.assertIn('<Code>Throttling</Code>', response.data)
+
+    def test_not_found_window(self):
+        """ Tests that a new volume is not found until
+            the window has passed.
+        """
+        app = standin.StandIn(not_found_window=0.2)
+        volume_id = self.create_volume(app)
+        response = self.request(app, Action='DescribeVolumes',
+                                **{'VolumeId.1': volume_id})
+        self.assertEqual(400, response.status_code)
+        self.assertIn('<Code>InvalidVolume.NotFound</Code>', response.data)
+        time.sleep(0.2)
+        response = self.request(app, Action='DescribeVolumes',
+                                **{'VolumeId.1': volume_id})
+        self.assertEqual(200, response.status_code)
+        self.assertIn(volume_id, response.data)
+
+    def test_seed_repeats_faults(self):
+        """ Tests that stand-ins with the same seed inject
+            the same faults into the same requests.
+        """
+        def statuses(app):
+            return [self.request(app, Action='DescribeVolumes').status_code
+                    for _ in range(50)]
+        config = {'throttle_rate': 0.3, 'error_rate': 0.2, 'seed': 3}
+        first = statuses(standin.StandIn.from_config(config))
+        self.assertEqual(first,
+                         statuses(standin.StandIn.from_config(config)))
+        self.assertEqual(set([200, 500, 503]), set(first))
+
+    def test_connection_clients(self):
+        """ Tests that the plugin's clients connect to the
+            stand-in with its aws_config.
+        """
+        connection.connection_pool.clear()
+        self.addCleanup(connection.connection_pool.clear)
+        with standin.StandIn() as app:
+            ctx = MockCloudifyContext(
+                node_id='test_connection_clients',
+                deployment_id='test_connection_clients',
+                properties={
+                    constants.AWS_CONFIG_PROPERTY: app.aws_config(),
+                    'use_external_resource': False,
+                    'resource_id': ''
+                })
+            current_ctx.set(ctx=ctx)
+            self.assertEqual(
+                [], connection.EC2ConnectionClient().client()
+                .get_all_volumes())
+            connection.VPCConnectionClient().client().get_all_vpcs()
+            self.assertEqual(
+                [], connection.ELBConnectionClient().client()
+                .get_all_load_balancers())
+            self.assertEqual(
+                {'DescribeVolumes': 1, 'DescribeVpcs': 1,
+                 'DescribeLoadBalancers': 1},
+                app.stats()[standin.REQUESTS])
@@ -13,17 +13,49 @@
 #  * See the License for the specific language governing permissions and
 #  * limitations under the License.
 
+import threading
+import time
 import uuid
+from multiprocessing.pool import ThreadPool
 
 # Third-party Imports
 from boto import exception
 
 # Cloudify imports
-from . import utils, constants, connection
+from . import utils, constants, connection, retry, ratelimit, \
+    prefetch, tracing, transitions, waiter
 from cloudify.exceptions import NonRecoverableError, RecoverableError
+from cloudify.state import current_ctx
 from cloudify import ctx
 
 
+def call_aws_api(fn, args=None, retry_not_found=False):
+    """Calls an AWS API function, retrying it in-process according to
+    the retry settings in aws_config, until the retry deadline of the
+    operation that makes the call. Every attempt first waits for the
+    rate limits in aws_config, if there are any.
+
+    :param fn: The boto function to call.
+    :param args: A dict of kwargs for fn.
+    :param retry_not_found: Whether NotFound errors should be retried,
+        for calls that follow the creation of the resource they refer to.
+    :returns the output of fn.
+    :raises the boto error if the call did not succeed.
+    """
+
+    aws_config = utils.get_aws_config()
+    policy = retry.RetryPolicy.from_aws_config(aws_config)
+    limiter = ratelimit.RateLimiter.from_aws_config(aws_config)
+    trace = tracing.current_trace()
+    return policy.call(limiter.limit(fn), args,
+                       retry_not_found=retry_not_found,
+                       on_retry=tracing.record_retry,
+                       started=trace.started if trace else None)
+
+
+deployment_prefetch = prefetch.DeploymentPrefetch(call_aws_api)
+
+
 class AwsBase(object):
 
     def __init__(self,
@@ -31,14 +63,32 @@ class AwsBase(object):
                  ):
         self.client = \
             client if client else connection.EC2ConnectionClient().client()
+        # Describe results of this operation by (API, filters).
+        self._describe_cache = {}
+
+    @property
+    def client(self):
+        """The connection of the operation, or in a worker thread of
+        execute_many, the worker's own connection.
+        """
+        worker = getattr(self, '_worker', None)
+        return getattr(worker, 'client', None) or self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
-    def execute(self, fn, args=None, raise_on_falsy=False):
+    def execute(self, fn, args=None, raise_on_falsy=False,
+                retry_not_found=False):
+
+        if not utils.is_describe_call(fn):
+            self.invalidate_describe_cache()
 
         try:
-            output = fn(**args) if args else fn()
+            output = call_aws_api(fn, args, retry_not_found)
         except (exception.EC2ResponseError,
                 exception.BotoServerError) as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+            raise retry.escalate(e)
 
         if raise_on_falsy and not output:
             raise NonRecoverableError(
@@ -46,26 +96,158 @@ class AwsBase(object):
 
         return output
 
+    def execute_many(self, fn, args_list, raise_on_falsy=False,
+                     concurrency=None, name=None):
+        """Calls fn once with each dict of kwargs in args_list, with up to
+        concurrency calls at a time, in threads that share the operation's
+        context. A function of the client is called through execute, and a
+        method of this object, such as create_route, is called as it is.
+        Each thread makes its calls with its own connection from the pool,
+        as boto connections are not thread-safe. Every call is made even
+        if some of them fail.
+
+        :param fn: A function of self.client, or a method of this object.
+        :param args_list: The dicts of kwargs to call fn with.
+        :param raise_on_falsy: Whether a falsy output of a function of the
+            client is an error, as in execute.
+        :param concurrency: The number of calls to make at a time. Defaults
+            to api_concurrency in aws_config.
+        :param name: The name of the calls in errors. Defaults to fn's name.
+        :returns a list of the outputs of fn, in the order of args_list.
+        :raises NonRecoverableError listing the calls that failed, or
+            RecoverableError if all of the failures were recoverable.
+        """
+
+        args_list = list(args_list)
+        if concurrency is None:
+            concurrency = utils.get_aws_config().get('api_concurrency') or \
+                constants.API_CONCURRENCY
+        concurrency = max(1, min(int(concurrency), len(args_list)))
+        is_method = getattr(fn, '__self__', None) is self
+
+        def call(args):
+            try:
+                if is_method:
+                    return True, fn(**args)
+                if getattr(fn, '__self__', None) is self._client:
+                    return True, self.execute(
+                        getattr(self.client, fn.__name__), args,
+                        raise_on_falsy)
+                return True, self.execute(fn, args, raise_on_falsy)
+            except (NonRecoverableError, RecoverableError) as e:
+                return False, e
+
+        if concurrency == 1:
+            results = [call(args) for args in args_list]
+        else:
+            context = current_ctx.get_ctx()
+            parameters = current_ctx.get_parameters()
+            if getattr(self, '_worker', None) is None:
+                self._worker = threading.local()
+
+            def call_in_worker(args):
+                current_ctx.set(context, parameters)
+                self._worker.client = \
+                    connection.connection_pool.checkout(self._client)
+                try:
+                    return call(args)
+                finally:
+                    connection.connection_pool.checkin(self._worker.client)
+                    self._worker.client = None
+                    current_ctx.clear()
+
+            pool = ThreadPool(concurrency)
+            try:
+                results = pool.map(call_in_worker, args_list)
+            finally:
+                pool.close()
+                pool.join()
+
+        failures = [(args, output) for args, (succeeded, output)
+                    in zip(args_list, results) if not succeeded]
+        if failures:
+            message = '{0} of {1} calls to {2} failed: {3}'.format(
+                len(failures), len(args_list),
+                name or utils.get_api_name(fn),
+                '; '.join('{0}: {1}'.format(args, str(e))
+                          for args, e in failures))
+            if all(isinstance(e, RecoverableError) for _, e in failures):
+                raise RecoverableError(message)
+            raise NonRecoverableError(message)
+
+        return [output for _, output in results]
+
+    def invalidate_describe_cache(self):
+        """Forgets the describe results of this operation. Called before
+        every call that changes resources.
+        """
+        self._describe_cache.clear()
+        deployment_prefetch.forget(self.get_own_resource_ids())
+
+    def get_own_resource_ids(self):
+        """The ids of the resources that this operation changes.
+        """
+        return []
+
     def get_and_filter_resources_by_matcher(
             self, filter_function, filters,
             not_found_token='NotFound'):
 
+        key = self._describe_cache_key(filter_function, filters)
+        if key in self._describe_cache:
+            return list(self._describe_cache[key])
+
         try:
-            list_of_matching_resources = filter_function(**filters)
+            list_of_matching_resources = \
+                call_aws_api(filter_function, filters)
         except exception.EC2ResponseError as e:
-            if not_found_token in str(e):
-                return []
-            raise NonRecoverableError('{0}'.format(str(e)))
+            if not retry.is_retryable(e) and not_found_token in str(e):
+                list_of_matching_resources = []
+            else:
+                raise retry.escalate(e)
         except exception.BotoServerError as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+            raise retry.escalate(e)
+
+        if isinstance(list_of_matching_resources, list):
+            self._describe_cache[key] = list(list_of_matching_resources)
 
         return list_of_matching_resources
 
+    def query(self, list_function, filters):
+        """Yields the resources that a describe function returns for
+        filters, such as vpc-id, group-name or tag:Name, that AWS applies,
+        so that only the matching resources are transferred.
+
+        :param list_function: A boto describe function.
+        :param filters: A dict of AWS describe filters.
+        """
+
+        for resource in self.get_and_filter_resources_by_matcher(
+                list_function, dict(filters=filters)):
+            yield resource
+
+    @staticmethod
+    def _describe_cache_key(filter_function, filters):
+        if isinstance(filters, dict):
+            filters = sorted(
+                (name, sorted(value.items())
+                 if isinstance(value, dict) else value)
+                for name, value in filters.items())
+        return (utils.get_api_name(filter_function),
+                id(getattr(filter_function, '__self__', None)),
+                repr(filters))
+
     def filter_for_single_resource(self, filter_function,
                                    filters,
                                    not_found_token='NotFound',
                                    aws_id_attribute='id'):
 
+        if isinstance(filters, dict) and len(filters) == 1:
+            resource = deployment_prefetch.lookup(
+                filter_function, filters.values()[0], aws_id_attribute)
+            if resource is not None:
+                return resource
+
         resources = self.get_and_filter_resources_by_matcher(
             filter_function, filters, not_found_token)
 
@@ -141,6 +323,9 @@ class AwsBaseRelationship(AwsBase):
             ctx.source.node.properties['use_external_resource']
         self.source_get_all_handler = {'function': None, 'argument': ''}
 
+    def get_own_resource_ids(self):
+        return [self.source_resource_id, self.target_resource_id]
+
     def associate(self, args=None):
         return False
 
@@ -291,13 +476,24 @@ class AwsBaseNode(AwsBase):
         self.required_properties = required_properties
         self.get_all_handler = {'function': basestring, 'argument': ''}
         self.not_found_error = ''
+        # Resource ids that do not match are not looked up.
+        self.id_format = None
         self.state_attribute = 'state'
         self.states = AwsResourceStates(resource_states)
 
+    def get_own_resource_ids(self):
+        return [self.resource_id]
+
     def creation_validation(self):
         """ This validates all Nodes before bootstrap.
         """
 
+        if self.is_external_resource and not self.is_valid_resource_id():
+            raise NonRecoverableError(
+                'External resource, but the supplied {0} ID {1} '
+                'is malformed.'.format(self.aws_resource_type,
+                                       self.resource_id))
+
         resource = self.get_resource()
 
         for property_key in self.required_properties:
@@ -318,7 +514,8 @@ class AwsBaseNode(AwsBase):
 
     def cloudify_operation_exit_handler(self,
                                         resource_state,
-                                        operation_name):
+                                        operation_name,
+                                        retry_after=None):
         """
         This function decides whether to allow the Cloudify
         Operation to succeed. It does this by getting the state of
@@ -329,6 +526,7 @@ class AwsBaseNode(AwsBase):
             This is usually received from self.get_resource_state().
         :param operation_name: The Cloudify Lifecyle Operation Name.
             This is usually provided by ctx.operations.name.
+        :param retry_after: The seconds to wait before a retry.
         :return: True if successful or cloudify.operation.retry if waiting.
         :raises: NonRecoverableError if state is failed.
                  RecoverableError if state is indeterminate.
@@ -365,7 +563,8 @@ class AwsBaseNode(AwsBase):
             _message = \
                 'Waiting to verify that {0} {1} is in desired state.' \
                 .format(self.aws_resource_type, self.resource_id)
-            return ctx.operation.retry(message=_message)
+            return ctx.operation.retry(message=_message,
+                                       retry_after=retry_after)
 
         # This is potentially a serious issue.
         # Either AWS Failed and could possibly recover.
@@ -426,14 +625,15 @@ class AwsBaseNode(AwsBase):
         else:
             external_resource_function = self.use_external_resource_naively
 
+        operation_states = getattr(self.states, short_operation_name, None)
+
         if ctx.operation.retry_number == 0:
             ctx.logger.info(
                 'Initializing AWS {0}-{1} sequence.'
                 .format(self.aws_resource_type, short_operation_name))
 
-            ret = \
-                external_resource_function() \
-                or internal_resource_function(args)
+            external = external_resource_function()
+            ret = external or internal_resource_function(args)
 
             if ret is False:
                 raise NonRecoverableError(
@@ -441,23 +641,77 @@ class AwsBaseNode(AwsBase):
                     'unable to {0} this resource.'
                     .format(short_operation_name))
             post_operation_funtion()
+            if not external and operation_states is not None:
+                self.start_transition()
             ctx.logger.info(
                 'AWS {0}-{1}: primary stage complete.'
                 .format(self.aws_resource_type, short_operation_name))
-        resource = self.get_resource()
-        if not resource and 'delete' in short_operation_name:
-            ctx.logger.info('AWS {0} ID# {1} no longer extant.'
-                            .format(self.aws_resource_type,
-                                    self.resource_id))
-            return True
-        resource_state = self.get_resource_state(resource=resource)
+        state_waiter = self.get_waiter(short_operation_name)
+        for poll in state_waiter.polls():
+            if poll:
+                self.invalidate_describe_cache()
+            resource = self.get_resource()
+            if not resource and 'delete' in short_operation_name:
+                ctx.logger.info('AWS {0} ID# {1} no longer extant.'
+                                .format(self.aws_resource_type,
+                                        self.resource_id))
+                self.end_transition(short_operation_name)
+                return True
+            resource_state = self.get_resource_state(resource=resource)
+            if operation_states is None:
+                break
+            if resource_state in operation_states.success:
+                self.end_transition(short_operation_name)
+            if resource_state not in operation_states.waiting:
+                break
+            ctx.logger.debug(
+                'AWS {0} ID# {1} is in -{2}- state.'
+                .format(self.aws_resource_type, self.resource_id,
+                        resource_state))
         ctx.instance.runtime_properties['aws_resource_state'] = resource_state
         if not resource_state:
             ctx.logger.info(
                 'Unable to verify AWS {0} ID# {1} state.'
                 .format(self.aws_resource_type, self.resource_id))
-        return self.cloudify_operation_exit_handler(resource_state,
-                                                    short_operation_name)
+        return self.cloudify_operation_exit_handler(
+            resource_state, short_operation_name,
+            retry_after=state_waiter.retry_after)
+
+    # Methods related to waiting for state transitions
+    def get_waiter(self, operation_name):
+        """Returns the waiter for the operation, scheduled by the times
+        that the transitions of this resource type took before.
+        """
+
+        aws_config = utils.get_aws_config()
+        model = transitions.TransitionModel.from_aws_config(aws_config)
+        return waiter.Waiter.from_aws_config(
+            aws_config,
+            histogram=model.histogram(
+                self.aws_resource_type, operation_name) if model else None,
+            started=ctx.instance.runtime_properties.get(
+                constants.TRANSITION_STARTED_PROPERTY))
+
+    def start_transition(self):
+        ctx.instance.runtime_properties[
+            constants.TRANSITION_STARTED_PROPERTY] = time.time()
+
+    def end_transition(self, operation_name):
+        """Records the time that the transition of the operation took,
+        if this operation requested it.
+        """
+
+        started = ctx.instance.runtime_properties.get(
+            constants.TRANSITION_STARTED_PROPERTY)
+        if started is None:
+            return
+        utils.unassign_runtime_property_from_resource(
+            constants.TRANSITION_STARTED_PROPERTY, ctx.instance)
+        model = transitions.TransitionModel.from_aws_config(
+            utils.get_aws_config())
+        if model:
+            model.record(self.aws_resource_type, operation_name,
+                         time.time() - started)
 
     # Cloudify workflow operation helpers
     def create_helper(self, args=None):
@@ -489,7 +743,13 @@ class AwsBaseNode(AwsBase):
         )
         return matches
 
+    def is_valid_resource_id(self):
+        return not self.id_format or \
+            utils.is_resource_id(self.resource_id, self.id_format)
+
     def get_resource(self):
+        if not self.is_valid_resource_id():
+            return None
         resource = self.filter_for_single_resource(
             self.get_all_handler['function'],
             {self.get_all_handler['argument']: self.resource_id},
@@ -525,12 +785,17 @@ class AwsBaseNode(AwsBase):
 
     def _tag_resource(self, resource, tags):
 
+        self.invalidate_describe_cache()
+
         try:
-            output = resource.add_tags(tags)
+            output = call_aws_api(resource.add_tags, dict(tags=tags),
+                                  retry_not_found=True)
         except (exception.EC2ResponseError,
                 exception.BotoServerError) as e:
-            raise NonRecoverableError(
-                'unable to tag resource name: {0}'.format(str(e)))
+            message = 'unable to tag resource name: {0}'.format(str(e))
+            if retry.is_retryable(e):
+                raise RecoverableError(message)
+            raise NonRecoverableError(message)
 
         return output
 
@@ -579,6 +844,11 @@ class AwsBaseNode(AwsBase):
 
 class RouteMixin(object):
 
+    def invalidate_describe_cache(self):
+        """Overridden by AwsBase when the mixin is used with it.
+        """
+        pass
+
     def create_route(self, route_table_id,
                      route, route_table_ctx_instance=None):
 
@@ -603,8 +873,11 @@ class RouteMixin(object):
                 'Missing valid values: {0}'.format(route)
             )
 
+        self.invalidate_describe_cache()
+
         try:
-            output = self.client.create_route(**route_to_create)
+            output = call_aws_api(self.client.create_route,
+                                  route_to_create, retry_not_found=True)
         except exception.EC2ResponseError as e:
             if '<Code>RouteAlreadyExists</Code>' in str(e):
                 if route_table_ctx_instance:
@@ -626,6 +899,31 @@ class RouteMixin(object):
                                                  route_to_create)
         return True
 
+    def create_many_routes(self, route_table_id, routes,
+                           route_table_ctx_instance=None):
+        """Creates routes in a route table at the same time.
+        """
+
+        if route_table_ctx_instance and 'routes' not in \
+                route_table_ctx_instance.runtime_properties.keys():
+            route_table_ctx_instance.runtime_properties['routes'] = []
+        return self.execute_many(
+            self.create_route,
+            [dict(route_table_id=route_table_id, route=route,
+                  route_table_ctx_instance=route_table_ctx_instance)
+             for route in routes])
+
+    def delete_many_routes(self, route_table_id, routes,
+                           route_table_ctx_instance=None):
+        """Deletes routes from a route table at the same time.
+        """
+
+        return self.execute_many(
+            self.delete_route,
+            [dict(route_table_id=route_table_id, route=route,
+                  route_table_ctx_instance=route_table_ctx_instance)
+             for route in routes])
+
     def add_route_to_runtime_properties(self,
                                         route_table_ctx_instance, route):
         if 'routes' not in \
@@ -640,8 +938,10 @@ class RouteMixin(object):
             destination_cidr_block=route['destination_cidr_block']
         )
 
+        self.invalidate_describe_cache()
+
         try:
-            output = self.client.delete_route(**args)
+            output = call_aws_api(self.client.delete_route, args)
         except exception.EC2ResponseError as e:
             if constants.ROUTE_NOT_FOUND_ERROR in str(e):
                 ctx.logger.info(
@@ -649,7 +949,7 @@ class RouteMixin(object):
                     'found on route_table.'
                     .format(route, route_table_id))
                 return True
-            raise NonRecoverableError('{0}'.format(str(e)))
+            raise retry.escalate(e)
 
         if output:
             if route_table_ctx_instance:
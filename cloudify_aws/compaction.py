@@ -0,0 +1,119 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import collections
+
+# Third-party Imports
+import ipaddress
+
+# Cloudify Imports
+from . import constants
+
+
+def parse_network(cidr):
+    """Returns the ipaddress network of a CIDR, or None if it is not a
+    valid network, such as a security group id or a CIDR with host bits.
+    """
+
+    if not isinstance(cidr, basestring):
+        return None
+    text = cidr.decode('utf-8') if isinstance(cidr, str) else cidr
+    try:
+        return ipaddress.ip_network(text)
+    except (ipaddress.AddressValueError, ValueError):
+        return None
+
+
+def parse_port(port):
+    try:
+        return int(port)
+    except (TypeError, ValueError):
+        return None
+
+
+def compact(entries, cidr_key, from_key, to_key, protocol_key, get_class):
+    """Compacts rules that allow or deny the same traffic into fewer
+    rules. Rules of the same class and CIDR with contiguous or overlapping
+    port ranges are merged into one range, and then the CIDRs of rules of
+    the same class and ports are collapsed into the fewest networks.
+
+    The rules are treated as a set, so the caller must only pass rules
+    whose order does not matter.
+
+    :param entries: A list of rule dicts.
+    :param cidr_key: The key of the CIDR of a rule.
+    :param from_key: The key of the first port of a rule.
+    :param to_key: The key of the last port of a rule.
+    :param protocol_key: The key of the protocol of a rule.
+    :param get_class: A function that returns the values of a rule other
+        than its CIDR and ports that must be equal for rules to be merged.
+    :return: a list of rule dicts. Rules that can not be compacted, such
+        as rules with a security group instead of a CIDR, are kept last.
+    """
+
+    kept = []
+    by_network = collections.OrderedDict()
+    for entry in entries:
+        network = parse_network(entry.get(cidr_key))
+        if network is None:
+            kept.append(entry)
+        else:
+            by_network.setdefault(
+                (get_class(entry), network), []).append(entry)
+
+    # Merge the port ranges of each network.
+    by_ports = collections.OrderedDict()
+    for (entry_class, network), group in by_network.items():
+        for entry, from_port, to_port in _merge_port_ranges(
+                group, from_key, to_key, protocol_key):
+            by_ports.setdefault(
+                (entry_class, from_port, to_port, network.version),
+                (entry, []))[1].append(network)
+
+    # Collapse the networks of each port range.
+    compacted = []
+    for (_, from_port, to_port, _), (entry, networks) in by_ports.items():
+        for network in ipaddress.collapse_addresses(networks):
+            compacted_entry = dict(entry)
+            compacted_entry[cidr_key] = str(network)
+            if from_key in entry:
+                compacted_entry[from_key] = from_port
+            if to_key in entry:
+                compacted_entry[to_key] = to_port
+            compacted.append(compacted_entry)
+
+    return compacted + kept
+
+
+def _merge_port_ranges(entries, from_key, to_key, protocol_key):
+    protocol = unicode(entries[0].get(protocol_key)).lower()
+    ranges = [(parse_port(entry.get(from_key)),
+               parse_port(entry.get(to_key)),
+               entry) for entry in entries]
+
+    if protocol not in constants.PORT_RANGE_PROTOCOLS or \
+            any(from_port is None or to_port is None or from_port < 0
+                for from_port, to_port, _ in ranges):
+        return [(entry, entry.get(from_key), entry.get(to_key))
+                for entry in entries]
+
+    merged = []
+    for from_port, to_port, entry in sorted(ranges, key=lambda r: r[:2]):
+        if merged and from_port <= merged[-1][2] + 1:
+            merged[-1][2] = max(merged[-1][2], to_port)
+        else:
+            merged.append([entry, from_port, to_port])
+    return [tuple(m) for m in merged]
@@ -15,7 +15,11 @@
 
 # Builtin Imports
 import ConfigParser
+import hashlib
 import os
+import threading
+import time
+import weakref
 
 # Third-party Imports
 from boto.ec2 import get_region
@@ -23,13 +27,193 @@ from boto.ec2 import EC2Connection
 from boto.ec2.elb import ELBConnection
 from boto.vpc import VPCConnection
 from boto.regioninfo import RegionInfo
+from boto.exception import BotoServerError
 from boto.ec2.elb import connect_to_region as connect_to_elb_region
 
 # Cloudify Imports
-from . import utils, constants
+from . import utils, constants, tracing
 from cloudify.exceptions import NonRecoverableError
 
 
+class ConnectionPool(object):
+    """Keeps live boto connections so that operations running in the same
+    process reuse them (and their keep-alive HTTP connections) instead of
+    opening a new connection for every client.
+    """
+
+    def __init__(self, ttl=constants.CONNECTION_POOL_TTL):
+        self.ttl = ttl
+        self._connections = {}
+        # The key, factory and config of every connection the pool made,
+        # so that checkout can make another one like it.
+        self._origins = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, connection_class, aws_config, factory=None):
+        """Returns a pooled connection for the given class and config,
+        creating one if there is none.
+
+        :param connection_class: The boto connection class.
+        :param aws_config: The cleaned kwargs for the connection.
+        :param factory: An optional callable that creates the connection
+            from aws_config. Defaults to connection_class.
+        :returns a boto connection object.
+        """
+
+        key = self.key(connection_class, aws_config)
+        now = time.time()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._connections.get(key)
+            if entry is None:
+                factory = factory or connection_class
+                new_connection = factory(**aws_config)
+                if new_connection is None:
+                    return None
+                self._prepare(new_connection)
+                entry = {'connection': new_connection, 'spares': []}
+                self._connections[key] = entry
+                self._origins[new_connection] = (key, factory, aws_config)
+            entry['last_used'] = now
+            return entry['connection']
+
+    def checkout(self, pooled_connection):
+        """Returns a connection with the class and config of a pooled
+        connection that no other thread is using, for a thread that makes
+        calls at the same time as the others, as boto connections are not
+        thread-safe. Connections that the pool did not make, such as
+        mocks, are returned as they are.
+
+        :param pooled_connection: A connection returned by get.
+        :returns a boto connection object, to be given back with checkin.
+        """
+
+        with self._lock:
+            origin = self._origins.get(pooled_connection)
+            if origin is None:
+                return pooled_connection
+            key, factory, aws_config = origin
+            entry = self._connections.get(key)
+            if entry is not None and entry['spares']:
+                return entry['spares'].pop()
+
+        spare = factory(**aws_config)
+        self._prepare(spare)
+        with self._lock:
+            self._origins[spare] = origin
+        return spare
+
+    def checkin(self, spare):
+        """Gives back a connection returned by checkout, so that it is
+        reused by the next thread that checks one out.
+        """
+
+        with self._lock:
+            origin = self._origins.get(spare)
+            if origin is None:
+                return
+            entry = self._connections.get(origin[0])
+            if entry is not None and spare is not entry['connection']:
+                entry['spares'].append(spare)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._connections.values():
+                entry['connection'].close()
+                for spare in entry['spares']:
+                    spare.close()
+            self._connections.clear()
+
+    @staticmethod
+    def _prepare(new_connection):
+        # The plugin's retry policy retries failed requests, so boto does
+        # not retry them again within each attempt. With no retries left,
+        # boto would still sleep before raising a 5xx response or a
+        # connection error, so both are raised as soon as they happen.
+        new_connection.num_retries = 0
+        new_connection.http_exceptions = ()
+        mexe = new_connection._mexe
+
+        def _mexe(request, sender=None, override_num_retries=None,
+                  retry_handler=None):
+            return mexe(request, sender, override_num_retries=0,
+                        retry_handler=retry_handler or _raise_server_error)
+
+        new_connection._mexe = _mexe
+        tracing.instrument(new_connection)
+
+    def _evict_idle(self, now):
+        # Evicted connections are not closed, because an operation that
+        # got one before may still be using it. They are closed when they
+        # are garbage collected.
+        for key, entry in self._connections.items():
+            if now - entry['last_used'] > self.ttl:
+                del self._connections[key]
+
+    @staticmethod
+    def key(connection_class, aws_config):
+        """Hashes the connection class, the region and the rest of the
+        config, so that secrets are not kept as dictionary keys.
+        """
+
+        config = dict(aws_config)
+        region = config.pop('region', None)
+        if isinstance(region, RegionInfo):
+            region = (region.name, region.endpoint)
+        identity = (connection_class.__name__,
+                    region,
+                    sorted(config.items()))
+        return hashlib.sha1(repr(identity)).hexdigest()
+
+
+def _raise_server_error(response, attempt, next_sleep):
+    """A boto retry handler that raises a 5xx response as the error that
+    boto would raise once it gave up retrying it.
+    """
+
+    if response.status >= 500:
+        raise BotoServerError(response.status, response.reason,
+                              response.read())
+
+
+connection_pool = ConnectionPool()
+
+# Validated boto config files by path, with the (mtime, size) they were
+# read at, and RegionInfo objects by (region name, endpoint override).
+_config_file_cache = {}
+_region_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_region_object(region_name, endpoint=None):
+    """Returns a cached RegionInfo for a region, so that boto's endpoint
+    data is not reloaded for every client.
+
+    :param region_name: The region name, such as us-east-1.
+    :param endpoint: An optional endpoint that overrides the default one.
+    :returns a RegionInfo or None if the region name is unknown.
+    """
+
+    key = (region_name, endpoint)
+
+    with _cache_lock:
+        if key in _region_cache:
+            return _region_cache[key]
+
+    region_object = get_region(region_name)
+    if region_object and endpoint:
+        region_object = RegionInfo(
+            name=region_object.name,
+            endpoint=endpoint,
+            connection_cls=region_object.connection_cls)
+
+    with _cache_lock:
+        _region_cache[key] = region_object
+
+    return region_object
+
+
 class EC2ConnectionClient():
     """Provides functions for getting the EC2 Client
     """
@@ -44,21 +228,18 @@ class EC2ConnectionClient():
         aws_config_property = (self._get_aws_config_property() or
                                self._get_aws_config_from_file())
         if not aws_config_property:
-            return EC2Connection()
+            return connection_pool.get(EC2Connection, {})
         elif aws_config_property.get('ec2_region_name'):
-            region_object = \
-                get_region(aws_config_property['ec2_region_name'])
             aws_config = aws_config_property.copy()
-            if region_object and 'ec2_region_endpoint' in aws_config_property:
-                region_object.endpoint = \
-                    aws_config_property['ec2_region_endpoint']
-            aws_config['region'] = region_object
+            aws_config['region'] = get_region_object(
+                aws_config_property['ec2_region_name'],
+                aws_config_property.get('ec2_region_endpoint'))
         else:
             aws_config = aws_config_property.copy()
 
         aws_config = self.aws_config_cleanup(aws_config)
 
-        return EC2Connection(**aws_config)
+        return connection_pool.get(EC2Connection, aws_config)
 
     def _get_aws_config_property(self):
         node_properties = \
@@ -77,12 +258,29 @@ class EC2ConnectionClient():
         return os.environ.get(constants.AWS_CONFIG_PATH_ENV_VAR_NAME)
 
     def _parse_config_file(self, path):
-        """Parse and validate Boto cfg file
+        """Parse and validate Boto cfg file, reusing the result of an
+        earlier parse as long as the file's mtime and size are unchanged.
         """
         path = str(path)
         if not os.path.isfile(path):
             raise NonRecoverableError('no aws config file at {0}'.format(path))
 
+        stat = os.stat(path)
+        signature = (stat.st_mtime, stat.st_size)
+
+        with _cache_lock:
+            cached = _config_file_cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1].copy()
+
+        config = self._read_config_file(path)
+
+        with _cache_lock:
+            _config_file_cache[path] = (signature, config)
+
+        return config.copy()
+
+    def _read_config_file(self, path):
         parser = ConfigParser.ConfigParser()
         parser.read(path)
 
@@ -118,19 +316,10 @@ class EC2ConnectionClient():
 
     def aws_config_cleanup(self, aws_config):
 
-        # for backward compatibility,
-        # delete this key before passing config to Boto
-        if 'ec2_region_name' in aws_config:
-            del(aws_config['ec2_region_name'])
-
-        if 'ec2_region_endpoint' in aws_config:
-            del(aws_config["ec2_region_endpoint"])
-
-        if 'elb_region_name' in aws_config:
-            del(aws_config["elb_region_name"])
-
-        if 'elb_region_endpoint' in aws_config:
-            del(aws_config["elb_region_endpoint"])
+        # delete the keys that boto does not know about
+        # before passing config to Boto
+        for key in constants.AWS_CONFIG_PLUGIN_KEYS:
+            aws_config.pop(key, None)
 
         return aws_config
 
@@ -144,17 +333,15 @@ class ELBConnectionClient(EC2ConnectionClient):
         aws_config_property = (self._get_aws_config_property() or
                                self._get_aws_config_from_file())
         if not aws_config_property:
-            return ELBConnection()
+            return connection_pool.get(ELBConnection, {})
 
         aws_config = aws_config_property.copy()
 
         if aws_config_property.get('elb_region_name') and \
                 aws_config_property.get('elb_region_endpoint'):
-            region_object = \
-                get_region(aws_config_property['elb_region_name'])
-            region_object.endpoint = \
-                aws_config_property['elb_region_endpoint']
-            aws_config['region'] = region_object
+            aws_config['region'] = get_region_object(
+                aws_config_property['elb_region_name'],
+                aws_config_property['elb_region_endpoint'])
         elif aws_config_property.get('elb_region_name') and \
                 not aws_config_property.get('elb_region_endpoint'):
             aws_config['region'] = aws_config_property['elb_region_name']
@@ -163,17 +350,21 @@ class ELBConnectionClient(EC2ConnectionClient):
 
         if 'region' in aws_config:
             if type(aws_config['region']) is RegionInfo:
-                return ELBConnection(**aws_config)
+                return connection_pool.get(ELBConnection, aws_config)
             elif type(aws_config['region']) is str:
-                elb_region = aws_config.pop('region')
-                return connect_to_elb_region(
-                        elb_region, **aws_config)
+                return connection_pool.get(
+                    ELBConnection, aws_config,
+                    factory=self._connect_to_elb_region)
 
         raise NonRecoverableError(
                 'Cannot connect to ELB endpoint. '
                 'You must either provide elb_region_name or both '
                 'elb_region_name and elb_region_endpoint.')
 
+    @staticmethod
+    def _connect_to_elb_region(region, **aws_config):
+        return connect_to_elb_region(region, **aws_config)
+
 
 class VPCConnectionClient(EC2ConnectionClient):
     """Provides functions for getting the VPC Client
@@ -186,27 +377,18 @@ class VPCConnectionClient(EC2ConnectionClient):
         aws_config_property = (self._get_aws_config_property(aws_config) or
                                self._get_aws_config_from_file())
         if not aws_config_property:
-            return VPCConnection()
+            return connection_pool.get(VPCConnection, {})
         elif aws_config_property.get('ec2_region_name'):
-            region_object = \
-                get_region(aws_config_property['ec2_region_name'])
             aws_config = aws_config_property.copy()
-            if region_object and 'ec2_region_endpoint' in aws_config_property:
-                region_object.endpoint = \
-                    aws_config_property['ec2_region_endpoint']
-            aws_config['region'] = region_object
+            aws_config['region'] = get_region_object(
+                aws_config_property['ec2_region_name'],
+                aws_config_property.get('ec2_region_endpoint'))
         else:
             aws_config = aws_config_property.copy()
 
-        if 'ec2_region_name' in aws_config:
-            del(aws_config['ec2_region_name'])
-
-        # for backward compatibility,
-        # delete this key before passing config to Boto
-        if 'ec2_region_endpoint' in aws_config:
-            del(aws_config["ec2_region_endpoint"])
+        aws_config = self.aws_config_cleanup(aws_config)
 
-        return VPCConnection(**aws_config)
+        return connection_pool.get(VPCConnection, aws_config)
 
     def _get_aws_config_property(self, aws_config=None):
         if aws_config:
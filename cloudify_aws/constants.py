@@ -50,7 +50,7 @@ NODE_INSTANCE = 'node-instance'
 INSTANCE = dict(
         AWS_RESOURCE_TYPE='instance',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.Instance',
-        ID_FORMAT='^i\-[0-9a-z]{8}$',
+        ID_FORMAT='^i\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidInstanceID.NotFound',
         REQUIRED_PROPERTIES=['image_id', 'instance_type'],
         STATES=[{'name': 'create',
@@ -74,7 +74,7 @@ INSTANCE = dict(
 SECURITYGROUP = dict(
         AWS_RESOURCE_TYPE='group',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.SecurityGroup',
-        ID_FORMAT='^sg\-[0-9a-z]{8}$',
+        ID_FORMAT='^sg\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidGroup.NotFound',
         REQUIRED_PROPERTIES=['description', 'rules'],
         STATES=[{}]
@@ -83,7 +83,7 @@ SECURITYGROUP = dict(
 SUBNET = dict(
         AWS_RESOURCE_TYPE='subnet',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.Subnet',
-        ID_FORMAT='^subnet\-[0-9a-z]{8}$',
+        ID_FORMAT='^subnet\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidSubnetID.NotFound',
         REQUIRED_PROPERTIES=['cidr_block'],
         STATES=[{'name': 'create',
@@ -95,7 +95,7 @@ SUBNET = dict(
 VPC = dict(
         AWS_RESOURCE_TYPE='vpc',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.VPC',
-        ID_FORMAT='^vpc\-[0-9a-z]{8}$',
+        ID_FORMAT='^vpc\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidVpcID.NotFound',
         REQUIRED_PROPERTIES=['cidr_block', 'instance_tenancy'],
         STATES=[{'name': 'create',
@@ -135,7 +135,7 @@ ZONE = 'zone'
 EBS = dict(
     AWS_RESOURCE_TYPE='volume',
     CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.Volume',
-    ID_FORMAT='^vol\-[0-9a-z]{8}$',
+    ID_FORMAT='^vol\-([0-9a-z]{8}|[0-9a-z]{17})$',
     NOT_FOUND_ERROR='InvalidVolume.NotFound',
     REQUIRED_PROPERTIES=['size', ZONE, 'device'],
     VOLUME_SNAPSHOT_ATTRIBUTE='snapshots_ids',
@@ -155,7 +155,7 @@ EBS = dict(
 ENI = dict(
     AWS_RESOURCE_TYPE='network_interface',
     CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.Interface',
-    ID_FORMAT='^eni\-[0-9a-z]{8}$',
+    ID_FORMAT='^eni\-([0-9a-z]{8}|[0-9a-z]{17})$',
     REQUIRED_PROPERTIES=[],
     NOT_FOUND_ERROR='InvalidInterface.NotFound',
     STATES=[{'name': 'create',
@@ -171,7 +171,7 @@ ENI = dict(
 ROUTE_TABLE = dict(
         AWS_RESOURCE_TYPE='route_table',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.RouteTable',
-        ID_FORMAT='^rtb\-[0-9a-z]{8}$',
+        ID_FORMAT='^rtb\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidRouteTableID.NotFound',
         REQUIRED_PROPERTIES=[],
         STATES=[{}]
@@ -180,7 +180,7 @@ ROUTE_TABLE = dict(
 NETWORK_ACL = dict(
         AWS_RESOURCE_TYPE='network_acl',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.ACL',
-        ID_FORMAT='^acl\-[0-9a-z]{8}$',
+        ID_FORMAT='^acl\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidNetworkAclID.NotFound',
         REQUIRED_PROPERTIES=[],
         STATES=[{}]
@@ -189,7 +189,7 @@ NETWORK_ACL = dict(
 INTERNET_GATEWAY = dict(
         AWS_RESOURCE_TYPE='internet_gateway',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.InternetGateway',
-        ID_FORMAT='^igw\-[0-9a-z]{8}$',
+        ID_FORMAT='^igw\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidInternetGatewayID.NotFound',
         REQUIRED_PROPERTIES=[],
         STATES=[{}]
@@ -198,7 +198,7 @@ INTERNET_GATEWAY = dict(
 VPN_GATEWAY = dict(
         AWS_RESOURCE_TYPE='vpn_gateway',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.VPNGateway',
-        ID_FORMAT='^vgw\-[0-9a-z]{8}$',
+        ID_FORMAT='^vgw\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidVpnGatewayID.NotFound',
         REQUIRED_PROPERTIES=[],
         STATES=[{'name': 'create',
@@ -214,7 +214,7 @@ VPN_GATEWAY = dict(
 CUSTOMER_GATEWAY = dict(
         AWS_RESOURCE_TYPE='customer_gateway',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.CustomerGateway',
-        ID_FORMAT='^cgw\-[0-9a-z]{8}$',
+        ID_FORMAT='^cgw\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidCustomerGatewayID.NotFound',
         REQUIRED_PROPERTIES=[],
         STATES=[{'name': 'create',
@@ -230,7 +230,7 @@ CUSTOMER_GATEWAY = dict(
 DHCP_OPTIONS = dict(
         AWS_RESOURCE_TYPE='dhcp_options',
         CLOUDIFY_NODE_TYPE='cloudify.aws.nodes.DHCPOptions',
-        ID_FORMAT='^dopt\-[0-9a-z]{8}$',
+        ID_FORMAT='^dopt\-([0-9a-z]{8}|[0-9a-z]{17})$',
         NOT_FOUND_ERROR='InvalidDhcpOptionID.NotFound',
         REQUIRED_PROPERTIES=[],
         STATES=[{}]
@@ -285,6 +285,125 @@ RUN_INSTANCE_PARAMETERS = {
 
 AWS_CONFIG_PATH_ENV_VAR_NAME = "AWS_CONFIG_PATH"
 
+# Seconds an unused pooled connection is kept before it is closed.
+CONNECTION_POOL_TTL = 300
+
+# aws_config keys that are used by the plugin and not passed to boto.
+AWS_CONFIG_PLUGIN_KEYS = [
+    'ec2_region_name', 'ec2_region_endpoint',
+    'elb_region_name', 'elb_region_endpoint',
+    'retry_max_attempts', 'retry_base_delay',
+    'retry_max_delay', 'retry_deadline',
+    'describe_rate_limit', 'mutating_rate_limit', 'rate_limit_dir',
+    'diagnostics_max_results', 'state_change_batch_window',
+    'prefetch_ttl', 'api_concurrency', 'wait_window',
+    'learn_transition_times', 'record_api_stats',
+    'profile', 'profile_dir', 'profile_top'
+]
+
+# Resources listed when a lookup by id finds nothing
+DIAGNOSTICS_MAX_RESULTS = 20
+DIAGNOSTICS_PAGE_SIZE_RANGE = (5, 1000)
+
+# In-process retries of AWS API calls (seconds)
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 20
+RETRY_DEADLINE = 60
+
+THROTTLING_ERROR_CODES = [
+    'Throttling', 'ThrottlingException', 'Throttled',
+    'RequestLimitExceeded', 'RequestThrottled',
+    'RequestThrottledException', 'TooManyRequestsException',
+    'SlowDown'
+]
+
+TRANSIENT_ERROR_CODES = [
+    'InternalError', 'InternalFailure', 'ServiceUnavailable',
+    'Unavailable', 'RequestTimeout', 'RequestTimeoutException'
+]
+
+# API names, by prefix, that only read resources.
+DESCRIBE_API_PREFIXES = ('get_', 'describe')
+
+# Directory for the shared rate limit buckets, under the temp directory,
+# when aws_config has no rate_limit_dir.
+RATE_LIMIT_DIR = 'cloudify-aws-rate-limits'
+
+# Sibling node instances that create their instances within the batch
+# window share one RunInstances call. The batch state files are kept in
+# this directory, under the temp directory, and the instance ids that
+# were handed out are forgotten after the TTL (seconds).
+RUN_INSTANCES_BATCH_DIR = 'cloudify-aws-run-instances'
+RUN_INSTANCES_BATCH_POLL_INTERVAL = 1
+RUN_INSTANCES_BATCH_TTL = 3600
+RUN_INSTANCES_UNBATCHABLE_PARAMETERS = \
+    ['client_token', 'private_ip_address', 'network_interfaces',
+     'min_count', 'max_count']
+
+# Instance start, stop and terminate requests made on a host within
+# state_change_batch_window seconds are sent in one call.
+STATE_CHANGE_BATCH_DIR = 'cloudify-aws-state-changes'
+STATE_CHANGE_BATCH_POLL_INTERVAL = 0.05
+STATE_CHANGE_BATCH_TTL = 600
+
+# Describe functions whose resources are prefetched by deployment_id tag
+# when aws_config has a prefetch_ttl. The reservation functions return
+# instances inside reservations.
+PREFETCH_APIS = [
+    'get_all_reservations', 'get_all_network_interfaces',
+    'get_all_security_groups', 'get_all_volumes', 'get_all_subnets',
+    'get_all_vpcs', 'get_all_route_tables', 'get_all_network_acls',
+    'get_all_internet_gateways', 'get_all_vpn_gateways',
+    'get_all_customer_gateways', 'get_all_dhcp_options'
+]
+PREFETCH_RESERVATION_APIS = ['get_all_reservations']
+
+# Parsed security group rule grants that are kept for comparing rules.
+SECURITY_GROUP_GRANT_CACHE_SIZE = 4096
+
+# Security group rules sent in one authorize request.
+SECURITY_GROUP_PERMISSIONS_PER_REQUEST = 50
+
+# Independent AWS API calls of an operation that are made at the same
+# time when aws_config has no api_concurrency.
+API_CONCURRENCY = 4
+
+# Polling of a resource that is in a waiting state, within the
+# operation, before the operation is retried (seconds).
+WAIT_WINDOW = 20
+WAIT_INITIAL_DELAY = 1
+WAIT_MAX_DELAY = 20
+
+# The times that resources take to get from the request to a success
+# state of the operation are kept per resource type and operation, in a
+# histogram per account and region under this directory, in the temp
+# directory. The buckets are the upper bounds in seconds. The first poll
+# is scheduled at the typical time and the retry at the slow time, once
+# TRANSITION_MIN_SAMPLES transitions were recorded.
+TRANSITION_DIR = 'cloudify-aws-transitions'
+TRANSITION_BUCKETS = [1, 2, 3, 5, 8, 13, 20, 30, 45, 60, 90, 120, 180,
+                      300, 600, 1200]
+TRANSITION_HISTORY_SIZE = 100
+TRANSITION_MIN_SAMPLES = 3
+TRANSITION_TYPICAL_PERCENTILE = 0.5
+TRANSITION_SLOW_PERCENTILE = 0.9
+TRANSITION_STARTED_PROPERTY = 'aws_transition_started'
+
+# The runtime property that keeps the summary of the AWS API calls of each
+# operation when aws_config has record_api_stats.
+API_STATS_PROPERTY = 'aws_api_stats'
+
+# Operations are profiled when aws_config has profile. The profiles are
+# written to this directory, under the temp directory, when aws_config
+# has no profile_dir, with a summary of the top functions.
+PROFILE_DIR = 'cloudify-aws-profiles'
+PROFILE_TOP = 30
+
+# Protocols, by name and number, whose contiguous port ranges may be
+# merged when rules are compacted.
+PORT_RANGE_PROTOCOLS = ['tcp', 'udp', '6', '17']
+
 # Boto config schema (section > options)
 BOTO_CONFIG_SCHEMA = {
     'Credentials': ['aws_access_key_id', 'aws_secret_access_key'],
@@ -0,0 +1,31 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Cloudify Imports
+from . import profiling, tracing
+from cloudify import decorators
+
+
+def operation(func=None, **arguments):
+    """Marks a function as a Cloudify operation, like
+    cloudify.decorators.operation, and traces the AWS API calls that the
+    operation makes. If aws_config has profile, the operation is also
+    profiled.
+    """
+
+    if func is None:
+        return lambda fn: operation(fn, **arguments)
+    return decorators.operation(
+        tracing.traced(profiling.profiled(func)), **arguments)
@@ -0,0 +1,265 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import hashlib
+import os
+import time
+import uuid
+
+# Cloudify Imports
+from cloudify import ctx
+from cloudify_aws import constants, utils
+from cloudify_aws.utils import StateFile, get_state_directory
+from cloudify.exceptions import NonRecoverableError, RecoverableError
+
+
+class RunInstancesBatch(object):
+    """Groups the RunInstances calls of sibling node instances that have
+    the same parameters into one call.
+
+    Every node instance joins the open batch of its node and parameters.
+    The first member that finds the batch window over launches all of the
+    members' instances with one call, using the batch's client token so
+    that the call is idempotent, and hands out the instances by sorting
+    the node instance ids and the launch indexes.
+    """
+
+    def __init__(self, path, window,
+                 poll_interval=constants.RUN_INSTANCES_BATCH_POLL_INTERVAL):
+        self.state = StateFile(path)
+        self.window = float(window)
+        self.poll_interval = poll_interval
+
+    @classmethod
+    def from_parameters(cls, parameters, window):
+        """Returns the batch for the node of the current node instance and
+        the given RunInstances parameters, or None if the parameters can
+        not be shared by several instances or batching is disabled.
+        """
+
+        if not window or utils.fcntl is None:
+            return None
+
+        for parameter in constants.RUN_INSTANCES_UNBATCHABLE_PARAMETERS:
+            if parameters.get(parameter):
+                return None
+
+        key = hashlib.sha1(repr((
+            ctx.deployment.id,
+            ctx.node.id,
+            sorted(parameters.items())))).hexdigest()
+
+        return cls(os.path.join(
+            get_state_directory(constants.RUN_INSTANCES_BATCH_DIR), key),
+            window)
+
+    def run(self, run_instances):
+        """Joins the batch and waits until its instances are launched.
+
+        :param run_instances: A function that takes the number of
+            instances and a client token and returns a boto reservation.
+        :returns a tuple of the reservation id, the instance id and the
+            launch index of the current node instance's instance.
+        """
+
+        member = ctx.instance.id
+        opened = self.state.update(lambda state: self._join(state, member))
+        ctx.logger.debug(
+            'Node instance {0} joined a RunInstances batch.'.format(member))
+
+        while True:
+            now = time.time()
+            launch = now >= opened + self.window
+            assigned = self.state.update(
+                lambda state: self._claim(state, member, launch,
+                                          run_instances))
+            if assigned:
+                return tuple(assigned[:3])
+            time.sleep(max(0, min(self.poll_interval,
+                                  opened + self.window - now)))
+
+    def _join(self, state, member):
+        now = time.time()
+        assigned = state.setdefault('assigned', {})
+        for key, value in assigned.items():
+            if now - value[3] > constants.RUN_INSTANCES_BATCH_TTL:
+                del assigned[key]
+
+        if member in assigned:
+            return now - self.window
+
+        batch = state.get('batch')
+        if not batch:
+            batch = state['batch'] = {
+                'client_token': uuid.uuid4().hex,
+                'opened': now,
+                'members': []
+            }
+        if member not in batch['members']:
+            batch['members'].append(member)
+        return batch['opened']
+
+    def _claim(self, state, member, launch, run_instances):
+        assigned = state.setdefault('assigned', {})
+        if member in assigned:
+            return assigned[member]
+
+        batch = state.get('batch')
+        if not batch or member not in batch['members']:
+            # The state file was removed while this member waited.
+            self._join(state, member)
+            return None
+        if not launch:
+            return None
+
+        members = sorted(batch['members'])
+        reservation = run_instances(len(members), batch['client_token'])
+        instances = sorted(reservation.instances,
+                           key=lambda instance: int(instance.ami_launch_index))
+
+        ctx.logger.info(
+            'Launched {0} instances for node instances {1} in reservation '
+            '{2}.'.format(len(instances), ', '.join(members), reservation.id))
+
+        now = time.time()
+        for node_instance_id, instance in zip(members, instances):
+            assigned[node_instance_id] = [
+                reservation.id, instance.id,
+                int(instance.ami_launch_index), now]
+        state['batch'] = None
+
+        return assigned.get(member)
+
+
+class InstanceStateChangeBatch(object):
+    """Collects the instance ids that concurrent operations on a host want
+    to start, stop or terminate in the same account and region, and sends
+    them in one call when the batch window is over.
+
+    Each request gets its own result. If the call for the whole batch
+    fails, the ids are sent one by one, so that only the requests whose
+    instance caused the failure fail.
+    """
+
+    def __init__(self, path, window,
+                 poll_interval=constants.STATE_CHANGE_BATCH_POLL_INTERVAL):
+        self.state = StateFile(path)
+        self.window = float(window)
+        self.poll_interval = poll_interval
+
+    @classmethod
+    def from_aws_config(cls, aws_config, action):
+        """Returns the batch for an action, such as stop_instances, in the
+        account and region of aws_config, or None if batching is disabled.
+        """
+
+        window = (aws_config or {}).get('state_change_batch_window')
+        if not window or utils.fcntl is None:
+            return None
+
+        return cls(os.path.join(
+            get_state_directory(constants.STATE_CHANGE_BATCH_DIR),
+            '{0}-{1}'.format(utils.get_account_scope(aws_config), action)),
+            window)
+
+    def request(self, instance_id, change_state):
+        """Adds an instance id to the batch and waits for its result.
+
+        :param instance_id: The ID of the instance.
+        :param change_state: A function that takes a list of instance
+            ids and raises NonRecoverableError or RecoverableError if the
+            state change failed.
+        :raises the error of the state change of instance_id.
+        """
+
+        token = uuid.uuid4().hex
+        opened = self.state.update(
+            lambda state: self._add(state, token, instance_id))
+
+        while True:
+            now = time.time()
+            flush = now >= opened + self.window
+            result = self.state.update(
+                lambda state: self._collect(state, token, flush,
+                                            change_state))
+            if result:
+                break
+            time.sleep(max(0, min(self.poll_interval,
+                                  opened + self.window - now)))
+
+        recoverable, message = result[1:]
+        if message is None:
+            return
+        if recoverable:
+            raise RecoverableError(message)
+        raise NonRecoverableError(message)
+
+    def _add(self, state, token, instance_id):
+        now = time.time()
+        results = state.setdefault('results', {})
+        for key, value in results.items():
+            if now - value[0] > constants.STATE_CHANGE_BATCH_TTL:
+                del results[key]
+
+        pending = state.get('pending')
+        if not pending:
+            pending = state['pending'] = {'opened': now, 'requests': []}
+        pending['requests'].append([token, instance_id])
+        return pending['opened']
+
+    def _collect(self, state, token, flush, change_state):
+        results = state.setdefault('results', {})
+        if token in results:
+            return results.pop(token)
+
+        pending = state.get('pending')
+        if not pending or not flush:
+            return None
+
+        requests = pending['requests']
+        instance_ids = sorted(set(
+            instance_id for _, instance_id in requests))
+        errors = self._change_state(instance_ids, change_state)
+
+        now = time.time()
+        for request_token, instance_id in requests:
+            error = errors.get(instance_id)
+            results[request_token] = [
+                now,
+                isinstance(error, RecoverableError),
+                str(error) if error else None]
+        state['pending'] = None
+
+        return results.pop(token, None)
+
+    def _change_state(self, instance_ids, change_state):
+        ctx.logger.debug(
+            'Sending state change for instances {0}.'
+            .format(', '.join(instance_ids)))
+        try:
+            change_state(instance_ids)
+            return {}
+        except (NonRecoverableError, RecoverableError) as e:
+            if len(instance_ids) == 1:
+                return {instance_ids[0]: e}
+
+        errors = {}
+        for instance_id in instance_ids:
+            try:
+                change_state([instance_id])
+            except (NonRecoverableError, RecoverableError) as e:
+                errors[instance_id] = e
+        return errors
@@ -21,7 +21,7 @@ from boto import exception
 
 # Cloudify imports
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify_aws import utils, constants
 from cloudify.exceptions import NonRecoverableError
 from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship
@@ -199,6 +199,7 @@ class Ebs(AwsBaseNode):
             resource_states=constants.EBS['STATES']
         )
         self.not_found_error = constants.EBS['NOT_FOUND_ERROR']
+        self.id_format = constants.EBS['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_volumes,
             'argument': '{0}_ids'.format(constants.EBS['AWS_RESOURCE_TYPE'])
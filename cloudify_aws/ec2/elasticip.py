@@ -18,10 +18,11 @@ from boto import exception
 
 # Cloudify imports
 from cloudify import ctx
-from cloudify.decorators import operation
-from cloudify_aws import utils, constants
+from cloudify_aws.decorators import operation
+from cloudify_aws import utils, constants, retry
 from cloudify.exceptions import NonRecoverableError
-from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship
+from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship, \
+    call_aws_api, deployment_prefetch
 
 
 @operation
@@ -118,7 +119,8 @@ class ElasticIPInstanceConnection(AwsBaseRelationship):
 
         if not elasticip_object:
             raise NonRecoverableError(
-                    'no matching elastic ip in account: {0}'.format(elasticip))
+                    'no matching elastic ip in account: {0} ({1})'.format(
+                        elasticip, constants.ELASTICIP['NOT_FOUND_ERROR']))
 
         disassociate_args = dict(
                 public_ip=elasticip_object.public_ip,
@@ -150,36 +152,62 @@ class ElasticIPInstanceConnection(AwsBaseRelationship):
 
     def get_source_resource(self):
 
+        instance = deployment_prefetch.lookup(
+            self.client.get_all_reservations, self.source_resource_id)
+        if instance is not None:
+            return instance
+
         try:
-            instances = self.execute(self.client.get_all_instances,
-                                     dict(instance_ids=self
-                                          .source_resource_id),
-                                     raise_on_falsy=True)
+            reservations = call_aws_api(self.client.get_all_instances,
+                                        dict(instance_ids=self
+                                             .source_resource_id))
         except exception.EC2ResponseError as e:
-            if constants.INSTANCE['NOT_FOUND_ERROR'] in e:
-                instances = self.client.get_all_instances()
-                utils.log_available_resources(instances)
+            if constants.INSTANCE['NOT_FOUND_ERROR'] not in str(e):
+                raise retry.escalate(e)
+            reservations = utils.list_available_resources(
+                self.client.get_all_reservations,
+                utils.get_diagnostics_filters(
+                    ctx.source.instance.runtime_properties.get('vpc_id')))
+            utils.log_available_resources(
+                instance for reservation in reservations
+                for instance in reservation.instances)
             return None
         except exception.BotoServerError as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+            raise retry.escalate(e)
+
+        if not reservations:
+            raise NonRecoverableError(
+                'Function {0} returned False.'.format(
+                    self.client.get_all_instances))
 
-        return instances[0] if instances else instances
+        # Like the prefetch, return the instance and not its reservation.
+        return reservations[0].instances[0]
 
     def get_target_resource(self):
 
         try:
-            addresses = self.execute(self.client.get_all_addresses,
-                                     dict(addresses=self.target_resource_id),
-                                     raise_on_falsy=True)
+            addresses = call_aws_api(self.client.get_all_addresses,
+                                     dict(addresses=self.target_resource_id))
         except exception.EC2ResponseError as e:
-            if constants.ELASTICIP['NOT_FOUND_ERROR'] in e:
-                addresses = self.client.get_all_addresses()
-                utils.log_available_resources(addresses)
+            if constants.ELASTICIP['NOT_FOUND_ERROR'] not in str(e):
+                raise retry.escalate(e)
+            # Addresses have no vpc-id filter, only the domain of the VPC.
+            filters = utils.get_diagnostics_filters()
+            if ctx.target.instance.runtime_properties.get('vpc_id'):
+                filters['domain'] = 'vpc'
+            utils.log_available_resources(
+                utils.list_available_resources(
+                    self.client.get_all_addresses, filters, paginated=False))
             return None
         except exception.BotoServerError as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+            raise retry.escalate(e)
+
+        if not addresses:
+            raise NonRecoverableError(
+                'Function {0} returned False.'.format(
+                    self.client.get_all_addresses))
 
-        return addresses[0] if addresses else addresses
+        return addresses[0]
 
 
 class ElasticIP(AwsBaseNode):
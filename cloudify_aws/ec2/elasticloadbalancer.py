@@ -19,7 +19,7 @@ from boto.ec2.elb.healthcheck import HealthCheck
 
 # Cloudify imports
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify_aws import constants, connection, utils
 from cloudify.exceptions import RecoverableError
 from cloudify.exceptions import NonRecoverableError
@@ -19,7 +19,7 @@ from boto import exception
 
 # Cloudify imports
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship
 from cloudify_aws import constants, utils
 from cloudify.exceptions import NonRecoverableError, RecoverableError
@@ -146,6 +146,7 @@ class Interface(AwsBaseNode):
             'function': self.client.get_all_network_interfaces,
             'argument': '{0}_ids'.format(constants.ENI['AWS_RESOURCE_TYPE'])
         }
+        self.id_format = constants.ENI['ID_FORMAT']
         self.state_attribute = 'status'
 
     def create(self, args=None, **_):
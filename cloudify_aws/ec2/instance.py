@@ -23,11 +23,12 @@ from boto.ec2 import networkinterface
 # Cloudify imports
 from cloudify import ctx
 from cloudify import compute
-from cloudify_aws.ec2 import passwd
+from cloudify_aws.ec2 import passwd, batch
 from .eni import Interface
-from cloudify.decorators import operation
-from cloudify_aws.base import AwsBaseNode
-from cloudify_aws import utils, constants
+from cloudify_aws.decorators import operation
+from cloudify_aws.base import AwsBaseNode, call_aws_api, \
+    deployment_prefetch
+from cloudify_aws import utils, constants, retry
 from cloudify.exceptions import NonRecoverableError
 
 
@@ -72,11 +73,13 @@ class Instance(AwsBaseNode):
                 resource_states=constants.INSTANCE['STATES']
         )
         self.not_found_error = constants.INSTANCE['NOT_FOUND_ERROR']
+        self.id_format = constants.INSTANCE['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_instances,
             'argument': '{0}_ids'.format(constants
                                          .INSTANCE['AWS_RESOURCE_TYPE'])
         }
+        self._instance_snapshot = None
 
     def creation_validation(self, **_):
 
@@ -124,13 +127,7 @@ class Instance(AwsBaseNode):
         ctx.logger.debug('Attempting to start instance: {0}.)'
                          .format(instance_id))
 
-        try:
-            self.execute(self.client.start_instances,
-                         dict(instance_ids=instance_id),
-                         raise_on_falsy=True)
-        except (exception.EC2ResponseError,
-                exception.BotoServerError) as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+        self._change_instance_state(self.client.start_instances, instance_id)
 
         ctx.logger.debug('Attempted to start instance {0}.'
                          .format(instance_id))
@@ -149,6 +146,16 @@ class Instance(AwsBaseNode):
             return True
         return False
 
+    def _wait_for_instance_started(self, state_waiter, private_key_path):
+        for poll in state_waiter.polls():
+            if not poll:
+                continue
+            self.invalidate_describe_cache()
+            if self._check_if_instance_started(
+                    self.resource_id, private_key_path):
+                return True
+        return False
+
     def start_helper(self,
                      args=None,
                      start_retry_interval=30,
@@ -159,13 +166,23 @@ class Instance(AwsBaseNode):
                 'Attempting to start instance {0}.'
                 .format(self.cloudify_node_instance_id))
 
-        if self.use_external_resource_naively() or \
-                self.start(args, start_retry_interval, private_key_path):
+        if self.use_external_resource_naively():
             return self.post_start()
 
+        if ctx.operation.retry_number == 0:
+            self.start_transition()
+        state_waiter = self.get_waiter('start')
+        if self.start(args, start_retry_interval, private_key_path) or \
+                self._wait_for_instance_started(state_waiter,
+                                                private_key_path):
+            self.end_transition('start')
+            return self.post_start()
+
+        # Once start times were recorded, they replace the fixed interval.
         return ctx.operation.retry(
                 message='Waiting server to be running. Retrying...',
-                retry_after=start_retry_interval)
+                retry_after=state_waiter.retry_after
+                if state_waiter.typical else start_retry_interval)
 
     def _get_private_key(self, private_key_path):
         pk_node_by_rel = \
@@ -224,13 +241,7 @@ class Instance(AwsBaseNode):
 
         instance_id = self.resource_id
 
-        try:
-            self.execute(self.client.stop_instances,
-                         dict(instance_ids=instance_id),
-                         raise_on_falsy=True)
-        except (exception.EC2ResponseError,
-                exception.BotoServerError) as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+        self._change_instance_state(self.client.stop_instances, instance_id)
 
         if self._get_instance_state() == constants.INSTANCE_STATE_STOPPED:
             return True
@@ -241,13 +252,8 @@ class Instance(AwsBaseNode):
 
         instance_id = self.resource_id
 
-        try:
-            self.execute(self.client.terminate_instances,
-                         dict(instance_ids=instance_id),
-                         raise_on_falsy=True)
-        except (exception.EC2ResponseError,
-                exception.BotoServerError) as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+        self._change_instance_state(self.client.terminate_instances,
+                                    instance_id)
 
         if self._get_instance_state() == \
                 constants.INSTANCE_STATE_TERMINATED:
@@ -270,10 +276,44 @@ class Instance(AwsBaseNode):
         return ctx.operation.retry(
                 message='Waiting server to terminate. Retrying...')
 
+    def _change_instance_state(self, change_state_function, instance_id):
+        """Starts, stops or terminates an instance. If aws_config has a
+        state_change_batch_window, the request is sent together with the
+        requests of other operations on this host.
+        """
+
+        def change_state(instance_ids):
+            self.execute(change_state_function,
+                         dict(instance_ids=instance_ids),
+                         raise_on_falsy=True)
+
+        state_change_batch = batch.InstanceStateChangeBatch.from_aws_config(
+                utils.get_aws_config(),
+                utils.get_api_name(change_state_function))
+
+        try:
+            if state_change_batch:
+                state_change_batch.request(instance_id, change_state)
+            else:
+                change_state(instance_id)
+        except (exception.EC2ResponseError,
+                exception.BotoServerError) as e:
+            raise NonRecoverableError('{0}'.format(str(e)))
+        finally:
+            # The batch may have been sent by another operation.
+            self.invalidate_describe_cache()
+
     def _run_instances_if_needed(self, create_args):
 
         if ctx.operation.retry_number == 0:
 
+            run_instances_batch = batch.RunInstancesBatch.from_parameters(
+                    create_args,
+                    ctx.node.properties.get('run_instances_batch_window'))
+            if run_instances_batch:
+                return self._run_instances_in_batch(run_instances_batch,
+                                                    create_args)
+
             try:
                 reservation = self.execute(self.client.run_instances,
                                            create_args, raise_on_falsy=True)
@@ -302,6 +342,28 @@ class Instance(AwsBaseNode):
             return instances[0].id
         return self.resource_id
 
+    def _run_instances_in_batch(self, run_instances_batch, create_args):
+
+        def run_instances(count, client_token):
+            batch_args = dict(create_args,
+                              min_count=count,
+                              max_count=count,
+                              client_token=client_token)
+            try:
+                return self.execute(self.client.run_instances,
+                                    batch_args, raise_on_falsy=True)
+            except (exception.EC2ResponseError,
+                    exception.BotoServerError) as e:
+                raise NonRecoverableError('{0}'.format(str(e)))
+
+        reservation_id, instance_id, launch_index = \
+            run_instances_batch.run(run_instances)
+
+        self.resource_id = instance_id
+        ctx.instance.runtime_properties['reservation_id'] = reservation_id
+        ctx.instance.runtime_properties['launch_index'] = launch_index
+        return instance_id
+
     def _instance_created_assign_runtime_properties(self):
         self._assign_runtime_properties_to_instance(
                 runtime_properties=constants.
@@ -309,16 +371,18 @@ class Instance(AwsBaseNode):
 
     def _assign_runtime_properties_to_instance(self, runtime_properties):
 
+        instance_object = self._get_instance_snapshot()
+
         for property_name in runtime_properties:
             if 'ip' is property_name:
                 ctx.instance.runtime_properties[property_name] = \
-                    self._get_instance_attribute('private_ip_address')
+                    instance_object.private_ip_address
             elif 'public_ip_address' is property_name:
                 ctx.instance.runtime_properties[property_name] = \
-                    self._get_instance_attribute('ip_address')
+                    instance_object.ip_address
             else:
                 ctx.instance.runtime_properties[property_name] = \
-                    self._get_instance_attribute(property_name)
+                    getattr(instance_object, property_name)
 
     def modify_attributes(self, new_attributes, args=None, **_):
 
@@ -351,6 +415,21 @@ class Instance(AwsBaseNode):
         :raises NonRecoverableError if no instance is found.
         """
 
+        return getattr(self._get_instance_snapshot(attribute), attribute)
+
+    def _get_instance_snapshot(self, attribute='state'):
+        """Gets the boto object that represents the EC2 Instance,
+        describing it only once until a call through execute changes it.
+
+        :param attribute: The attribute the caller is after, for errors.
+        :returns a boto object representing an EC2 instance.
+        :raises NonRecoverableError if constants.EXTERNAL_RESOURCE_ID not set
+        :raises NonRecoverableError if no instance is found.
+        """
+
+        if self._instance_snapshot is not None:
+            return self._instance_snapshot
+
         if constants.EXTERNAL_RESOURCE_ID not in \
                 ctx.instance.runtime_properties:
             raise NonRecoverableError(
@@ -382,8 +461,12 @@ class Instance(AwsBaseNode):
                         'instance id {0} is not in the account.'
                         .format(instance_id))
 
-        attribute = getattr(instance_object, attribute)
-        return attribute
+        self._instance_snapshot = instance_object
+        return instance_object
+
+    def invalidate_describe_cache(self):
+        super(Instance, self).invalidate_describe_cache()
+        self._instance_snapshot = None
 
     def _handle_userdata(self, parameters):
 
@@ -525,6 +608,11 @@ class Instance(AwsBaseNode):
         :returns an ID of a an EC2 Instance or None.
         """
 
+        instance = deployment_prefetch.lookup(
+                self.client.get_all_reservations, instance_id)
+        if instance is not None:
+            return instance
+
         instance = self._get_all_instances(list_of_instance_ids=instance_id)
 
         return instance[0] if instance else instance
@@ -532,40 +620,47 @@ class Instance(AwsBaseNode):
     def _get_instances_from_reservation_id(self):
 
         try:
-            reservations = self.client.get_all_instances(
-                    filters={
+            reservations = call_aws_api(
+                    self.client.get_all_instances,
+                    dict(filters={
                         'reservation-id':
                             ctx.instance.runtime_properties[
                                 'reservation_id']
-                    })
+                    }))
         except (exception.EC2ResponseError,
                 exception.BotoServerError) as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+            raise retry.escalate(e)
 
         if len(reservations) < 1:
             return None
 
-        return reservations[0].instances
+        launch_index = ctx.instance.runtime_properties.get('launch_index')
+        if launch_index is None:
+            return reservations[0].instances
+
+        return [instance for instance in reservations[0].instances
+                if int(instance.ami_launch_index) == launch_index]
 
     def _get_all_instances(self, list_of_instance_ids=None):
         """Returns a list of instance objects for a list of instance IDs.
 
-        :returns a list of instance objects.
+        :returns a list of instance objects, or None if an instance
+            was not found.
         :raises NonRecoverableError: If Boto errors.
+        :raises RecoverableError: If AWS kept throttling the request.
         """
 
         try:
-            reservations = self.client.get_all_reservations(
-                    list_of_instance_ids)
+            reservations = call_aws_api(
+                    self.client.get_all_reservations,
+                    dict(instance_ids=list_of_instance_ids))
         except exception.EC2ResponseError as e:
-            if 'InvalidInstanceID.NotFound' in e:
-                instances = [instance for res in
-                             self.client.get_all_reservations()
-                             for instance in res.instances]
-                utils.log_available_resources(instances)
+            if constants.INSTANCE['NOT_FOUND_ERROR'] not in str(e):
+                raise retry.escalate(e)
+            self._log_available_instances()
             return None
         except exception.BotoServerError as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+            raise retry.escalate(e)
 
         instances = []
 
@@ -575,6 +670,15 @@ class Instance(AwsBaseNode):
 
         return instances
 
+    def _log_available_instances(self):
+        reservations = utils.list_available_resources(
+                self.client.get_all_reservations,
+                utils.get_diagnostics_filters(
+                        ctx.instance.runtime_properties.get('vpc_id')))
+        utils.log_available_resources(
+                instance for reservation in reservations
+                for instance in reservation.instances)
+
     def modify_helper(self, new_attributes, args=None):
 
         ctx.logger.info(
@@ -632,8 +736,7 @@ class Instance(AwsBaseNode):
 
         :returns a state code from a boto object representing an EC2 Image.
         """
-        state = self._get_instance_attribute('state_code')
-        return state
+        return self._get_instance_snapshot('state_code').state_code
 
     def _get_image(self, image_id):
         """Gets the boto object that represents the AMI image for image id.
@@ -655,6 +758,8 @@ class Instance(AwsBaseNode):
         return image_object
 
     def get_resource(self):
+        if not self.is_valid_resource_id():
+            return None
         return self._get_instance_from_id(self.resource_id)
 
     def _create_block_device_mapping(self, block_device_type_defs):
@@ -20,7 +20,7 @@ import os
 from cloudify_aws import utils, constants
 from cloudify import ctx
 from cloudify.exceptions import NonRecoverableError
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify_aws.base import AwsBaseNode
 
 
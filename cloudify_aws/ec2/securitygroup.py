@@ -14,6 +14,7 @@
 #    * limitations under the License.
 
 # Built-in Imports
+import collections
 
 # Third-party Imports
 from boto import exception
@@ -21,10 +22,98 @@ import ipaddress
 
 # Cloudify imports
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship
-from cloudify_aws import utils, constants
-from cloudify.exceptions import NonRecoverableError
+from cloudify_aws import utils, constants, compaction
+from cloudify.exceptions import NonRecoverableError, RecoverableError
+
+
+# Parsed grants by their text, shared by all of the rule keys.
+_grant_cache = {}
+
+
+def parse_grant(grant):
+    """Classifies a rule grant the way SecurityGroup.format_rule does, as
+    a cidr_ip or a src_group_id, and returns it in a canonical form, so
+    that grants read from AWS compare equal to grants from a blueprint.
+
+    :param grant: string. A cidr_ip, an IP address or a security group.
+    :return: a tuple of the grant kind and the canonical grant.
+    """
+
+    if grant in _grant_cache:
+        return _grant_cache[grant]
+
+    text = grant.decode('utf-8') if isinstance(grant, str) \
+        else unicode(grant)
+    try:
+        parsed = ('cidr_ip', str(ipaddress.ip_network(text)))
+    except (ipaddress.AddressValueError, ValueError):
+        try:
+            parsed = ('cidr_ip',
+                      str(ipaddress.ip_network(ipaddress.ip_address(text))))
+        except (ipaddress.AddressValueError, ValueError):
+            if grant != '0.0.0.0/0':
+                parsed = ('src_group_id', text)
+            else:
+                parsed = ('cidr_ip', text)
+
+    if len(_grant_cache) >= constants.SECURITY_GROUP_GRANT_CACHE_SIZE:
+        _grant_cache.clear()
+    _grant_cache[grant] = parsed
+    return parsed
+
+
+def get_src_group_id(src_group):
+    """Returns the id of a boto security group or of a group grant.
+    """
+    return getattr(src_group, 'group_id', None) or src_group.id
+
+
+def normalize_port(port):
+    try:
+        return int(port)
+    except (TypeError, ValueError):
+        return port
+
+
+class RuleKey(collections.namedtuple(
+        'RuleKey',
+        'ip_protocol from_port to_port grant_kind grant egress')):
+    """A hashable, normalized security group rule, for finding the rules
+    of a blueprint that a group already has.
+    """
+
+    @classmethod
+    def create(cls, protocol, from_port, to_port, grant, egress=False):
+        grant_kind, grant = parse_grant(grant)
+        return cls(unicode(protocol).lower(),
+                   normalize_port(from_port),
+                   normalize_port(to_port),
+                   grant_kind,
+                   grant,
+                   bool(egress))
+
+    @classmethod
+    def from_grant(cls, ip_permission, grant, egress=False):
+        """Returns the key of a grant of a rule of a boto group. A group
+        grant is keyed by the id of its group.
+        """
+        return cls.create(ip_permission.ip_protocol,
+                          ip_permission.from_port,
+                          ip_permission.to_port,
+                          grant.cidr_ip or get_src_group_id(grant),
+                          egress=egress)
+
+    @classmethod
+    def from_rule(cls, rule):
+        """Returns the key of a rule formatted by format_rule.
+        """
+        return cls.create(rule['ip_protocol'],
+                          rule['from_port'],
+                          rule['to_port'],
+                          rule.get('cidr_ip') or rule.get('src_group_id'),
+                          egress=rule.get('egress', False))
 
 
 @operation
@@ -44,8 +133,8 @@ def start(args=None, **_):
 
 
 @operation
-def update_rules(rules=[], **_):
-    return SecurityGroup().update_rules(rules)
+def update_rules(rules=[], reconcile=False, dry_run=False, **_):
+    return SecurityGroup().update_rules(rules, reconcile, dry_run)
 
 
 @operation
@@ -69,24 +158,27 @@ class SecurityGroup(AwsBaseNode):
         }
 
     def get_resource(self):
+        """Looks the group up by ID if resource_id is a group ID, and
+        otherwise by name.
+        """
 
-        try:
-            resource = self.filter_for_single_resource(
+        if not self.resource_id:
+            return None
+
+        if utils.is_resource_id(self.resource_id,
+                                constants.SECURITYGROUP['ID_FORMAT']):
+            return self.filter_for_single_resource(
                 self.get_all_handler['function'],
                 {self.get_all_handler['argument']: self.resource_id},
                 not_found_token=self.not_found_error
             )
-        except Exception as e:
-            if 'InvalidGroupId.Malformed' not in str(e):
-                raise NonRecoverableError(str(e))
-            else:
-                resource = self.filter_for_single_resource(
-                    self.get_all_handler['function'],
-                    {'groupnames': self.resource_id},
-                    not_found_token=self.not_found_error
-                )
 
-        return resource
+        return self.filter_for_single_resource(
+            self.get_all_handler['function'],
+            {'groupnames': self.resource_id},
+            not_found_token=self.not_found_error,
+            aws_id_attribute='name'
+        )
 
     def create(self, args=None, **_):
 
@@ -152,7 +244,19 @@ class SecurityGroup(AwsBaseNode):
 
         return list_of_vpcs[0] if list_of_vpcs else None
 
-    def update_rules(self, rules):
+    def update_rules(self, rules, reconcile=False, dry_run=False):
+        """Adds the missing rules of the group. With reconcile, also revokes
+        the rules that the group has but that are not desired. Egress
+        rules are only revoked if at least one egress rule is desired, so
+        that the default egress rule of a VPC group is kept otherwise.
+
+        :param rules: A list of rules in addition to the node's rules and
+            the rules of its relationships.
+        :param reconcile: Whether to revoke rules that are not desired.
+        :param dry_run: Whether to only log the changes.
+        :return: a dict of the rules to authorize and to revoke.
+        """
+
         ctx.logger.debug('New rules for update: {0}'.format(rules))
 
         security_group = self.get_resource()
@@ -160,7 +264,34 @@ class SecurityGroup(AwsBaseNode):
         if not security_group:
             return False
 
-        self._create_group_rules(security_group, rules)
+        if not reconcile:
+            to_authorize = self._resolve_src_groups(
+                security_group,
+                self.rules_cleanup(security_group,
+                                   self._get_desired_rules(rules)))
+            to_revoke = []
+        else:
+            to_authorize, to_revoke = self.rules_delta(
+                security_group,
+                self._resolve_src_groups(
+                    security_group,
+                    self._format_rules(self._get_desired_rules(rules))))
+
+        delta = {
+            'authorize': [self._describe_rule(r) for r in to_authorize],
+            'revoke': [self._describe_rule(r) for r in to_revoke]
+        }
+        ctx.logger.info(
+            '{0} security group {1}: {2} rules to authorize, {3} rules to '
+            'revoke. {4}'.format(
+                'Would update' if dry_run else 'Updating',
+                security_group.id, len(to_authorize), len(to_revoke), delta))
+
+        if not dry_run:
+            self.authorize_rules(security_group, to_authorize)
+            self.revoke_rules(security_group, to_revoke)
+
+        return delta
 
     def _get_rules_from_relationship(self):
 
@@ -172,6 +303,10 @@ class SecurityGroup(AwsBaseNode):
                 rules += rel.target.node.properties['rule']
         return rules
 
+    def _get_desired_rules(self, rules):
+        return rules + ctx.node.properties['rules'] + \
+            self._get_rules_from_relationship()
+
     def _create_group_rules(self, group_object, rules=[]):
         """For each rule listed in the blueprint,
         this will add the rule to the group with the given id.
@@ -181,55 +316,242 @@ class SecurityGroup(AwsBaseNode):
         Could not locate the security group ID#.
         """
 
-        rules_to_authorize = rules + ctx.node.properties['rules']
-        relatreule = self._get_rules_from_relationship()
+        self.authorize_rules(
+            group_object,
+            self._resolve_src_groups(
+                group_object,
+                self.rules_cleanup(group_object,
+                                   self._get_desired_rules(rules))))
 
-        if relatreule:
-            rules_to_authorize += relatreule
+    def _resolve_src_groups(self, group_object, rules):
+        """Replaces the src_group_id of rules with the src_group object.
+        """
 
-        for rule in self.rules_cleanup(group_object, rules_to_authorize):
+        src_groups = {}
+        for rule in rules:
 
-            if 'src_group_id' in rule:
+            if 'src_group_id' not in rule:
+                continue
 
+            src_group_id = rule.pop('src_group_id')
+            if src_group_id not in src_groups:
                 if not group_object.vpc_id:
-                    src_group_object = self.get_resource()
+                    src_groups[src_group_id] = self.get_resource()
                 else:
-                    src_group_object = \
+                    src_groups[src_group_id] = \
                         self._get_vpc_security_group_from_name(
-                            rule['src_group_id'])
+                            src_group_id, group_object.vpc_id)
+
+            if not src_groups[src_group_id]:
+                raise NonRecoverableError(
+                        'Could not locate the security group ID#: {0}.'
+                        .format(src_group_id))
+
+            rule['src_group'] = src_groups[src_group_id]
 
-                if not src_group_object:
-                    raise NonRecoverableError(
-                            'Could not locate the security group ID#: {0}.'
-                            .format(rule['src_group_id']))
+        return rules
+
+    def rules_delta(self, group, rules):
+        """Compares the desired rules with the rules of the group.
+
+        :param group: a boto.ec2.securitygroup object.
+        :param rules: A list of rules formatted by format_rule, with a
+            src_group object instead of a src_group_id.
+        :return: a tuple of the rules to authorize and the rules of the
+            group to revoke.
+        """
 
-                del rule['src_group_id']
-                rule['src_group'] = src_group_object
-            if rule.pop('egress', False):
-                self.authorize_egress(group_object.id, rule)
+        existing_rules = []
+        for egress, ip_permission, grant in self._get_grants(group):
+            rule = {
+                'ip_protocol': ip_permission.ip_protocol,
+                'from_port': ip_permission.from_port,
+                'to_port': ip_permission.to_port
+            }
+            if grant.cidr_ip:
+                rule['cidr_ip'] = grant.cidr_ip
+            else:
+                rule['src_group'] = grant
+            if egress:
+                rule['egress'] = True
+            existing_rules.append(
+                (rule, RuleKey.from_grant(ip_permission, grant, egress)))
+
+        existing_keys = collections.Counter(
+            rule_key for _, rule_key in existing_rules)
+        desired_keys = collections.Counter()
+        to_authorize = []
+        for rule in rules:
+            src_group = rule.get('src_group')
+            rule_key = RuleKey.create(
+                rule['ip_protocol'], rule['from_port'], rule['to_port'],
+                rule.get('cidr_ip') or get_src_group_id(src_group),
+                egress=rule.get('egress', False))
+            desired_keys[rule_key] += 1
+            if existing_keys[rule_key] > 0:
+                existing_keys[rule_key] -= 1
             else:
-                self.authorize(group_object, rule)
+                to_authorize.append(rule)
 
-    def authorize(self, group_object, rule):
+        reconcile_egress = any(rule.get('egress') for rule in rules)
+        to_revoke = []
+        for rule, rule_key in existing_rules:
+            if desired_keys[rule_key] > 0:
+                desired_keys[rule_key] -= 1
+            elif reconcile_egress or not rule.get('egress'):
+                to_revoke.append(rule)
 
-        try:
-            group_object.authorize(**rule)
-        except (exception.EC2ResponseError,
-                exception.BotoServerError) as e:
-            raise NonRecoverableError('{0}'.format(str(e)))
+        return to_authorize, to_revoke
+
+    @staticmethod
+    def _get_grants(group):
+        """Yields whether it is egress, the rule and the grant of every
+        grant of a boto group.
+        """
+
+        for egress, ip_permissions in ((False, group.rules),
+                                       (True, group.rules_egress)):
+            for ip_permission in ip_permissions:
+                for grant in ip_permission.grants:
+                    yield egress, ip_permission, grant
 
-    def authorize_egress(self, group_id, rule):
-        authorize_egress_args = {'group_id': group_id}
-        authorize_egress_args.update(**rule)
-        self.execute(
-            self.client.authorize_security_group_egress, authorize_egress_args,
-            raise_on_falsy=True)
-
-    def _get_vpc_security_group_from_name(self, name):
-        groups = self.get_all_matching()
-        for group in groups:
-            if group.name == name:
-                return group
+    def authorize_rules(self, group_object, rules):
+        """Authorizes rules with one AuthorizeSecurityGroupIngress or
+        AuthorizeSecurityGroupEgress call per direction and chunk of
+        rules. If a call fails, its rules are authorized one by one, so
+        that the failure of each rule is reported.
+
+        :param group_object: The group object that you want to add rules to.
+        :param rules: A list of rules formatted by format_rule, with a
+            src_group object instead of a src_group_id.
+        :raises NonRecoverableError: if any of the rules failed.
+        :raises RecoverableError: if all of the failures were transient.
+        """
+
+        self._apply_rules(group_object, rules, 'authorize')
+
+    def revoke_rules(self, group_object, rules):
+        """Revokes rules in batches, like authorize_rules.
+        """
+
+        self._apply_rules(group_object, rules, 'revoke')
+
+    def _apply_rules(self, group_object, rules, action):
+
+        chunk_size = constants.SECURITY_GROUP_PERMISSIONS_PER_REQUEST
+        failures = []
+
+        for egress in (False, True):
+            direction_rules = [rule for rule in rules
+                               if bool(rule.get('egress')) == egress]
+            for start in range(0, len(direction_rules), chunk_size):
+                chunk = direction_rules[start:start + chunk_size]
+                try:
+                    self._send_permissions(group_object, chunk, egress, action)
+                    continue
+                except (NonRecoverableError, RecoverableError) as e:
+                    if len(chunk) == 1:
+                        failures.append((chunk[0], e))
+                        continue
+                for rule in chunk:
+                    try:
+                        self._send_permissions(
+                            group_object, [rule], egress, action)
+                    except (NonRecoverableError, RecoverableError) as e:
+                        failures.append((rule, e))
+
+        if not failures:
+            return
+
+        message = 'Unable to {0} {1} of {2} rules: {3}'.format(
+            action, len(failures), len(rules),
+            '; '.join('{0}: {1}'.format(self._describe_rule(rule), str(e))
+                      for rule, e in failures))
+        if all(isinstance(e, RecoverableError) for _, e in failures):
+            raise RecoverableError(message)
+        raise NonRecoverableError(message)
+
+    def _send_permissions(self, group_object, rules, egress, action):
+
+        api_action = '{0}SecurityGroup{1}'.format(
+            action.capitalize(), 'Egress' if egress else 'Ingress')
+
+        def send_permissions(params):
+            return self.client.get_status(api_action, params, verb='POST')
+        # Named after the API, for the rate limits and the describe cache.
+        send_permissions.__name__ = '{0}_security_group_{1}'.format(
+            action, 'egress' if egress else 'ingress')
+
+        params = self._ip_permissions_params(group_object, rules, egress)
+        self.execute(send_permissions, dict(params=params),
+                     raise_on_falsy=True)
+
+        if egress:
+            return
+        # Like boto's SecurityGroup.authorize and revoke, keep the local
+        # copy of the group's ingress rules up to date.
+        update_rule = group_object.add_rule if action == 'authorize' \
+            else group_object.remove_rule
+        for rule in rules:
+            src_group = rule.get('src_group')
+            update_rule(
+                rule['ip_protocol'], rule.get('from_port'),
+                rule.get('to_port'),
+                getattr(src_group, 'name', None),
+                getattr(src_group, 'owner_id', None),
+                None if src_group else rule.get('cidr_ip'),
+                get_src_group_id(src_group) if src_group else None)
+
+    @staticmethod
+    def _ip_permissions_params(group_object, rules, egress=False):
+        """Builds the query parameters of a request that authorizes
+        several rules, one IpPermissions entry per rule.
+        """
+
+        by_group_id = egress or bool(group_object.vpc_id)
+        params = {}
+        if by_group_id:
+            params['GroupId'] = group_object.id
+        else:
+            params['GroupName'] = group_object.name
+
+        for index, rule in enumerate(rules, 1):
+            prefix = 'IpPermissions.{0}.'.format(index)
+            params[prefix + 'IpProtocol'] = rule['ip_protocol']
+            if rule.get('from_port') is not None:
+                params[prefix + 'FromPort'] = rule['from_port']
+            if rule.get('to_port') is not None:
+                params[prefix + 'ToPort'] = rule['to_port']
+            src_group = rule.get('src_group')
+            if src_group:
+                if by_group_id:
+                    params[prefix + 'Groups.1.GroupId'] = \
+                        get_src_group_id(src_group)
+                else:
+                    params[prefix + 'Groups.1.GroupName'] = src_group.name
+                if getattr(src_group, 'owner_id', None):
+                    params[prefix + 'Groups.1.UserId'] = src_group.owner_id
+            else:
+                params[prefix + 'IpRanges.1.CidrIp'] = rule['cidr_ip']
+
+        return params
+
+    @staticmethod
+    def _describe_rule(rule):
+        src_group = rule.get('src_group')
+        return '{0} {1}-{2} {3}{4}'.format(
+            rule['ip_protocol'], rule.get('from_port'), rule.get('to_port'),
+            get_src_group_id(src_group) if src_group
+            else rule.get('cidr_ip'),
+            ' egress' if rule.get('egress') else '')
+
+    def _get_vpc_security_group_from_name(self, name, vpc_id=None):
+        filters = {'group-name': name}
+        if vpc_id:
+            filters['vpc-id'] = vpc_id
+        for group in self.query(self.client.get_all_security_groups,
+                                filters):
+            return group
         return None
 
     def _delete_security_group(self, group_id):
@@ -296,22 +618,13 @@ class SecurityGroup(AwsBaseNode):
 
         return rule_format
 
-    def rules_cleanup(self, group, rules):
-        """
-        Make sure that no rule in rules already
-        exists in group.rules, if so, remove it from new rules.
-
-        :param group: a boto.ec2.securitygroup object.
-        :param rules:
-        :return: clean_rules (a list of cleaned, non-conflicting rules.)
-        """
-
-        clean_rules = []
+    def _format_rules(self, rules):
+        new_rules = []
         for rule in rules:
             if rule.get('cidr_ip') and rule.get('src_group_id'):
                 raise NonRecoverableError(
                     'You cannot pass both cidr_ip and src_group_id.')
-            clean_rules.append(
+            new_rules.append(
                 self.format_rule(rule['ip_protocol'],
                                  rule['from_port'],
                                  rule['to_port'],
@@ -319,23 +632,47 @@ class SecurityGroup(AwsBaseNode):
                                  rule.get('src_group_id'),
                                  egress=rule.get('egress', False)))
 
-        for ip_permission in group.rules:
-            for grant in ip_permission.grants:
-                existing_rule = self.format_rule(ip_permission.ip_protocol,
-                                                 ip_permission.from_port,
-                                                 ip_permission.to_port,
-                                                 str(grant))
-                if existing_rule in clean_rules:
-                    clean_rules.remove(existing_rule)
-        for ip_permission in group.rules_egress:
-            for grant in ip_permission.grants:
-                existing_rule = self.format_rule(ip_permission.ip_protocol,
-                                                 ip_permission.from_port,
-                                                 ip_permission.to_port,
-                                                 str(grant),
-                                                 egress=True)
-                if existing_rule in clean_rules:
-                    clean_rules.remove(existing_rule)
+        if ctx.node.properties.get('compact_rules'):
+            new_rules = self.compact_rules(new_rules)
+        return new_rules
+
+    @staticmethod
+    def compact_rules(rules):
+        """Merges rules formatted by format_rule that have the same
+        protocol and direction and contiguous ports or CIDRs.
+        """
+
+        compacted = compaction.compact(
+            rules, 'cidr_ip', 'from_port', 'to_port', 'ip_protocol',
+            lambda rule: (unicode(rule['ip_protocol']).lower(),
+                          bool(rule.get('egress'))))
+        ctx.logger.info('Compacted {0} security group rules into {1}.'
+                        .format(len(rules), len(compacted)))
+        return compacted
+
+    def rules_cleanup(self, group, rules):
+        """
+        Make sure that no rule in rules already
+        exists in group.rules, if so, remove it from new rules.
+
+        :param group: a boto.ec2.securitygroup object.
+        :param rules:
+        :return: clean_rules (a list of cleaned, non-conflicting rules.)
+        """
+
+        new_rules = self._format_rules(rules)
+
+        existing_rules = collections.Counter(
+            RuleKey.from_grant(ip_permission, grant, egress)
+            for egress, ip_permission, grant in self._get_grants(group))
+
+        clean_rules = []
+        for rule in new_rules:
+            key = RuleKey.from_rule(rule)
+            if existing_rules[key] > 0:
+                existing_rules[key] -= 1
+            else:
+                clean_rules.append(rule)
 
         return clean_rules
 
@@ -345,7 +682,7 @@ class SecurityGroupUsesRuleConnection(AwsBaseRelationship):
     def __init__(self, client=None):
         super(SecurityGroupUsesRuleConnection, self).__init__(client=client)
         self.source_get_all_handler = {
-            'function': self.client.get_all_security_groups(),
+            'function': self.client.get_all_security_groups,
             'argument':
                 '{0}_ids'.format(constants.SECURITYGROUP['AWS_RESOURCE_TYPE'])
         }
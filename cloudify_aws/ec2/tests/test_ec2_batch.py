@@ -0,0 +1,238 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import shutil
+import tempfile
+import testtools
+import threading
+
+# Third Party Imports
+import mock
+from moto import mock_ec2
+
+# Cloudify Imports is imported and used in operations
+from cloudify_aws.ec2 import batch, instance
+from cloudify.state import current_ctx
+from cloudify_aws import constants
+from cloudify.mocks import MockCloudifyContext
+from cloudify.exceptions import NonRecoverableError
+
+TEST_AMI_IMAGE_ID = 'ami-e214778a'
+TEST_INSTANCE_TYPE = 't1.micro'
+
+
+class TestRunInstancesBatch(testtools.TestCase):
+
+    def setUp(self):
+        super(TestRunInstancesBatch, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = mock.patch(
+            'cloudify_aws.utils.tempfile.gettempdir',
+            return_value=directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def mock_ctx(self, node_instance_id, window=0):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: {},
+            'use_external_resource': False,
+            'resource_id': '',
+            'name': '',
+            'tags': {},
+            'image_id': TEST_AMI_IMAGE_ID,
+            'instance_type': TEST_INSTANCE_TYPE,
+            'cloudify_agent': {},
+            'agent_config': {},
+            'use_password': False,
+            'run_instances_batch_window': window,
+            'parameters': {}
+        }
+        ctx = MockCloudifyContext(
+                node_id=node_instance_id,
+                node_name='server',
+                deployment_id='test_run_instances_batch',
+                properties=test_properties,
+                operation={'retry_number': 0},
+                provider_context={'resources': {}}
+        )
+        ctx.node.type_hierarchy = ['cloudify.nodes.Compute']
+        return ctx
+
+    def reservation(self, count):
+        instances = [mock.Mock(id='i-{0}'.format(index),
+                               ami_launch_index=str(index))
+                     for index in reversed(range(count))]
+        return mock.Mock(id='r-1', instances=instances)
+
+    def test_from_parameters(self):
+        """ Tests that a batch is only used when batching is enabled
+            and the parameters can be shared by several instances.
+        """
+        current_ctx.set(ctx=self.mock_ctx('server_1'))
+        parameters = {'image_id': TEST_AMI_IMAGE_ID}
+        self.assertIsNone(
+                batch.RunInstancesBatch.from_parameters(parameters, 0))
+        self.assertIsNone(batch.RunInstancesBatch.from_parameters(
+                dict(parameters, private_ip_address='10.0.0.4'), 5))
+        first = batch.RunInstancesBatch.from_parameters(parameters, 5)
+        second = batch.RunInstancesBatch.from_parameters(parameters, 5)
+        other = batch.RunInstancesBatch.from_parameters(
+                dict(parameters, instance_type='m3.medium'), 5)
+        self.assertEqual(first.state.path, second.state.path)
+        self.assertNotEqual(first.state.path, other.state.path)
+
+    def test_siblings_share_one_call(self):
+        """ Tests that node instances that join the same batch
+            are launched by one call and get their instances
+            by node instance id and launch index.
+        """
+        run_instances = mock.Mock(return_value=self.reservation(2))
+        results = {}
+
+        def create(node_instance_id):
+            current_ctx.set(ctx=self.mock_ctx(node_instance_id))
+            run_instances_batch = batch.RunInstancesBatch.from_parameters(
+                    {'image_id': TEST_AMI_IMAGE_ID}, 0.5)
+            results[node_instance_id] = \
+                run_instances_batch.run(run_instances)
+
+        threads = [threading.Thread(target=create, args=(name,))
+                   for name in ['server_b', 'server_a']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, run_instances.call_count)
+        self.assertEqual(2, run_instances.call_args[0][0])
+        self.assertEqual(('r-1', 'i-0', 0), results['server_a'])
+        self.assertEqual(('r-1', 'i-1', 1), results['server_b'])
+
+        current_ctx.set(ctx=self.mock_ctx('server_a'))
+        run_instances_batch = batch.RunInstancesBatch.from_parameters(
+                {'image_id': TEST_AMI_IMAGE_ID}, 0.5)
+        self.assertEqual(('r-1', 'i-0', 0),
+                         run_instances_batch.run(run_instances))
+        self.assertEqual(1, run_instances.call_count)
+
+    @mock_ec2
+    def test_instance_create_in_batch(self):
+        """ Tests that Instance launches its instance through the batch
+            and records the launch index.
+        """
+        ctx = self.mock_ctx('server_1', window=0.1)
+        current_ctx.set(ctx=ctx)
+        test_instance = instance.Instance()
+        instance_id = test_instance._run_instances_if_needed(
+                {'image_id': TEST_AMI_IMAGE_ID,
+                 'instance_type': TEST_INSTANCE_TYPE})
+
+        self.assertEqual(instance_id, test_instance.resource_id)
+        self.assertEqual(0, ctx.instance.runtime_properties['launch_index'])
+
+        with mock.patch.object(test_instance.client, 'get_all_instances',
+                               return_value=[self.reservation(2)]):
+            instances = test_instance._get_instances_from_reservation_id()
+        self.assertEqual(['i-0'], [i.id for i in instances])
+
+
+class TestInstanceStateChangeBatch(testtools.TestCase):
+
+    def setUp(self):
+        super(TestInstanceStateChangeBatch, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = mock.patch(
+            'cloudify_aws.utils.tempfile.gettempdir',
+            return_value=directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.aws_config = {'state_change_batch_window': 0.3}
+
+    def mock_ctx(self, node_instance_id):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: self.aws_config,
+            'use_external_resource': False,
+            'resource_id': ''
+        }
+        return MockCloudifyContext(
+                node_id=node_instance_id,
+                node_name='server',
+                deployment_id='test_instance_state_change_batch',
+                properties=test_properties)
+
+    def request_concurrently(self, instance_ids, change_state):
+        errors = {}
+
+        def stop(instance_id):
+            current_ctx.set(ctx=self.mock_ctx(instance_id))
+            state_change_batch = \
+                batch.InstanceStateChangeBatch.from_aws_config(
+                        self.aws_config, 'stop_instances')
+            try:
+                state_change_batch.request(instance_id, change_state)
+            except NonRecoverableError as e:
+                errors[instance_id] = str(e)
+
+        threads = [threading.Thread(target=stop, args=(instance_id,))
+                   for instance_id in instance_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_from_aws_config(self):
+        """ Tests that batching is disabled without a window
+            and that the batch is scoped by account, region and action.
+        """
+        current_ctx.set(ctx=self.mock_ctx('server_1'))
+        self.assertIsNone(batch.InstanceStateChangeBatch.from_aws_config(
+                {}, 'stop_instances'))
+        stop = batch.InstanceStateChangeBatch.from_aws_config(
+                self.aws_config, 'stop_instances')
+        start = batch.InstanceStateChangeBatch.from_aws_config(
+                self.aws_config, 'start_instances')
+        other_region = batch.InstanceStateChangeBatch.from_aws_config(
+                dict(self.aws_config, ec2_region_name='eu-west-1'),
+                'stop_instances')
+        self.assertEqual(3, len(set([stop.state.path, start.state.path,
+                                     other_region.state.path])))
+
+    def test_concurrent_requests_share_one_call(self):
+        """ Tests that requests made within the window are sent
+            in one call.
+        """
+        change_state = mock.Mock()
+        errors = self.request_concurrently(
+                ['i-1', 'i-2', 'i-3'], change_state)
+        self.assertEqual({}, errors)
+        change_state.assert_called_once_with(['i-1', 'i-2', 'i-3'])
+
+    def test_failed_call_is_split(self):
+        """ Tests that when the call for the batch fails, only the
+            request of the instance that caused the failure fails.
+        """
+
+        def change_state(instance_ids):
+            if 'i-bad' in instance_ids:
+                raise NonRecoverableError(
+                        'InvalidInstanceID.NotFound: i-bad')
+
+        errors = self.request_concurrently(['i-1', 'i-bad'], change_state)
+        self.assertEqual(['i-bad'], errors.keys())
+        self.assertIn('InvalidInstanceID.NotFound', errors['i-bad'])
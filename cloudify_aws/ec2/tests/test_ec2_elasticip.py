@@ -424,8 +424,12 @@ class TestElasticIP(testtools.TestCase):
         current_ctx.set(ctx=ctx)
         ctx.target.instance.runtime_properties['aws_resource_id'] = '0.0.0.0'
         ctx.source.instance.runtime_properties['public_ip_address'] = '0.0.0.0'
-        ex = self.assertRaises(NonRecoverableError,
-                               elasticip.disassociate, ctx=ctx)
+        # moto does not filter addresses by tag, so the addresses of the
+        # deployment that are logged are not listed.
+        with mock.patch('cloudify_aws.ec2.elasticip.utils'
+                        '.list_available_resources', return_value=[]):
+            ex = self.assertRaises(NonRecoverableError,
+                                   elasticip.disassociate, ctx=ctx)
         self.assertIn('InvalidAddress.NotFound', ex.message)
 
     @mock_ec2
@@ -441,9 +445,9 @@ class TestElasticIP(testtools.TestCase):
         ctx.source.instance.runtime_properties['public_ip_address'] = '0.0.0.0'
 
         with mock.patch(
-                'cloudify_aws.base.AwsBase.execute') \
-                as mock_get_target_resource:
-            mock_get_target_resource.side_effect = EC2ResponseError(
+                'cloudify_aws.ec2.elasticip.call_aws_api') \
+                as mock_call_aws_api:
+            mock_call_aws_api.side_effect = EC2ResponseError(
                     mock.Mock(return_value={'status': 404}),
                     'InvalidAddress.NotFound')
             ex = self.assertRaises(
@@ -452,6 +456,33 @@ class TestElasticIP(testtools.TestCase):
             self.assertIn(
                     'no matching elastic ip in account', ex.message)
 
+    def test_invalid_target_resource_lists_deployment_addresses(self):
+        """ Tests that the addresses listed when the target
+            address is not found are those of the deployment and
+            the domain of its VPC.
+        """
+
+        ctx = self.mock_relationship_context(
+                'test_invalid_target_resource_lists_deployment_addresses')
+        current_ctx.set(ctx=ctx)
+        ctx.target.instance.runtime_properties['aws_resource_id'] = '0.0.0.0'
+        ctx.target.instance.runtime_properties['vpc_id'] = 'vpc-abc1234'
+        client = mock.Mock()
+        client.get_all_addresses.return_value = []
+
+        with mock.patch(
+                'cloudify_aws.ec2.elasticip.call_aws_api') \
+                as mock_call_aws_api:
+            mock_call_aws_api.side_effect = EC2ResponseError(
+                    mock.Mock(return_value={'status': 400}),
+                    'InvalidAddress.NotFound')
+            output = elasticip.ElasticIPInstanceConnection(client=client)\
+                .get_target_resource()
+        self.assertIsNone(output)
+        client.get_all_addresses.assert_called_once_with(
+                filters={'tag:deployment_id': ctx.deployment.id,
+                         'domain': 'vpc'})
+
     @mock_ec2
     def test_invalid_source_resource(self):
         """ Tests that NonRecoverableError: Instance NotFound is
@@ -465,25 +496,43 @@ class TestElasticIP(testtools.TestCase):
         ctx.source.instance.runtime_properties['public_ip_address'] = '0.0.0.0'
 
         with mock.patch(
-                'cloudify_aws.base.AwsBase.execute') \
-                as mock_execute:
-            mock_execute.side_effect = EC2ResponseError(
+                'cloudify_aws.ec2.elasticip.call_aws_api') \
+                as mock_call_aws_api:
+            mock_call_aws_api.side_effect = EC2ResponseError(
                     mock.Mock(return_value={'status': 404}),
                     'InvalidInstanceID.NotFound')
             with mock.patch(
-                    'boto.ec2.connection.EC2Connection.get_all_instances') \
-                    as mock_get_all_instances:
+                    'boto.ec2.connection.EC2Connection'
+                    '.get_all_reservations') \
+                    as mock_get_all_reservations:
 
                 with self.assertRaisesRegexp(
                         EC2ResponseError,
                         'InvalidInstanceID.NotFound'):
-                    mock_get_all_instances.side_effect = EC2ResponseError(
+                    mock_get_all_reservations.side_effect = EC2ResponseError(
                             mock.Mock(return_value={'status': 404}),
                             'InvalidInstanceID.NotFound')
                     output = elasticip.ElasticIPInstanceConnection()\
                         .get_source_resource()
                     self.assertIsNone(output)
 
+    @mock_ec2
+    def test_get_source_resource_returns_instance(self):
+        """ Tests that the source instance is returned, and not
+            its reservation, when it is not prefetched.
+        """
+
+        ctx = self.mock_relationship_context(
+                'test_get_source_resource_returns_instance')
+        current_ctx.set(ctx=ctx)
+        instance_id = self.get_instance_id()
+        ctx.source.instance.runtime_properties['aws_resource_id'] = \
+            instance_id
+
+        output = elasticip.ElasticIPInstanceConnection()\
+            .get_source_resource()
+        self.assertEqual(instance_id, output.id)
+
     @mock_ec2
     def test_validation(self):
         """ Tests that creation_validation raises an error
@@ -402,6 +402,56 @@ class TestInstance(testtools.TestCase):
         state = instance_object.update()
         self.assertEqual(state, 'running')
 
+    @mock_ec2
+    def test_start_describes_once_per_state_check(self):
+        """ this tests that start reads the runtime properties and
+        the state from one describe, and describes again only after
+        the instance was started.
+        """
+
+        ctx = self.mock_ctx('test_start_describes_once_per_state_check')
+        current_ctx.set(ctx=ctx)
+
+        ec2_client = connection.EC2ConnectionClient().client()
+        reservation = ec2_client.run_instances(
+                TEST_AMI_IMAGE_ID, instance_type=TEST_INSTANCE_TYPE)
+        instance_id = reservation.instances[0].id
+        ctx.instance.runtime_properties['aws_resource_id'] = instance_id
+        ctx.instance.runtime_properties['reservation_id'] = reservation.id
+        ec2_client.stop_instances(instance_id)
+        test_instance = self.create_instance_for_checking()
+        with mock.patch.object(
+                test_instance.client, 'get_all_reservations',
+                wraps=test_instance.client.get_all_reservations) \
+                as describe:
+            test_instance.start()
+        self.assertEqual(2, describe.call_count)
+        self.assertEqual(
+                reservation.instances[0].private_ip_address,
+                ctx.instance.runtime_properties['ip'])
+
+    @mock_ec2
+    @mock.patch('cloudify_aws.waiter.time.sleep')
+    def test_start_helper_polls_before_retry(self, mock_sleep):
+        """ this tests that start_helper describes the instance again
+        in the operation before it retries the operation.
+        """
+
+        ctx = self.mock_ctx('test_start_helper_polls_before_retry')
+        ctx.node.properties[constants.AWS_CONFIG_PROPERTY][
+            'learn_transition_times'] = False
+        current_ctx.set(ctx=ctx)
+        test_instance = self.create_instance_for_checking()
+        with mock.patch.object(test_instance, 'start', return_value=False), \
+                mock.patch.object(test_instance,
+                                  '_check_if_instance_started',
+                                  side_effect=[False, True]), \
+                mock.patch.object(test_instance, 'post_start',
+                                  return_value=True):
+            self.assertEqual(True, test_instance.start_helper())
+        self.assertEqual([mock.call(1), mock.call(2)],
+                         mock_sleep.call_args_list)
+
     @mock_ec2
     def test_terminate_clean(self):
         """ this tests that the instance.terminate function
@@ -20,13 +20,14 @@ import mock
 
 # Third Party Imports
 from moto import mock_ec2
+from boto.ec2.securitygroup import GroupOrCIDR, SecurityGroup
 
 # Cloudify Imports is imported and used in operations
 from cloudify.state import current_ctx
 from cloudify_aws.ec2 import securitygroup
 from cloudify_aws import constants, connection
 from cloudify.mocks import MockCloudifyContext
-from cloudify.exceptions import NonRecoverableError
+from cloudify.exceptions import NonRecoverableError, RecoverableError
 
 
 class TestSecurityGroup(testtools.TestCase):
@@ -517,3 +518,315 @@ class TestSecurityGroup(testtools.TestCase):
 
         output = test_securitygroup.delete_external_resource_naively()
         self.assertEqual(False, output)
+
+    def mock_group(self, rules=(), rules_egress=()):
+        def grant(target):
+            group_or_cidr = GroupOrCIDR()
+            if target.startswith('sg-'):
+                group_or_cidr.group_id = target
+                group_or_cidr.name = 'src_group'
+                group_or_cidr.owner_id = '123456789012'
+            else:
+                group_or_cidr.cidr_ip = target
+            return group_or_cidr
+
+        def permissions(rules):
+            return [mock.Mock(ip_protocol=protocol,
+                              from_port=from_port,
+                              to_port=to_port,
+                              grants=[grant(g) for g in grants])
+                    for protocol, from_port, to_port, grants in rules]
+        return mock.Mock(rules=permissions(rules),
+                         rules_egress=permissions(rules_egress))
+
+    @mock_ec2
+    def test_rules_cleanup(self):
+        """ This checks that rules_cleanup removes the rules that
+        the group already has, once per existing grant, including
+        src group grants, and keeps the order and format of the
+        other rules.
+        """
+
+        test_properties = self.get_mock_properties()
+        ctx = self.security_group_mock('test_rules_cleanup',
+                                       test_properties)
+        current_ctx.set(ctx=ctx)
+        test_securitygroup = self.create_sg_for_checking()
+
+        group = self.mock_group(
+                rules=[('tcp', '22', '22', ['192.168.122.0/24']),
+                       ('tcp', '443', '443', ['0.0.0.0/0']),
+                       ('tcp', '8080', '8080', ['sg-12345678'])],
+                rules_egress=[('-1', None, None, ['0.0.0.0/0'])])
+        rules = [
+            {'ip_protocol': 'tcp', 'from_port': 8080, 'to_port': 8080,
+             'src_group_id': 'sg-12345678'},
+            {'ip_protocol': 'tcp', 'from_port': 22, 'to_port': 22,
+             'cidr_ip': u'192.168.122.0/24'},
+            {'ip_protocol': 'tcp', 'from_port': 22, 'to_port': 22,
+             'cidr_ip': u'192.168.122.0/24'},
+            {'ip_protocol': 'tcp', 'from_port': 443, 'to_port': 443,
+             'cidr_ip': u'0.0.0.0/0'},
+            {'ip_protocol': 'tcp', 'from_port': 443, 'to_port': 443,
+             'cidr_ip': u'0.0.0.0/0', 'egress': True},
+            {'ip_protocol': '-1', 'from_port': None, 'to_port': None,
+             'cidr_ip': u'0.0.0.0/0', 'egress': True},
+            {'ip_protocol': 'tcp', 'from_port': 80, 'to_port': 80,
+             'src_group_id': 'sg-12345678'}
+        ]
+
+        self.assertEqual(
+                [test_securitygroup.format_rule(
+                        'tcp', 22, 22, u'192.168.122.0/24'),
+                 test_securitygroup.format_rule(
+                        'tcp', 443, 443, u'0.0.0.0/0', egress=True),
+                 test_securitygroup.format_rule(
+                        'tcp', 80, 80, 'sg-12345678')],
+                test_securitygroup.rules_cleanup(group, rules))
+
+    def test_rule_key(self):
+        """ This checks that rule keys of the same rule read from
+        AWS and from a blueprint are equal.
+        """
+
+        self.assertEqual(
+                securitygroup.RuleKey.create(
+                        'TCP', '22', '22', '10.0.0.1'),
+                securitygroup.RuleKey.from_rule(
+                        {'ip_protocol': 'tcp', 'from_port': 22,
+                         'to_port': 22, 'cidr_ip': u'10.0.0.1/32'}))
+        self.assertEqual(('src_group_id', u'sg-12345678'),
+                         securitygroup.parse_grant('sg-12345678'))
+        self.assertEqual(('cidr_ip', '0.0.0.0/0'),
+                         securitygroup.parse_grant('0.0.0.0/0'))
+        self.assertNotEqual(
+                securitygroup.RuleKey.create('tcp', 22, 22, '0.0.0.0/0'),
+                securitygroup.RuleKey.create('tcp', 22, 22, '0.0.0.0/0',
+                                             egress=True))
+
+    @mock_ec2
+    def test_create_group_rules_one_request(self):
+        """ This checks that _create_group_rules authorizes
+        all of the ingress rules with one request.
+        """
+
+        test_properties = self.get_mock_properties()
+        ctx = self.security_group_mock(
+                'test_create_group_rules_one_request', test_properties)
+        current_ctx.set(ctx=ctx)
+        test_securitygroup = self.create_sg_for_checking()
+
+        ec2_client = connection.EC2ConnectionClient().client()
+        group = ec2_client.create_security_group(
+                'test_create_group_rules_one_request', 'this is test')
+        with mock.patch.object(test_securitygroup.client, 'get_status',
+                               wraps=test_securitygroup.client.get_status) \
+                as get_status:
+            test_securitygroup._create_group_rules(group)
+        get_status.assert_called_once_with(
+                'AuthorizeSecurityGroupIngress', mock.ANY, verb='POST')
+        self.assertEqual(
+                ['22', '80'],
+                sorted(rule.from_port for rule in
+                       ec2_client.get_all_security_groups(
+                               groupnames='test_create_group_rules_one_request'
+                       )[0].rules))
+
+    @mock_ec2
+    def test_authorize_rules_reports_failed_rules(self):
+        """ This checks that when a request fails, its rules are
+        authorized one by one and the failed rules are reported.
+        """
+
+        test_properties = self.get_mock_properties()
+        ctx = self.security_group_mock(
+                'test_authorize_rules_reports_failed_rules', test_properties)
+        current_ctx.set(ctx=ctx)
+        test_securitygroup = self.create_sg_for_checking()
+        group = mock.Mock(id='sg-12345678', vpc_id='vpc-12345678')
+        rules = [
+            test_securitygroup.format_rule('tcp', 22, 22, u'10.0.0.0/24'),
+            test_securitygroup.format_rule('tcp', 80, 80, u'10.0.1.0/24')
+        ]
+
+        def execute(fn, args=None, raise_on_falsy=False):
+            if 80 in args['params'].values():
+                raise RecoverableError('RequestLimitExceeded')
+            return True
+
+        with mock.patch.object(test_securitygroup, 'execute',
+                               side_effect=execute) as mock_execute:
+            ex = self.assertRaises(
+                    RecoverableError,
+                    test_securitygroup.authorize_rules, group, rules)
+        self.assertEqual(3, mock_execute.call_count)
+        self.assertIn('1 of 2 rules', ex.message)
+        self.assertIn('tcp 80-80 10.0.1.0/24', ex.message)
+        self.assertNotIn('tcp 22-22', ex.message)
+
+    @mock_ec2
+    def test_update_rules_reconcile(self):
+        """ This checks that update_rules with reconcile authorizes
+        the missing rules and revokes the rules that are not desired,
+        and that dry_run changes nothing.
+        """
+
+        test_properties = self.get_mock_properties()
+        ctx = self.security_group_mock(
+                'test_update_rules_reconcile', test_properties)
+        current_ctx.set(ctx=ctx)
+        test_securitygroup = self.create_sg_for_checking()
+
+        ec2_client = connection.EC2ConnectionClient().client()
+        group = ec2_client.create_security_group(
+                'test_update_rules_reconcile', 'this is test')
+        group.authorize('tcp', 22, 22, '192.168.122.0/24')
+        group.authorize('tcp', 443, 443, '0.0.0.0/0')
+        test_securitygroup.resource_id = group.id
+
+        def ports():
+            return sorted(
+                rule.from_port for rule in ec2_client.get_all_security_groups(
+                        groupnames='test_update_rules_reconcile')[0].rules)
+
+        delta = test_securitygroup.update_rules(
+                [], reconcile=True, dry_run=True)
+        self.assertEqual(['tcp 80-80 192.168.122.0/24'], delta['authorize'])
+        self.assertEqual(['tcp 443-443 0.0.0.0/0'], delta['revoke'])
+        self.assertEqual(['22', '443'], ports())
+
+        test_securitygroup.update_rules([], reconcile=True)
+        self.assertEqual(['22', '80'], ports())
+
+        delta = test_securitygroup.update_rules([], reconcile=True)
+        self.assertEqual({'authorize': [], 'revoke': []}, delta)
+
+    @mock_ec2
+    def test_update_rules_paths_agree(self):
+        """ This checks that update_rules finds the same existing
+        CIDR and src group rules with and without reconcile.
+        """
+
+        test_properties = self.get_mock_properties()
+        test_properties['rules'] = []
+        ctx = self.security_group_mock(
+                'test_update_rules_paths_agree', test_properties)
+        current_ctx.set(ctx=ctx)
+        test_securitygroup = self.create_sg_for_checking()
+        group = self.mock_group(
+                rules=[('tcp', '22', '22', ['10.0.0.0/24']),
+                       ('tcp', '80', '80', ['sg-12345678'])])
+        src_group = SecurityGroup(id='sg-12345678', name='src_group')
+        rules = [
+            {'ip_protocol': 'tcp', 'from_port': 22, 'to_port': 22,
+             'cidr_ip': u'10.0.0.0/24'},
+            {'ip_protocol': 'tcp', 'from_port': 80, 'to_port': 80,
+             'src_group_id': 'sg-12345678'},
+            {'ip_protocol': 'tcp', 'from_port': 443, 'to_port': 443,
+             'src_group_id': 'sg-12345678'},
+            {'ip_protocol': 'tcp', 'from_port': 443, 'to_port': 443,
+             'cidr_ip': u'10.0.0.0/24'}
+        ]
+
+        with mock.patch.object(test_securitygroup, 'get_resource',
+                               return_value=group), \
+                mock.patch.object(test_securitygroup,
+                                  '_get_vpc_security_group_from_name',
+                                  return_value=src_group), \
+                mock.patch.object(test_securitygroup,
+                                  '_get_rules_from_relationship',
+                                  return_value=[]):
+            default = test_securitygroup.update_rules(rules, dry_run=True)
+            reconciled = test_securitygroup.update_rules(
+                    rules, reconcile=True, dry_run=True)
+
+        self.assertEqual(['tcp 443-443 sg-12345678',
+                          'tcp 443-443 10.0.0.0/24'], default['authorize'])
+        self.assertEqual(default['authorize'], reconciled['authorize'])
+        self.assertEqual([], reconciled['revoke'])
+
+    @mock_ec2
+    def test_rules_delta_keeps_default_egress(self):
+        """ This checks that rules_delta only revokes egress rules
+        when egress rules are desired.
+        """
+
+        test_properties = self.get_mock_properties()
+        ctx = self.security_group_mock(
+                'test_rules_delta_keeps_default_egress', test_properties)
+        current_ctx.set(ctx=ctx)
+        test_securitygroup = self.create_sg_for_checking()
+        group = self.mock_group(
+                rules=[('tcp', '22', '22', ['10.0.0.0/24'])],
+                rules_egress=[('-1', None, None, ['0.0.0.0/0'])])
+        ingress = test_securitygroup.format_rule(
+                'tcp', 22, 22, u'10.0.0.0/24')
+        egress = test_securitygroup.format_rule(
+                'tcp', 443, 443, u'0.0.0.0/0', egress=True)
+
+        self.assertEqual(
+                ([], []), test_securitygroup.rules_delta(group, [ingress]))
+        to_authorize, to_revoke = test_securitygroup.rules_delta(
+                group, [ingress, egress])
+        self.assertEqual([egress], to_authorize)
+        self.assertEqual(
+                [{'ip_protocol': '-1', 'from_port': None, 'to_port': None,
+                  'cidr_ip': '0.0.0.0/0', 'egress': True}],
+                to_revoke)
+
+    @mock_ec2
+    def test_get_vpc_security_group_from_name(self):
+        """ This checks that a group is looked up by name
+        in the VPC of the group that refers to it.
+        """
+
+        test_properties = self.get_mock_properties()
+        ctx = self.security_group_mock(
+                'test_get_vpc_security_group_from_name', test_properties)
+        current_ctx.set(ctx=ctx)
+        test_securitygroup = self.create_sg_for_checking()
+
+        vpc_client = connection.VPCConnectionClient().client()
+        vpcs = [vpc_client.create_vpc('10.10.0.0/16'),
+                vpc_client.create_vpc('10.20.0.0/16')]
+        groups = [vpc_client.create_security_group(
+                'test_group', 'this is test', vpc_id=vpc.id)
+                for vpc in vpcs]
+
+        with mock.patch.object(
+                test_securitygroup.client, 'get_all_security_groups',
+                wraps=test_securitygroup.client.get_all_security_groups) \
+                as get_all_security_groups:
+            self.assertEqual(
+                    groups[1].id,
+                    test_securitygroup._get_vpc_security_group_from_name(
+                            'test_group', vpcs[1].id).id)
+        get_all_security_groups.assert_called_once_with(
+                filters={'group-name': 'test_group', 'vpc-id': vpcs[1].id})
+        self.assertIsNone(
+                test_securitygroup._get_vpc_security_group_from_name(
+                        'no_such_group', vpcs[0].id))
+
+    @mock_ec2
+    def test_get_resource_by_name(self):
+        """ This checks that a resource_id that is not a group ID
+        is looked up by name with one call.
+        """
+
+        test_properties = self.get_mock_properties()
+        ctx = self.security_group_mock(
+                'test_get_resource_by_name', test_properties)
+        current_ctx.set(ctx=ctx)
+        test_securitygroup = self.create_sg_for_checking()
+        group = test_securitygroup.client.create_security_group(
+                'test_get_resource_by_name', 'this is test')
+
+        for resource_id in [group.id, group.name]:
+            test_securitygroup.resource_id = resource_id
+            get_all_security_groups = mock.Mock(
+                    __name__='get_all_security_groups',
+                    wraps=test_securitygroup.client.get_all_security_groups)
+            test_securitygroup.get_all_handler['function'] = \
+                get_all_security_groups
+            self.assertEqual(group.id, test_securitygroup.get_resource().id)
+            self.assertEqual(1, get_all_security_groups.call_count)
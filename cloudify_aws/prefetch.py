@@ -0,0 +1,145 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import threading
+import time
+
+# Third-party Imports
+from boto import exception
+
+# Cloudify Imports
+from . import constants, utils
+from cloudify import ctx
+
+
+class DeploymentPrefetch(object):
+    """Keeps the resources of a deployment, fetched with one describe call
+    per resource type filtered by the deployment_id tag, so that the
+    operations of a deployment running in this process can find their
+    resources without describing them one by one.
+
+    A prefetch can only tell that a resource exists. Resources that it
+    does not hold, such as external or not yet tagged ones, must still be
+    described by id.
+    """
+
+    def __init__(self, call_api):
+        """
+        :param call_api: The function that calls the describe function,
+            such as base.call_aws_api.
+        """
+        self.call_api = call_api
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+
+    def lookup(self, list_function, resource_id, id_attribute='id'):
+        """Returns the prefetched resource with the given id, or None if
+        prefetching is disabled or the resource is not in the prefetch.
+
+        :param list_function: The boto describe function of the resource.
+        :param resource_id: The value of id_attribute to look for.
+        :param id_attribute: The attribute of the resource to match.
+        """
+
+        ttl = utils.get_aws_config().get('prefetch_ttl')
+        api_name = utils.get_api_name(list_function)
+        if not ttl or not isinstance(resource_id, basestring) or \
+                api_name not in constants.PREFETCH_APIS:
+            return None
+
+        key = (api_name,
+               id(getattr(list_function, '__self__', None)),
+               ctx.deployment.id)
+        entry = self._get_entry(key, float(ttl), list_function)
+        if entry is None:
+            return None
+
+        with self._lock:
+            index = entry['indexes'].get(id_attribute)
+            if index is None:
+                index = entry['indexes'][id_attribute] = dict(
+                    (getattr(resource, id_attribute, None), resource)
+                    for resource in entry['resources'])
+            if resource_id in entry['forgotten']:
+                return None
+            return index.get(resource_id)
+
+    def forget(self, resource_ids):
+        """Stops serving the given resources from the prefetch, after this
+        process changed them.
+        """
+
+        resource_ids = [r for r in resource_ids if r]
+        with self._lock:
+            for entry in self._entries.values():
+                entry['forgotten'].update(resource_ids)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_entry(self, key, ttl, list_function):
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+
+        # Operations that miss the same entry wait for one fetch.
+        with fetch_lock:
+            now = time.time()
+            with self._lock:
+                for other_key, entry in self._entries.items():
+                    if now - entry['fetched'] > entry['ttl']:
+                        del self._entries[other_key]
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+
+            resources = self._fetch(list_function)
+            if resources is None:
+                return None
+
+            entry = {
+                'fetched': now,
+                'ttl': ttl,
+                'resources': resources,
+                'indexes': {},
+                'forgotten': set()
+            }
+            with self._lock:
+                self._entries[key] = entry
+            return entry
+
+    def _fetch(self, list_function):
+        api_name = utils.get_api_name(list_function)
+        try:
+            resources = self.call_api(
+                list_function,
+                dict(filters={'tag:deployment_id': ctx.deployment.id}))
+        except (exception.EC2ResponseError,
+                exception.BotoServerError) as e:
+            ctx.logger.debug(
+                'Unable to prefetch {0} of deployment {1}: {2}'
+                .format(api_name, ctx.deployment.id, str(e)))
+            return None
+
+        if api_name in constants.PREFETCH_RESERVATION_APIS:
+            resources = [instance for reservation in resources
+                         for instance in reservation.instances]
+
+        ctx.logger.debug(
+            'Prefetched {0} resources with {1} for deployment {2}.'
+            .format(len(resources), api_name, ctx.deployment.id))
+        return resources
@@ -0,0 +1,112 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import cProfile
+import datetime
+import functools
+import os
+import pstats
+import tempfile
+import threading
+
+# Cloudify Imports
+from . import constants, utils
+from cloudify import ctx
+from cloudify.state import current_ctx
+
+# Whether an operation is being profiled in this thread, so that an
+# operation that calls another is profiled once.
+_active = threading.local()
+
+
+def _get_settings():
+    """Returns the directory and the number of functions of the summary
+    if the operation that is running in this thread is to be profiled,
+    or None.
+    """
+
+    try:
+        context = current_ctx.get_ctx()
+    except RuntimeError:
+        return None
+    if context.type not in (constants.NODE_INSTANCE,
+                            constants.RELATIONSHIP_INSTANCE):
+        return None
+    aws_config = utils.get_aws_config()
+    if not aws_config.get('profile'):
+        return None
+    directory = aws_config.get('profile_dir') or \
+        os.path.join(tempfile.gettempdir(), constants.PROFILE_DIR)
+    return directory, aws_config.get('profile_top') or constants.PROFILE_TOP
+
+
+def get_profile_name(operation_name):
+    """Returns the name of the files of a run of an operation, by
+    deployment, node instance and operation.
+    """
+
+    if ctx.type == constants.RELATIONSHIP_INSTANCE:
+        instance_id = '{0}-{1}'.format(ctx.source.instance.id,
+                                       ctx.target.instance.id)
+    else:
+        instance_id = ctx.instance.id
+    return '{0}.{1}.{2}.{3}'.format(
+        ctx.deployment.id, instance_id, operation_name,
+        datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'))
+
+
+def profiled(fn):
+    """Wraps an operation so that, if aws_config has profile, it runs
+    under cProfile. The profile is written to a .prof file in profile_dir,
+    to be read with pstats or a profile viewer, next to a .txt summary of
+    the profile_top functions by cumulative time. Only the thread of the
+    operation is profiled, and not the threads that it starts.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        settings = None
+        if not getattr(_active, 'profiling', False):
+            settings = _get_settings()
+        if settings is None:
+            return fn(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        _active.profiling = True
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            _active.profiling = False
+            _write(profiler, ctx.operation.name or fn.__name__, *settings)
+
+    return wrapper
+
+
+def _write(profiler, operation_name, directory, top):
+    path = os.path.join(directory, get_profile_name(operation_name))
+    try:
+        utils.ensure_directory(directory)
+        profiler.dump_stats(path + '.prof')
+        with open(path + '.txt', 'w') as summary:
+            pstats.Stats(profiler, stream=summary) \
+                .sort_stats('cumulative').print_stats(top)
+    except (IOError, OSError) as e:
+        ctx.logger.warn(
+            'Unable to write the profile of {0} to {1}: {2}'.format(
+                operation_name, directory, str(e)))
+        return
+    ctx.logger.info('Profile of {0} written to {1}.prof'.format(
+        operation_name, path))
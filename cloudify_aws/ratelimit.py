@@ -0,0 +1,142 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import os
+import time
+
+# Cloudify Imports
+from . import constants, utils
+from cloudify import ctx
+
+DESCRIBE = 'describe'
+MUTATING = 'mutating'
+
+
+class TokenBucket(object):
+    """A token bucket whose state is kept in a file, so that all of the
+    processes on a host that use the same file share one request rate.
+    """
+
+    def __init__(self, path, rate, burst=None):
+        self.path = path
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+
+    def acquire(self):
+        """Blocks until a token is available and takes it.
+        """
+
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def _take(self):
+        """Refills the bucket for the time that passed since it was last
+        used and takes a token if there is one.
+
+        :returns 0 if a token was taken, otherwise the seconds to wait
+            for the next one.
+        """
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            utils.fcntl.flock(fd, utils.fcntl.LOCK_EX)
+            now = time.time()
+            tokens, last = self._read(fd, now)
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, '{0!r} {1!r}'.format(tokens, now))
+        finally:
+            os.close(fd)
+        return wait
+
+    def _read(self, fd, now):
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            tokens, last = os.read(fd, 64).split()
+            return float(tokens), min(float(last), now)
+        except ValueError:
+            return self.burst, now
+
+
+class RateLimiter(object):
+    """Holds separate token buckets for describe and for mutating AWS API
+    calls, matching the separate limits that AWS applies to them.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets or {}
+
+    @classmethod
+    def from_aws_config(cls, aws_config):
+        """Builds the buckets configured in aws_config. The bucket files are
+        named by the access key and region, so that operations against the
+        same account and region share them.
+        """
+
+        aws_config = aws_config or {}
+        rates = {
+            DESCRIBE: aws_config.get('describe_rate_limit'),
+            MUTATING: aws_config.get('mutating_rate_limit')
+        }
+        if not any(rates.values()):
+            return cls()
+        if utils.fcntl is None:
+            ctx.logger.debug(
+                'AWS API rate limiting is not supported on this platform.')
+            return cls()
+
+        directory = aws_config.get('rate_limit_dir')
+        if directory:
+            utils.ensure_directory(directory)
+        else:
+            directory = utils.get_state_directory(constants.RATE_LIMIT_DIR)
+
+        scope = utils.get_account_scope(aws_config)
+
+        return cls(dict(
+            (kind, TokenBucket(
+                os.path.join(directory, '{0}-{1}'.format(scope, kind)),
+                rate))
+            for kind, rate in rates.items() if rate))
+
+    def bucket_for(self, fn):
+        kind = DESCRIBE if utils.is_describe_call(fn) else MUTATING
+        return self.buckets.get(kind)
+
+    def limit(self, fn):
+        """Wraps fn so that every call to it first takes a token from its
+        bucket.
+        """
+
+        bucket = self.bucket_for(fn)
+        if bucket is None:
+            return fn
+
+        def limited(*args, **kwargs):
+            bucket.acquire()
+            return fn(*args, **kwargs)
+
+        limited.__name__ = utils.get_api_name(fn)
+        return limited
@@ -0,0 +1,176 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import httplib
+import random
+import re
+import socket
+import time
+
+# Third-party Imports
+from boto import exception
+from boto.https_connection import InvalidCertificateException
+
+# Cloudify Imports
+from . import constants
+from cloudify import ctx
+from cloudify.exceptions import NonRecoverableError, RecoverableError
+
+THROTTLE = 'throttle'
+TRANSIENT = 'transient'
+NOT_FOUND = 'not_found'
+FATAL = 'fatal'
+
+ERROR_CODE_PATTERN = re.compile('<Code>(.+?)</Code>')
+
+# The errors of the HTTP connection of a request, as in boto's
+# http_exceptions, which the pooled connections raise instead of
+# retrying them. Like boto, an invalid certificate is not retried.
+CONNECTION_ERRORS = (httplib.HTTPException, socket.error)
+
+
+def get_error_code(error):
+    """Returns the AWS error code of a boto error, parsing it out of the
+    error body if boto did not.
+    """
+
+    code = getattr(error, 'error_code', None)
+    if code:
+        return code
+    match = ERROR_CODE_PATTERN.search(str(error))
+    return match.group(1) if match else None
+
+
+def classify(error):
+    """Sorts a boto error into one of THROTTLE, TRANSIENT, NOT_FOUND or
+    FATAL.
+
+    :param error: A BotoServerError, an EC2ResponseError or one of
+        CONNECTION_ERRORS.
+    :returns one of the above.
+    """
+
+    if isinstance(error, InvalidCertificateException):
+        return FATAL
+    elif isinstance(error, CONNECTION_ERRORS):
+        return TRANSIENT
+    code = get_error_code(error) or ''
+    status = getattr(error, 'status', None)
+
+    if code in constants.THROTTLING_ERROR_CODES:
+        return THROTTLE
+    elif code in constants.TRANSIENT_ERROR_CODES or \
+            (isinstance(status, int) and status >= 500):
+        return TRANSIENT
+    elif code.endswith('NotFound'):
+        return NOT_FOUND
+    return FATAL
+
+
+def is_retryable(error):
+    return classify(error) in (THROTTLE, TRANSIENT)
+
+
+def escalate(error):
+    """Returns the Cloudify error to raise for a boto error that could
+    not be resolved by retrying in-process. Throttling and transient
+    errors let Cloudify retry the whole operation.
+    """
+
+    if is_retryable(error):
+        return RecoverableError('{0}'.format(str(error)))
+    return NonRecoverableError('{0}'.format(str(error)))
+
+
+class RetryPolicy(object):
+    """Retries AWS API calls in-process, with decorrelated-jitter
+    exponential backoff, until the call succeeds, fails with an error
+    that is not worth retrying, runs out of attempts or would pass the
+    deadline of the operation.
+    """
+
+    def __init__(self,
+                 max_attempts=constants.RETRY_MAX_ATTEMPTS,
+                 base_delay=constants.RETRY_BASE_DELAY,
+                 max_delay=constants.RETRY_MAX_DELAY,
+                 deadline=constants.RETRY_DEADLINE):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    @classmethod
+    def from_aws_config(cls, aws_config):
+        aws_config = aws_config or {}
+        return cls(
+            max_attempts=aws_config.get(
+                'retry_max_attempts', constants.RETRY_MAX_ATTEMPTS),
+            base_delay=aws_config.get(
+                'retry_base_delay', constants.RETRY_BASE_DELAY),
+            max_delay=aws_config.get(
+                'retry_max_delay', constants.RETRY_MAX_DELAY),
+            deadline=aws_config.get(
+                'retry_deadline', constants.RETRY_DEADLINE))
+
+    def delays(self):
+        delay = self.base_delay
+        while True:
+            delay = min(self.max_delay,
+                        random.uniform(self.base_delay, delay * 3))
+            yield delay
+
+    def call(self, fn, args=None, retry_not_found=False, on_retry=None,
+             started=None):
+        """Calls fn with args, retrying throttling and transient errors.
+
+        :param fn: The boto function to call.
+        :param args: A dict of kwargs for fn.
+        :param retry_not_found: Whether to also retry NotFound errors,
+            which AWS returns for a while after a resource is created.
+        :param on_retry: An optional function that is called before every
+            retry.
+        :param started: When the operation that makes the call started,
+            so that the deadline is of the whole operation. Defaults to
+            now.
+        :returns the output of fn.
+        :raises the last boto error if the call did not succeed.
+        """
+
+        deadline = (started or time.time()) + self.deadline
+        delays = self.delays()
+        attempt = 1
+
+        while True:
+            try:
+                return fn(**args) if args else fn()
+            except (exception.EC2ResponseError,
+                    exception.BotoServerError) + CONNECTION_ERRORS as e:
+                kind = classify(e)
+                delay = next(delays)
+                if kind == FATAL or \
+                        (kind == NOT_FOUND and not retry_not_found) or \
+                        attempt >= self.max_attempts or \
+                        time.time() + delay > deadline:
+                    raise
+                ctx.logger.debug(
+                    'AWS API call {0} failed with {1} error {2}. '
+                    'Retrying in {3:.1f} seconds.'
+                    .format(getattr(fn, '__name__', fn), kind,
+                            get_error_code(e), delay))
+                if on_retry:
+                    on_retry()
+                time.sleep(delay)
+                attempt += 1
@@ -14,19 +14,25 @@
 #    * limitations under the License.
 
 # Built-in Imports
+import time
+import threading
 import testtools
 from cloudify.state import current_ctx
 from boto.exception import EC2ResponseError
+from boto.ec2 import EC2Connection
 from boto.ec2.ec2object import TaggedEC2Object
 
 # Third Party Imports
 import mock
 from moto import mock_ec2
 from cloudify_aws.vpc import routetable
+from cloudify_aws.vpc.vpc import VpcPeeringConnection
+from cloudify_aws.ec2.securitygroup import SecurityGroupUsesRuleConnection
 from cloudify_aws import constants, connection
 from cloudify_aws.base import AwsBase, AwsBaseNode, AwsBaseRelationship, \
     RouteMixin
 from cloudify.mocks import MockCloudifyContext, MockContext
+from cloudify import ctx as cloudify_ctx
 from cloudify.exceptions import NonRecoverableError, RecoverableError
 
 
@@ -256,6 +262,45 @@ class TestCloudifyAwsBase(testtools.TestCase):
                 'The resource is not in state'):
             resource.cloudify_operation_exit_handler('nonvalid', 'create')
 
+    @mock.patch('cloudify_aws.waiter.time.sleep')
+    @mock.patch('cloudify_aws.base.AwsBaseNode.get_resource')
+    def test_state_change_handler_polls_in_process(self, _, mock_sleep):
+        """ Tests that a resource in a waiting state is described
+            again in the operation, with a growing delay, before the
+            operation is retried.
+        """
+        ctx = self.get_mock_ctx('test_state_change_handler_polls',
+                                retry_number=1)
+        ctx.node.properties[constants.AWS_CONFIG_PROPERTY][
+            'learn_transition_times'] = False
+        ctx.operation._operation_context['name'] = 'create'
+        current_ctx.set(ctx=ctx)
+        resource = AwsBaseNode('root', [], client=mock.Mock(),
+                               resource_states=self.states)
+
+        with mock.patch('cloudify_aws.base.AwsBaseNode.get_resource_state',
+                        side_effect=['pending', 'pending', 'available']):
+            self.assertEqual(
+                    True, resource.cloudify_resource_state_change_handler())
+        self.assertEqual([mock.call(1), mock.call(2)],
+                         mock_sleep.call_args_list)
+        self.assertEqual('available',
+                         ctx.instance.runtime_properties['aws_resource_state'])
+
+        clock = [1000]
+        mock_sleep.reset_mock()
+        mock_sleep.side_effect = \
+            lambda delay: clock.__setitem__(0, clock[0] + delay)
+        with mock.patch('cloudify_aws.base.AwsBaseNode.get_resource_state',
+                        return_value='pending'), \
+                mock.patch('cloudify_aws.waiter.time.time',
+                           side_effect=lambda: clock[0]), \
+                mock.patch.object(ctx.operation, 'retry') as mock_retry:
+            resource.cloudify_resource_state_change_handler()
+        self.assertEqual([1, 2, 4, 8, 5],
+                         [c[0][0] for c in mock_sleep.call_args_list])
+        mock_retry.assert_called_once_with(message=mock.ANY, retry_after=20)
+
     @mock_ec2
     @mock.patch('cloudify_aws.base.AwsBaseNode.get_resource',
                 return_value=None)
@@ -292,6 +337,26 @@ class TestCloudifyAwsBase(testtools.TestCase):
                 'Not external resource'):
             resource.creation_validation()
 
+    def test_creation_validation_malformed_id(self):
+        """ Tests that creation_validation rejects a malformed
+            external resource ID without calling the API.
+        """
+        ctx = self.get_mock_ctx('test_creation_validation_malformed_id')
+        current_ctx.set(ctx=ctx)
+        describe = mock.Mock(__name__='get_all_vpcs')
+        resource = AwsBaseNode('vpc', [], client=mock.Mock(),
+                               resource_states=[])
+        resource.get_all_handler = {'function': describe,
+                                    'argument': 'vpc_ids'}
+        resource.id_format = constants.VPC['ID_FORMAT']
+        resource.is_external_resource = True
+        resource.resource_id = 'my-vpc'
+
+        with self.assertRaisesRegexp(NonRecoverableError, 'malformed'):
+            resource.creation_validation()
+        self.assertIsNone(resource.get_resource())
+        self.assertFalse(describe.called)
+
     @mock_ec2
     @mock.patch('cloudify_aws.base.AwsBaseRelationship'
                 '.filter_for_single_resource', return_value='r-1234abcd')
@@ -527,6 +592,184 @@ class TestCloudifyAwsBase(testtools.TestCase):
             self.assertIn(
                     'returned False', ex.message)
 
+    def test_describe_cache(self):
+        """ Tests that a describe call is made once per operation
+            until a mutating call goes through execute.
+        """
+        ctx = self.get_mock_ctx('test_describe_cache')
+        current_ctx.set(ctx=ctx)
+        resource = AwsBase(client=mock.Mock())
+        describe = mock.Mock(__name__='get_all_volumes',
+                             return_value=['vol-1'])
+        create = mock.Mock(__name__='create_volume', return_value=True)
+        filters = {'volume_ids': ['vol-1']}
+
+        for _ in range(3):
+            self.assertEqual(
+                    ['vol-1'],
+                    resource.get_and_filter_resources_by_matcher(
+                            describe, filters))
+        self.assertEqual(1, describe.call_count)
+
+        resource.get_and_filter_resources_by_matcher(
+                describe, {'volume_ids': ['vol-2']})
+        self.assertEqual(2, describe.call_count)
+
+        resource.execute(create, dict(size=1))
+        resource.get_and_filter_resources_by_matcher(describe, filters)
+        self.assertEqual(3, describe.call_count)
+
+    def test_describe_cache_not_found(self):
+        """ Tests that a NotFound result is cached as an empty list.
+        """
+        ctx = self.get_mock_ctx('test_describe_cache_not_found')
+        current_ctx.set(ctx=ctx)
+        resource = AwsBase(client=mock.Mock())
+        describe = mock.Mock(
+                __name__='get_all_volumes',
+                side_effect=EC2ResponseError(
+                        400, 'Bad Request',
+                        '<Code>InvalidVolume.NotFound</Code>'))
+        filters = {'volume_ids': ['vol-1']}
+        for _ in range(2):
+            self.assertEqual(
+                    [], resource.get_and_filter_resources_by_matcher(
+                            describe, filters, 'InvalidVolume.NotFound'))
+        self.assertEqual(1, describe.call_count)
+
+    def test_execute_many(self):
+        """ Tests that execute_many makes up to concurrency calls
+            at a time, with the operation's context, and returns
+            the outputs in order.
+        """
+        ctx = self.get_mock_ctx('test_execute_many')
+        current_ctx.set(ctx=ctx)
+        resource = AwsBase(client=mock.Mock())
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def create_tags(resource_id):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return '{0}-{1}'.format(cloudify_ctx.instance.id, resource_id)
+
+        outputs = resource.execute_many(
+                create_tags,
+                [dict(resource_id=i) for i in range(6)],
+                concurrency=3)
+        self.assertEqual(
+                ['test_execute_many-{0}'.format(i) for i in range(6)],
+                outputs)
+        self.assertEqual(3, running[1])
+        self.assertEqual(ctx, current_ctx.get_ctx())
+
+    def test_execute_many_errors(self):
+        """ Tests that execute_many makes all of the calls
+            and then reports every call that failed.
+        """
+        ctx = self.get_mock_ctx('test_execute_many_errors')
+        current_ctx.set(ctx=ctx)
+        resource = AwsBase(client=mock.Mock())
+        create = mock.Mock(
+                __name__='create_route',
+                side_effect=lambda destination_cidr_block:
+                self.raise_for_cidr(destination_cidr_block))
+
+        ex = self.assertRaises(
+                NonRecoverableError,
+                resource.execute_many, create,
+                [dict(destination_cidr_block=cidr)
+                 for cidr in ['10.0.0.0/24', 'bad', '10.0.1.0/24']])
+        self.assertEqual(3, create.call_count)
+        self.assertIn('1 of 3 calls to create_route failed', ex.message)
+        self.assertIn('bad', ex.message)
+
+    def test_execute_many_worker_connections(self):
+        """ Tests that the threads of execute_many call the
+            client with their own connections from the pool.
+        """
+        ctx = self.get_mock_ctx('test_execute_many_worker_connections')
+        current_ctx.set(ctx=ctx)
+        connection.connection_pool.clear()
+        self.addCleanup(connection.connection_pool.clear)
+        pooled = connection.connection_pool.get(
+                EC2Connection,
+                {'aws_access_key_id': 'a', 'aws_secret_access_key': 'b'})
+        resource = AwsBase(client=pooled)
+
+        def get_all_volumes(client):
+            time.sleep(0.05)
+            return client
+
+        with mock.patch.object(EC2Connection, 'get_all_volumes',
+                               autospec=True,
+                               side_effect=get_all_volumes):
+            clients = resource.execute_many(
+                    pooled.get_all_volumes, [{}] * 3, concurrency=3)
+        self.assertEqual(3, len(set(id(client) for client in clients)))
+        self.assertNotIn(id(pooled), [id(client) for client in clients])
+        self.assertIs(pooled, resource.client)
+
+    def test_relationship_construction_makes_no_calls(self):
+        """ Tests that relationship objects are built
+            without calling the AWS API.
+        """
+        ctx = self.mock_relationship_context(
+                'test_relationship_construction_makes_no_calls')
+        current_ctx.set(ctx=ctx)
+        client = mock.Mock()
+
+        rule_connection = SecurityGroupUsesRuleConnection(client=client)
+        peering_connection = VpcPeeringConnection(client=client)
+
+        self.assertEqual([], client.method_calls)
+        self.assertEqual(client.get_all_security_groups,
+                         rule_connection.source_get_all_handler['function'])
+        self.assertIs(client, peering_connection.client)
+        self.assertIsNone(
+                peering_connection.source_vpc_peering_connection_id)
+
+    def test_vpc_peering_connection_ids_are_cached(self):
+        """ Tests that the peering connection ids are looked up
+            once, and again after a peering connection is added.
+        """
+        ctx = self.mock_relationship_context(
+                'test_vpc_peering_connection_ids_are_cached')
+        ctx.source.instance.runtime_properties['vpc_id'] = 'vpc-12345678'
+        current_ctx.set(ctx=ctx)
+        peering_connection = VpcPeeringConnection(client=mock.Mock(),
+                                                  routes=[])
+        with mock.patch.object(
+                peering_connection, 'get_vpc_peering_connection_id',
+                wraps=peering_connection.get_vpc_peering_connection_id) \
+                as mock_lookup:
+            self.assertIsNone(
+                    peering_connection.source_vpc_peering_connection_id)
+            self.assertIsNone(
+                    peering_connection.source_vpc_peering_connection_id)
+            self.assertEqual(1, mock_lookup.call_count)
+
+            peering_connection.resource_id = 'pcx-12345678'
+            peering_connection.post_associate()
+            self.assertEqual(
+                    'pcx-12345678',
+                    peering_connection.source_vpc_peering_connection_id)
+            self.assertEqual(
+                    'pcx-12345678',
+                    peering_connection.target_vpc_peering_connection_id)
+            self.assertEqual(3, mock_lookup.call_count)
+
+    def raise_for_cidr(self, destination_cidr_block):
+        if destination_cidr_block == 'bad':
+            raise EC2ResponseError(
+                    400, 'Bad Request',
+                    '<Code>InvalidParameterValue</Code>')
+        return True
+
     @mock_ec2
     def test_create_and_delete_route(self):
         """ Tests that create_route
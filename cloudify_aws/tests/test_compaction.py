@@ -0,0 +1,91 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import testtools
+from cloudify.state import current_ctx
+
+# Third Party Imports
+from cloudify_aws import constants
+from cloudify_aws.ec2.securitygroup import SecurityGroup
+from cloudify_aws.vpc.networkacl import NetworkAcl
+from cloudify.mocks import MockCloudifyContext
+
+
+class TestCompaction(testtools.TestCase):
+
+    def setUp(self):
+        super(TestCompaction, self).setUp()
+        current_ctx.set(ctx=MockCloudifyContext(
+                node_id='test_compaction',
+                properties={constants.AWS_CONFIG_PROPERTY: {}}))
+
+    def test_compact_security_group_rules(self):
+        """ Tests that rules with contiguous ports and networks are
+            merged and that other rules are kept.
+        """
+
+        rules = [
+            SecurityGroup.format_rule('tcp', 22, 22, u'10.0.0.0/25'),
+            SecurityGroup.format_rule('tcp', '23', '23', u'10.0.0.0/25'),
+            SecurityGroup.format_rule('tcp', 22, 23, u'10.0.0.128/25'),
+            SecurityGroup.format_rule('tcp', 22, 23, u'10.0.0.128/25',
+                                      egress=True),
+            SecurityGroup.format_rule('icmp', 3, 3, u'10.0.0.0/24'),
+            SecurityGroup.format_rule('icmp', 4, 4, u'10.0.0.0/24'),
+            SecurityGroup.format_rule('tcp', 80, 80, 'sg-12345678')
+        ]
+
+        self.assertEqual(
+                [SecurityGroup.format_rule('tcp', 22, 23, u'10.0.0.0/24'),
+                 SecurityGroup.format_rule('tcp', 22, 23, u'10.0.0.128/25',
+                                           egress=True),
+                 SecurityGroup.format_rule('icmp', 3, 3, u'10.0.0.0/24'),
+                 SecurityGroup.format_rule('icmp', 4, 4, u'10.0.0.0/24'),
+                 SecurityGroup.format_rule('tcp', 80, 80, 'sg-12345678')],
+                SecurityGroup.compact_rules(rules))
+
+    def test_compact_network_acl_entries_keeps_order(self):
+        """ Tests that network acl entries are only merged with
+            consecutive entries of the same action and keep the
+            lowest rule numbers.
+        """
+
+        def entry(rule_number, rule_action, cidr_block,
+                  port_range_from=80, port_range_to=80):
+            return {
+                'rule_number': rule_number,
+                'protocol': 6,
+                'rule_action': rule_action,
+                'cidr_block': cidr_block,
+                'egress': False,
+                'port_range_from': port_range_from,
+                'port_range_to': port_range_to
+            }
+
+        entries = [
+            entry(110, 'allow', '10.0.0.128/25'),
+            entry(100, 'allow', '10.0.0.0/25'),
+            entry(105, 'allow', '10.0.0.0/25', 81, 90),
+            entry(120, 'deny', '10.0.1.0/24'),
+            entry(130, 'allow', '10.0.2.0/24')
+        ]
+
+        self.assertEqual(
+                [entry(100, 'allow', '10.0.0.0/25', 80, 90),
+                 entry(105, 'allow', '10.0.0.128/25'),
+                 entry(120, 'deny', '10.0.1.0/24'),
+                 entry(130, 'allow', '10.0.2.0/24')],
+                NetworkAcl.compact_network_acl_entries(entries))
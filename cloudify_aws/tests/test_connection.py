@@ -0,0 +1,214 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import os
+import tempfile
+import testtools
+from cloudify.state import current_ctx
+
+# Third Party Imports
+import mock
+from boto.ec2 import EC2Connection
+from boto.vpc import VPCConnection
+from boto.exception import BotoServerError
+from cloudify_aws import constants, connection
+from cloudify.mocks import MockCloudifyContext
+
+
+class TestConnectionPool(testtools.TestCase):
+
+    def setUp(self):
+        super(TestConnectionPool, self).setUp()
+        connection.connection_pool.clear()
+        self.addCleanup(connection.connection_pool.clear)
+
+    def get_mock_ctx(self, test_name, aws_config=None):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: aws_config or {},
+            'use_external_resource': False,
+            'resource_id': test_name
+        }
+        ctx = MockCloudifyContext(
+                node_id=test_name,
+                deployment_id=test_name,
+                properties=test_properties
+        )
+        return ctx
+
+    def test_pool_reuses_connection(self):
+        """ Tests that the same class and config
+            share one connection.
+        """
+        pool = connection.ConnectionPool()
+        config = {'aws_access_key_id': 'a', 'aws_secret_access_key': 'b'}
+        first = pool.get(EC2Connection, config)
+        second = pool.get(EC2Connection, dict(config))
+        self.assertIs(first, second)
+
+    def test_pool_turns_off_boto_retries(self):
+        """ Tests that pooled and checked out connections
+            leave retries to the plugin's retry policy, and
+            raise server errors without sleeping.
+        """
+        pool = connection.ConnectionPool()
+        config = {'aws_access_key_id': 'a', 'aws_secret_access_key': 'b'}
+        pooled = pool.get(EC2Connection, config)
+        self.assertEqual(0, pooled.num_retries)
+        self.assertEqual(0, pool.checkout(pooled).num_retries)
+
+        response = mock.Mock(status=503, reason='Service Unavailable')
+        response.getheader.return_value = None
+        response.read.return_value = \
+            '<Response><Errors><Error><Code>RequestLimitExceeded</Code>' \
+            '<Message>message</Message></Error></Errors></Response>'
+        http_connection = mock.Mock()
+        http_connection.getresponse.return_value = response
+        with mock.patch.object(pooled, 'get_http_connection',
+                               return_value=http_connection), \
+                mock.patch('boto.connection.time.sleep') as mock_sleep:
+            error = self.assertRaises(BotoServerError,
+                                      pooled.get_all_volumes)
+        self.assertEqual('RequestLimitExceeded', error.error_code)
+        self.assertEqual(1, http_connection.request.call_count)
+        self.assertFalse(mock_sleep.called)
+
+    def test_pool_keys_by_class_and_config(self):
+        """ Tests that different classes or configs
+            get different connections.
+        """
+        pool = connection.ConnectionPool()
+        config = {'aws_access_key_id': 'a', 'aws_secret_access_key': 'b'}
+        other_config = {'aws_access_key_id': 'c',
+                        'aws_secret_access_key': 'b'}
+        ec2 = pool.get(EC2Connection, config)
+        self.assertIsNot(ec2, pool.get(VPCConnection, config))
+        self.assertIsNot(ec2, pool.get(EC2Connection, other_config))
+
+    def test_pool_evicts_idle_connections(self):
+        """ Tests that connections unused for longer than
+            the ttl are replaced, without closing them under an
+            operation that still holds them.
+        """
+        pool = connection.ConnectionPool(ttl=10)
+        config = {'aws_access_key_id': 'a', 'aws_secret_access_key': 'b'}
+        with mock.patch('cloudify_aws.connection.time.time') as mock_time:
+            mock_time.return_value = 100
+            first = pool.get(EC2Connection, config)
+            mock_time.return_value = 105
+            self.assertIs(first, pool.get(EC2Connection, config))
+            mock_time.return_value = 116
+            with mock.patch.object(first, 'close') as mock_close:
+                second = pool.get(EC2Connection, config)
+                self.assertFalse(mock_close.called)
+        self.assertIsNot(first, second)
+
+    def test_pool_checks_out_spare_connections(self):
+        """ Tests that a checked out connection has the config
+            of the pooled one but is not shared with another
+            thread until it is checked in.
+        """
+        pool = connection.ConnectionPool()
+        config = {'aws_access_key_id': 'a', 'aws_secret_access_key': 'b'}
+        pooled = pool.get(EC2Connection, config)
+        first = pool.checkout(pooled)
+        second = pool.checkout(pooled)
+        self.assertIsNot(pooled, first)
+        self.assertIsNot(first, second)
+        self.assertEqual('a', first.aws_access_key_id)
+        pool.checkin(first)
+        self.assertIs(first, pool.checkout(pooled))
+        other = mock.Mock()
+        self.assertIs(other, pool.checkout(other))
+
+    def test_clients_share_pooled_connection(self):
+        """ Tests that clients built by separate
+            EC2ConnectionClient objects are the same connection.
+        """
+        ctx = self.get_mock_ctx(
+            'test_clients_share_pooled_connection',
+            aws_config={'aws_access_key_id': 'a',
+                        'aws_secret_access_key': 'b',
+                        'ec2_region_name': 'us-east-1'})
+        current_ctx.set(ctx=ctx)
+        first = connection.EC2ConnectionClient().client()
+        second = connection.EC2ConnectionClient().client()
+        self.assertIs(first, second)
+        self.assertEqual('us-east-1', first.region.name)
+
+
+class TestConfigFileCache(testtools.TestCase):
+
+    def setUp(self):
+        super(TestConfigFileCache, self).setUp()
+        fd, self.config_path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.config_path)
+        self.write_config('us-east-1')
+
+    def write_config(self, region_name):
+        with open(self.config_path, 'w') as config_file:
+            config_file.write(
+                '[Credentials]\n'
+                'aws_access_key_id = a\n'
+                'aws_secret_access_key = b\n'
+                '[Boto]\n'
+                'ec2_region_name = {0}\n'.format(region_name))
+
+    def test_parse_config_file_is_cached(self):
+        """ Tests that an unchanged config file
+            is parsed only once.
+        """
+        client = connection.EC2ConnectionClient()
+        with mock.patch.object(
+                client, '_read_config_file',
+                wraps=client._read_config_file) as mock_read:
+            first = client._parse_config_file(self.config_path)
+            second = client._parse_config_file(self.config_path)
+            self.assertEqual(1, mock_read.call_count)
+        self.assertEqual(first, second)
+        self.assertEqual('us-east-1', first['ec2_region_name'])
+
+        first['ec2_region_name'] = 'changed'
+        self.assertEqual(
+            'us-east-1',
+            client._parse_config_file(self.config_path)['ec2_region_name'])
+
+    def test_parse_config_file_changed(self):
+        """ Tests that a config file is parsed again
+            once its size or mtime change.
+        """
+        client = connection.EC2ConnectionClient()
+        client._parse_config_file(self.config_path)
+        self.write_config('eu-central-1')
+        self.assertEqual(
+            'eu-central-1',
+            client._parse_config_file(self.config_path)['ec2_region_name'])
+
+    def test_get_region_object_is_cached(self):
+        """ Tests that region objects are looked up once
+            and that endpoint overrides get their own object.
+        """
+        with mock.patch('cloudify_aws.connection.get_region',
+                        wraps=connection.get_region) as mock_get_region:
+            first = connection.get_region_object('ap-northeast-1')
+            second = connection.get_region_object('ap-northeast-1')
+            self.assertIs(first, second)
+            self.assertEqual(1, mock_get_region.call_count)
+
+        overridden = connection.get_region_object(
+            'ap-northeast-1', 'ec2.example.com')
+        self.assertEqual('ec2.example.com', overridden.endpoint)
+        self.assertNotEqual('ec2.example.com', first.endpoint)
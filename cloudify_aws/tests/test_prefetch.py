@@ -0,0 +1,124 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import testtools
+from cloudify.state import current_ctx
+
+# Third Party Imports
+import mock
+from cloudify_aws import constants, base
+from cloudify_aws.base import AwsBase
+from cloudify.mocks import MockCloudifyContext
+
+
+class TestDeploymentPrefetch(testtools.TestCase):
+
+    def setUp(self):
+        super(TestDeploymentPrefetch, self).setUp()
+        base.deployment_prefetch.clear()
+        self.addCleanup(base.deployment_prefetch.clear)
+
+    def get_mock_ctx(self, test_name, aws_config=None):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: aws_config or {},
+            'use_external_resource': False,
+            'resource_id': test_name
+        }
+        ctx = MockCloudifyContext(
+                node_id=test_name,
+                deployment_id='test_deployment',
+                properties=test_properties
+        )
+        return ctx
+
+    def volumes_function(self):
+        tagged = [mock.Mock(id='vol-1'), mock.Mock(id='vol-2')]
+        untagged = mock.Mock(id='vol-3')
+
+        def get_all_volumes(volume_ids=None, filters=None):
+            if filters:
+                return tagged
+            return [v for v in tagged + [untagged] if v.id in volume_ids]
+
+        return mock.Mock(__name__='get_all_volumes',
+                         side_effect=get_all_volumes)
+
+    def test_lookup_uses_one_call_per_type(self):
+        """ Tests that the resources of the deployment are fetched once
+            and that other resources are described by id.
+        """
+        ctx = self.get_mock_ctx('test_lookup_uses_one_call_per_type',
+                                {'prefetch_ttl': 60})
+        current_ctx.set(ctx=ctx)
+        get_all_volumes = self.volumes_function()
+        resource = AwsBase(client=mock.Mock())
+
+        for volume_id in ['vol-1', 'vol-2', 'vol-1']:
+            self.assertEqual(volume_id, resource.filter_for_single_resource(
+                    get_all_volumes, {'volume_ids': volume_id}).id)
+        get_all_volumes.assert_called_once_with(
+                filters={'tag:deployment_id': 'test_deployment'})
+
+        self.assertEqual('vol-3', resource.filter_for_single_resource(
+                get_all_volumes, {'volume_ids': 'vol-3'}).id)
+        self.assertEqual(2, get_all_volumes.call_count)
+
+    def test_lookup_disabled(self):
+        """ Tests that nothing is prefetched without prefetch_ttl.
+        """
+        ctx = self.get_mock_ctx('test_lookup_disabled')
+        current_ctx.set(ctx=ctx)
+        get_all_volumes = self.volumes_function()
+        resource = AwsBase(client=mock.Mock())
+
+        resource.filter_for_single_resource(
+                get_all_volumes, {'volume_ids': 'vol-1'})
+        get_all_volumes.assert_called_once_with(volume_ids='vol-1')
+
+    def test_forget_after_change(self):
+        """ Tests that a resource changed by this process is
+            described again instead of served from the prefetch.
+        """
+        ctx = self.get_mock_ctx('test_forget_after_change',
+                                {'prefetch_ttl': 60})
+        current_ctx.set(ctx=ctx)
+        get_all_volumes = self.volumes_function()
+        resource = AwsBase(client=mock.Mock())
+        resource.filter_for_single_resource(
+                get_all_volumes, {'volume_ids': 'vol-1'})
+
+        base.deployment_prefetch.forget(['vol-1'])
+        resource.filter_for_single_resource(
+                get_all_volumes, {'volume_ids': 'vol-1'})
+        get_all_volumes.assert_called_with(volume_ids='vol-1')
+        self.assertEqual(2, get_all_volumes.call_count)
+
+    def test_entry_expires(self):
+        """ Tests that the prefetch is fetched again after the TTL.
+        """
+        ctx = self.get_mock_ctx('test_entry_expires', {'prefetch_ttl': 5})
+        current_ctx.set(ctx=ctx)
+        get_all_volumes = self.volumes_function()
+
+        with mock.patch('cloudify_aws.prefetch.time.time') as mock_time:
+            mock_time.return_value = 1000
+            base.deployment_prefetch.lookup(get_all_volumes, 'vol-1')
+            mock_time.return_value = 1004
+            base.deployment_prefetch.lookup(get_all_volumes, 'vol-1')
+            self.assertEqual(1, get_all_volumes.call_count)
+            mock_time.return_value = 1006
+            base.deployment_prefetch.lookup(get_all_volumes, 'vol-1')
+            self.assertEqual(2, get_all_volumes.call_count)
@@ -0,0 +1,98 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import os
+import shutil
+import tempfile
+import testtools
+from cloudify.state import current_ctx
+
+# Third Party Imports
+import mock
+from cloudify_aws import constants, profiling
+from cloudify.mocks import MockCloudifyContext
+
+
+class TestProfiling(testtools.TestCase):
+
+    def setUp(self):
+        super(TestProfiling, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def get_mock_ctx(self, test_name, aws_config=None):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: aws_config or {},
+            'use_external_resource': False,
+            'resource_id': test_name
+        }
+        ctx = MockCloudifyContext(
+                node_id=test_name,
+                deployment_id=test_name,
+                properties=test_properties,
+                operation={'name': 'cloudify.interfaces.lifecycle.create'}
+        )
+        ctx._mock_context_logger = mock.Mock()
+        return ctx
+
+    def test_profile_written(self):
+        """ Tests that a profiled operation writes its profile
+            and summary, named by deployment, node instance and
+            operation, once when it calls another operation.
+        """
+        ctx = self.get_mock_ctx('test_profile_written',
+                                {'profile': True,
+                                 'profile_dir': self.directory,
+                                 'profile_top': 5})
+        current_ctx.set(ctx=ctx)
+
+        @profiling.profiled
+        def start():
+            return sorted(range(100))
+
+        @profiling.profiled
+        def create():
+            return start()
+
+        self.assertEqual(range(100), create())
+
+        names = sorted(os.listdir(self.directory))
+        self.assertEqual(2, len(names))
+        self.assertTrue(names[0].startswith(
+            'test_profile_written.test_profile_written.'
+            'cloudify.interfaces.lifecycle.create.'))
+        self.assertTrue(names[0].endswith('.prof'))
+        self.assertEqual(names[0][:-len('.prof')] + '.txt', names[1])
+        with open(os.path.join(self.directory, names[1])) as summary:
+            self.assertIn('start', summary.read())
+
+    def test_not_profiled_by_default(self):
+        """ Tests that operations are not profiled unless
+            aws_config has profile.
+        """
+        ctx = self.get_mock_ctx('test_not_profiled_by_default',
+                                {'profile_dir': self.directory})
+        current_ctx.set(ctx=ctx)
+
+        @profiling.profiled
+        def create():
+            return 'created'
+
+        with mock.patch('cloudify_aws.profiling.cProfile.Profile') \
+                as mock_profile:
+            self.assertEqual('created', create())
+        self.assertFalse(mock_profile.called)
+        self.assertEqual([], os.listdir(self.directory))
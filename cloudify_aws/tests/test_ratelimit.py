@@ -0,0 +1,133 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import os
+import shutil
+import tempfile
+import testtools
+from cloudify.state import current_ctx
+
+# Third Party Imports
+import mock
+from cloudify_aws import constants, ratelimit
+from cloudify_aws.base import call_aws_api
+from cloudify.mocks import MockCloudifyContext
+
+
+class TestRateLimit(testtools.TestCase):
+
+    def setUp(self):
+        super(TestRateLimit, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def get_mock_ctx(self, test_name, aws_config=None):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: aws_config or {},
+            'use_external_resource': False,
+            'resource_id': test_name
+        }
+        ctx = MockCloudifyContext(
+                node_id=test_name,
+                deployment_id=test_name,
+                properties=test_properties
+        )
+        return ctx
+
+    def test_token_bucket(self):
+        """ Tests that a bucket allows a burst,
+            then asks callers to wait for the refill.
+        """
+        path = os.path.join(self.directory, 'bucket')
+        with mock.patch('cloudify_aws.ratelimit.time.time') as mock_time:
+            mock_time.return_value = 1000.0
+            bucket = ratelimit.TokenBucket(path, rate=2)
+            self.assertEqual(0, bucket._take())
+            self.assertEqual(0, bucket._take())
+            self.assertAlmostEqual(0.5, bucket._take())
+            mock_time.return_value = 1000.5
+            self.assertEqual(0, bucket._take())
+
+    def test_token_bucket_shared(self):
+        """ Tests that buckets using the same file
+            share their tokens.
+        """
+        path = os.path.join(self.directory, 'bucket')
+        with mock.patch('cloudify_aws.ratelimit.time.time') as mock_time:
+            mock_time.return_value = 1000.0
+            first = ratelimit.TokenBucket(path, rate=1)
+            second = ratelimit.TokenBucket(path, rate=1)
+            self.assertEqual(0, first._take())
+            self.assertAlmostEqual(1, second._take())
+
+    def test_token_bucket_acquire_waits(self):
+        """ Tests that acquire sleeps until a token is available.
+        """
+        path = os.path.join(self.directory, 'bucket')
+        bucket = ratelimit.TokenBucket(path, rate=1)
+        with mock.patch.object(bucket, '_take',
+                               side_effect=[0.25, 0]) as mock_take:
+            with mock.patch('cloudify_aws.ratelimit.time.sleep') \
+                    as mock_sleep:
+                bucket.acquire()
+        self.assertEqual(2, mock_take.call_count)
+        mock_sleep.assert_called_once_with(0.25)
+
+    def test_limiter_disabled_by_default(self):
+        """ Tests that without rate limits in aws_config
+            calls are not wrapped.
+        """
+        ctx = self.get_mock_ctx('test_limiter_disabled_by_default')
+        current_ctx.set(ctx=ctx)
+        limiter = ratelimit.RateLimiter.from_aws_config({})
+        fn = mock.Mock()
+        self.assertIs(fn, limiter.limit(fn))
+
+    def test_limiter_buckets(self):
+        """ Tests that describe and mutating calls
+            take tokens from separate buckets.
+        """
+        aws_config = {
+            'describe_rate_limit': 10,
+            'mutating_rate_limit': 2,
+            'rate_limit_dir': self.directory
+        }
+        ctx = self.get_mock_ctx('test_limiter_buckets', aws_config)
+        current_ctx.set(ctx=ctx)
+        limiter = ratelimit.RateLimiter.from_aws_config(aws_config)
+
+        describe = mock.Mock(__name__='get_all_instances')
+        mutate = mock.Mock(__name__='run_instances')
+        self.assertEqual(10, limiter.bucket_for(describe).rate)
+        self.assertEqual(2, limiter.bucket_for(mutate).rate)
+        self.assertNotEqual(limiter.bucket_for(describe).path,
+                            limiter.bucket_for(mutate).path)
+
+    def test_call_aws_api_takes_token(self):
+        """ Tests that call_aws_api takes a token
+            before calling the API.
+        """
+        ctx = self.get_mock_ctx(
+            'test_call_aws_api_takes_token',
+            aws_config={'describe_rate_limit': 10,
+                        'rate_limit_dir': self.directory})
+        current_ctx.set(ctx=ctx)
+        fn = mock.Mock(__name__='get_all_instances', return_value=[])
+        with mock.patch('cloudify_aws.ratelimit.TokenBucket.acquire') \
+                as mock_acquire:
+            self.assertEqual([], call_aws_api(fn, dict(instance_ids=['i'])))
+        mock_acquire.assert_called_once_with()
+        fn.assert_called_once_with(instance_ids=['i'])
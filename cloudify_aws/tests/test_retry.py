@@ -0,0 +1,250 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import socket
+import httplib
+import testtools
+from cloudify.state import current_ctx
+from boto.exception import EC2ResponseError, BotoServerError
+from boto.https_connection import InvalidCertificateException
+
+# Third Party Imports
+import mock
+from cloudify_aws import constants, retry
+from cloudify_aws.base import AwsBase, AwsBaseNode
+from cloudify_aws.ec2.instance import Instance
+from cloudify.mocks import MockCloudifyContext
+from cloudify.exceptions import NonRecoverableError, RecoverableError
+
+
+def aws_error(code, status=400):
+    return EC2ResponseError(
+        status, 'error',
+        '<Response><Errors><Error><Code>{0}</Code>'
+        '<Message>message</Message></Error></Errors></Response>'
+        .format(code))
+
+
+class TestRetry(testtools.TestCase):
+
+    def setUp(self):
+        super(TestRetry, self).setUp()
+        patcher = mock.patch('cloudify_aws.retry.time.sleep')
+        self.mock_sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_mock_ctx(self, test_name, aws_config=None):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: aws_config or {},
+            'use_external_resource': False,
+            'resource_id': test_name
+        }
+        ctx = MockCloudifyContext(
+                node_id=test_name,
+                deployment_id=test_name,
+                properties=test_properties
+        )
+        return ctx
+
+    def test_classify(self):
+        """ Tests that AWS errors are sorted
+            into the right retry categories.
+        """
+        self.assertEqual(retry.THROTTLE,
+                         retry.classify(aws_error('RequestLimitExceeded')))
+        self.assertEqual(retry.THROTTLE,
+                         retry.classify(BotoServerError(
+                             400, 'error',
+                             '<Code>Throttling</Code>')))
+        self.assertEqual(retry.TRANSIENT,
+                         retry.classify(aws_error('Unavailable', 503)))
+        self.assertEqual(retry.TRANSIENT,
+                         retry.classify(aws_error('Whatever', 500)))
+        self.assertEqual(retry.NOT_FOUND,
+                         retry.classify(
+                             aws_error('InvalidInstanceID.NotFound')))
+        self.assertEqual(retry.FATAL,
+                         retry.classify(aws_error('InvalidParameterValue')))
+        self.assertEqual(retry.FATAL,
+                         retry.classify(EC2ResponseError(
+                             mock.Mock(), 'error')))
+        self.assertEqual(retry.TRANSIENT,
+                         retry.classify(socket.error('reset')))
+        self.assertEqual(retry.TRANSIENT,
+                         retry.classify(httplib.BadStatusLine('')))
+        self.assertEqual(retry.FATAL,
+                         retry.classify(InvalidCertificateException(
+                             'host', None, 'reason')))
+
+    def test_escalate(self):
+        """ Tests that only retryable errors
+            become RecoverableError.
+        """
+        self.assertIsInstance(
+            retry.escalate(aws_error('RequestLimitExceeded')),
+            RecoverableError)
+        self.assertIsInstance(
+            retry.escalate(aws_error('InvalidInstanceID.NotFound')),
+            NonRecoverableError)
+
+    def test_policy_retries_throttling(self):
+        """ Tests that throttled calls are retried
+            until they succeed.
+        """
+        ctx = self.get_mock_ctx('test_policy_retries_throttling')
+        current_ctx.set(ctx=ctx)
+        fn = mock.Mock(side_effect=[aws_error('RequestLimitExceeded'),
+                                    aws_error('InternalError', 500),
+                                    'output'])
+        policy = retry.RetryPolicy(max_attempts=5, deadline=600)
+        self.assertEqual('output', policy.call(fn, dict(key='value')))
+        self.assertEqual(3, fn.call_count)
+        fn.assert_called_with(key='value')
+        self.assertEqual(2, self.mock_sleep.call_count)
+
+    def test_policy_gives_up(self):
+        """ Tests that fatal errors are not retried
+            and that retries stop after max_attempts.
+        """
+        ctx = self.get_mock_ctx('test_policy_gives_up')
+        current_ctx.set(ctx=ctx)
+        policy = retry.RetryPolicy(max_attempts=3, deadline=600)
+
+        fn = mock.Mock(side_effect=aws_error('InvalidParameterValue'))
+        self.assertRaises(EC2ResponseError, policy.call, fn)
+        self.assertEqual(1, fn.call_count)
+
+        fn = mock.Mock(side_effect=aws_error('RequestLimitExceeded'))
+        self.assertRaises(EC2ResponseError, policy.call, fn)
+        self.assertEqual(3, fn.call_count)
+
+    def test_policy_not_found(self):
+        """ Tests that NotFound is only retried
+            when the caller asks for it.
+        """
+        ctx = self.get_mock_ctx('test_policy_not_found')
+        current_ctx.set(ctx=ctx)
+        policy = retry.RetryPolicy(max_attempts=3, deadline=600)
+        error = aws_error('InvalidInstanceID.NotFound')
+
+        fn = mock.Mock(side_effect=[error, 'output'])
+        self.assertRaises(EC2ResponseError, policy.call, fn)
+
+        fn = mock.Mock(side_effect=[error, 'output'])
+        self.assertEqual('output', policy.call(fn, retry_not_found=True))
+
+    def test_policy_deadline(self):
+        """ Tests that no retry is attempted past the deadline.
+        """
+        ctx = self.get_mock_ctx('test_policy_deadline')
+        current_ctx.set(ctx=ctx)
+        policy = retry.RetryPolicy(max_attempts=10,
+                                   base_delay=5, max_delay=5, deadline=1)
+        fn = mock.Mock(side_effect=aws_error('RequestLimitExceeded'))
+        self.assertRaises(EC2ResponseError, policy.call, fn)
+        self.assertEqual(1, fn.call_count)
+        self.assertFalse(self.mock_sleep.called)
+
+    def test_policy_deadline_from_start(self):
+        """ Tests that the deadline is counted from the start
+            of the operation, not from each call.
+        """
+        ctx = self.get_mock_ctx('test_policy_deadline_from_start')
+        current_ctx.set(ctx=ctx)
+        policy = retry.RetryPolicy(max_attempts=10,
+                                   base_delay=5, max_delay=5, deadline=60)
+        with mock.patch('cloudify_aws.retry.time.time') as mock_time:
+            mock_time.return_value = 1000
+            fn = mock.Mock(side_effect=[aws_error('RequestLimitExceeded'),
+                                        'output'])
+            self.assertEqual('output', policy.call(fn, started=960))
+            fn = mock.Mock(side_effect=aws_error('RequestLimitExceeded'))
+            self.assertRaises(EC2ResponseError, policy.call, fn,
+                              started=940)
+            self.assertEqual(1, fn.call_count)
+
+    def test_policy_retries_connection_errors(self):
+        """ Tests that a request whose connection failed
+            is retried by the policy.
+        """
+        ctx = self.get_mock_ctx('test_policy_retries_connection_errors')
+        current_ctx.set(ctx=ctx)
+        fn = mock.Mock(side_effect=[socket.error('reset'), 'output'])
+        policy = retry.RetryPolicy(max_attempts=3, deadline=600)
+        self.assertEqual('output', policy.call(fn))
+        self.assertEqual(2, fn.call_count)
+
+    def test_policy_delays(self):
+        """ Tests that backoff delays stay between
+            base_delay and max_delay.
+        """
+        policy = retry.RetryPolicy(base_delay=1, max_delay=8)
+        delays = policy.delays()
+        for _ in range(50):
+            delay = next(delays)
+            self.assertTrue(1 <= delay <= 8)
+
+    def test_execute_uses_aws_config(self):
+        """ Tests that execute takes its retry settings from
+            aws_config and escalates throttling to RecoverableError.
+        """
+        ctx = self.get_mock_ctx(
+            'test_execute_uses_aws_config',
+            aws_config={'retry_max_attempts': 2})
+        current_ctx.set(ctx=ctx)
+        resource = AwsBase(client=mock.Mock())
+        fn = mock.Mock(side_effect=aws_error('RequestLimitExceeded'))
+        self.assertRaises(RecoverableError, resource.execute, fn)
+        self.assertEqual(2, fn.call_count)
+
+    def test_tag_resource_throttled(self):
+        """ Tests that a tag request that AWS kept throttling
+            leaves the operation recoverable.
+        """
+        ctx = self.get_mock_ctx(
+            'test_tag_resource_throttled',
+            aws_config={'retry_max_attempts': 2})
+        current_ctx.set(ctx=ctx)
+        resource = AwsBaseNode('root', [], client=mock.Mock(),
+                               resource_states=[])
+        tagged = mock.Mock()
+        tagged.add_tags.side_effect = aws_error('RequestLimitExceeded')
+        ex = self.assertRaises(RecoverableError, resource._tag_resource,
+                               tagged, {'Name': 'root'})
+        self.assertIn('unable to tag resource name', ex.message)
+        self.assertEqual(2, tagged.add_tags.call_count)
+
+    def test_instance_describes_retried(self):
+        """ Tests that the instance lookups retry throttled
+            describes and escalate them to RecoverableError.
+        """
+        ctx = self.get_mock_ctx(
+            'test_instance_describes_retried',
+            aws_config={'retry_max_attempts': 2})
+        ctx.instance.runtime_properties['reservation_id'] = 'r-abcd1234'
+        current_ctx.set(ctx=ctx)
+        client = mock.Mock()
+        client.get_all_reservations.side_effect = \
+            aws_error('RequestLimitExceeded')
+        client.get_all_instances.side_effect = \
+            aws_error('RequestLimitExceeded')
+        instance = Instance(client=client)
+        self.assertRaises(RecoverableError, instance._get_all_instances,
+                          list_of_instance_ids='i-abcd1234')
+        self.assertRaises(RecoverableError,
+                          instance._get_instances_from_reservation_id)
+        self.assertEqual(2, client.get_all_reservations.call_count)
+        self.assertEqual(2, client.get_all_instances.call_count)
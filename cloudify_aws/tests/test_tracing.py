@@ -0,0 +1,121 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import testtools
+from cloudify.state import current_ctx
+from boto.exception import EC2ResponseError
+
+# Third Party Imports
+import mock
+from moto import mock_ec2
+from cloudify_aws import constants, connection, tracing
+from cloudify_aws.base import AwsBase
+from cloudify.mocks import MockCloudifyContext
+
+
+class TestTracing(testtools.TestCase):
+
+    def get_mock_ctx(self, test_name, aws_config=None):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: aws_config or {},
+            'use_external_resource': False,
+            'resource_id': test_name
+        }
+        ctx = MockCloudifyContext(
+                node_id=test_name,
+                deployment_id=test_name,
+                properties=test_properties,
+                operation={'name': 'cloudify.interfaces.lifecycle.create'}
+        )
+        ctx._mock_context_logger = mock.Mock()
+        return ctx
+
+    @mock_ec2
+    def test_operation_summary(self):
+        """ Tests that the requests of an operation, including those
+            made in its threads and those that failed, are summarized
+            when it ends and kept in a runtime property if enabled.
+        """
+        ctx = self.get_mock_ctx('test_operation_summary',
+                                {'record_api_stats': True})
+        current_ctx.set(ctx=ctx)
+
+        @tracing.traced
+        def create():
+            resource = AwsBase(
+                    client=connection.EC2ConnectionClient().client())
+            resource.execute_many(
+                resource.client.get_all_volumes, [{}] * 3, concurrency=3)
+            with testtools.ExpectedException(EC2ResponseError):
+                resource.client.get_all_instances(
+                        instance_ids=['i-1a2b3c4d'])
+            return 'created'
+
+        self.assertEqual('created', create())
+
+        stats = ctx.instance.runtime_properties[
+            constants.API_STATS_PROPERTY][
+            'cloudify.interfaces.lifecycle.create']
+        self.assertEqual(4, stats['calls'])
+        self.assertEqual(3, stats['apis']['DescribeVolumes']['calls'])
+        self.assertEqual({'InvalidInstanceID.NotFound': 1},
+                         stats['apis']['DescribeInstances']['errors'])
+        self.assertGreater(stats['apis']['DescribeVolumes']['bytes'], 0)
+        self.assertIsNone(tracing.current_trace())
+
+        message = ctx.logger.info.call_args[0][0]
+        self.assertIn('AWS API calls of '
+                      'cloudify.interfaces.lifecycle.create: 4 calls',
+                      message)
+        self.assertIn('DescribeVolumes: 3 calls', message)
+
+    @mock_ec2
+    def test_requests_outside_operation(self):
+        """ Tests that requests made outside of a traced operation
+            are not counted and that stats are not kept by default.
+        """
+        ctx = self.get_mock_ctx('test_requests_outside_operation')
+        current_ctx.set(ctx=ctx)
+        client = connection.EC2ConnectionClient().client()
+        client.get_all_volumes()
+        self.assertIsNone(tracing.current_trace())
+
+        tracing.traced(client.get_all_volumes)()
+        self.assertNotIn(constants.API_STATS_PROPERTY,
+                         ctx.instance.runtime_properties)
+        self.assertTrue(ctx.logger.info.called)
+
+    @mock_ec2
+    def test_listeners(self):
+        """ Tests that listeners get the summary of every traced
+            operation, including operations without requests.
+        """
+        ctx = self.get_mock_ctx('test_listeners')
+        current_ctx.set(ctx=ctx)
+        listener = mock.Mock()
+        tracing.listeners.append(listener)
+        self.addCleanup(tracing.listeners.remove, listener)
+
+        tracing.traced(lambda: None)()
+        client = connection.EC2ConnectionClient().client()
+        tracing.traced(client.get_all_volumes)()
+
+        self.assertEqual(2, listener.call_count)
+        operation_name, summary = listener.call_args_list[0][0]
+        self.assertEqual('cloudify.interfaces.lifecycle.create',
+                         operation_name)
+        self.assertEqual(0, summary['calls'])
+        self.assertEqual(1, listener.call_args[0][1]['calls'])
@@ -0,0 +1,156 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import shutil
+import tempfile
+import testtools
+from cloudify.state import current_ctx
+
+# Third Party Imports
+import mock
+from moto import mock_ec2
+from cloudify_aws import constants
+from cloudify_aws.base import AwsBaseNode
+from cloudify_aws.transitions import TransitionHistogram, TransitionModel
+from cloudify_aws.waiter import Waiter
+from cloudify.mocks import MockCloudifyContext
+
+
+class TestTransitions(testtools.TestCase):
+
+    states = [{'name': 'create',
+               'success': ['available'],
+               'waiting': ['pending'],
+               'failed': ['error']}]
+
+    def setUp(self):
+        super(TestTransitions, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = mock.patch('cloudify_aws.utils.tempfile.gettempdir',
+                             return_value=directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_mock_ctx(self, test_name, retry_number=0):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: {'wait_window': 20},
+            'use_external_resource': False,
+            'resource_id': test_name
+        }
+        ctx = MockCloudifyContext(
+                node_id=test_name,
+                deployment_id=test_name,
+                properties=test_properties,
+                operation={'name': 'create', 'retry_number': retry_number}
+        )
+        return ctx
+
+    def histogram(self, *seconds):
+        histogram = TransitionHistogram()
+        for value in seconds:
+            histogram.add(value)
+        return histogram
+
+    def test_histogram_percentiles(self):
+        """ Tests that percentiles are the bucket bounds that hold
+            the fraction of transitions, once there are enough.
+        """
+        self.assertIsNone(self.histogram(1, 2).percentile(0.5))
+        histogram = self.histogram(2.5, 2.9, 2.1, 40, 44)
+        self.assertEqual(3, histogram.percentile(0.5))
+        self.assertEqual(45, histogram.percentile(0.9))
+        self.assertEqual(1200, self.histogram(
+                5000, 5000, 5000).percentile(0.5))
+
+    def test_histogram_decays(self):
+        """ Tests that old transitions weigh less than new ones.
+        """
+        histogram = self.histogram(
+                *([40] * (constants.TRANSITION_HISTORY_SIZE - 1)))
+        for _ in range(constants.TRANSITION_HISTORY_SIZE):
+            histogram.add(3)
+        self.assertLess(histogram.total, constants.TRANSITION_HISTORY_SIZE)
+        self.assertEqual(3, histogram.percentile(0.5))
+
+    def test_model_is_scoped_by_region(self):
+        """ Tests that transitions are recorded per resource type and
+            operation, in the histogram of the account and region.
+        """
+        current_ctx.set(ctx=self.get_mock_ctx('test_model_is_scoped'))
+        model = TransitionModel.from_aws_config({})
+        for _ in range(3):
+            model.record('volume', 'create', 2.5)
+        self.assertEqual(3, model.histogram(
+                'volume', 'create').percentile(0.5))
+        self.assertIsNone(model.histogram(
+                'instance', 'create').percentile(0.5))
+        self.assertIsNone(TransitionModel.from_aws_config(
+                {'ec2_region_name': 'eu-west-1'}).histogram(
+                'volume', 'create').percentile(0.5))
+        self.assertIsNone(TransitionModel.from_aws_config(
+                {'learn_transition_times': False}))
+
+    def test_waiter_schedule(self):
+        """ Tests that the first poll waits for the typical time, and
+            that a transition that is slower than the window is
+            retried when it typically ends.
+        """
+        clock = [1000]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with mock.patch('cloudify_aws.waiter.time.time',
+                        side_effect=lambda: clock[0]), \
+                mock.patch('cloudify_aws.waiter.time.sleep',
+                           side_effect=sleep) as mock_sleep:
+            fast = Waiter.from_aws_config(
+                    {}, self.histogram(3, 3, 3, 5), started=clock[0])
+            self.assertEqual([0, 1, 2], list(fast.polls()))
+            self.assertEqual([mock.call(3), mock.call(6)],
+                             mock_sleep.call_args_list)
+            self.assertEqual(12, fast.retry_after)
+
+            mock_sleep.reset_mock()
+            slow = Waiter.from_aws_config(
+                    {}, self.histogram(40, 45, 45, 60), started=clock[0] - 5)
+            self.assertEqual([0], list(slow.polls()))
+            self.assertFalse(mock_sleep.called)
+            self.assertEqual(40, slow.retry_after)
+
+    @mock_ec2
+    @mock.patch('cloudify_aws.base.AwsBaseNode.post_create')
+    @mock.patch('cloudify_aws.base.AwsBaseNode.create', return_value=True)
+    @mock.patch('cloudify_aws.base.AwsBaseNode.get_resource')
+    def test_state_change_handler_records_transition(self, *_):
+        """ Tests that the time from the request to the success state
+            is recorded for the resource type and operation.
+        """
+        ctx = self.get_mock_ctx('test_records_transition')
+        current_ctx.set(ctx=ctx)
+        resource = AwsBaseNode('volume', [], resource_states=self.states)
+
+        with mock.patch('cloudify_aws.base.AwsBaseNode.get_resource_state',
+                        side_effect=['pending', 'available']), \
+                mock.patch('cloudify_aws.waiter.time.sleep'), \
+                mock.patch('cloudify_aws.transitions.TransitionModel'
+                           '.record') as mock_record:
+            self.assertEqual(
+                    True, resource.cloudify_resource_state_change_handler())
+        mock_record.assert_called_once_with('volume', 'create', mock.ANY)
+        self.assertNotIn(constants.TRANSITION_STARTED_PROPERTY,
+                         ctx.instance.runtime_properties)
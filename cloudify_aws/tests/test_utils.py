@@ -0,0 +1,124 @@
+########
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import testtools
+from cloudify.state import current_ctx
+
+# Third Party Imports
+import mock
+from cloudify_aws import constants, utils
+from cloudify.mocks import MockCloudifyContext
+
+
+class ResultSet(list):
+    next_token = None
+
+
+class TestUtils(testtools.TestCase):
+
+    def get_mock_ctx(self, test_name, aws_config=None):
+        test_properties = {
+            constants.AWS_CONFIG_PROPERTY: aws_config or {},
+            'use_external_resource': False,
+            'resource_id': test_name
+        }
+        ctx = MockCloudifyContext(
+                node_id=test_name,
+                deployment_id=test_name,
+                properties=test_properties
+        )
+        ctx._mock_context_logger = mock.Mock()
+        return ctx
+
+    def pages(self, *pages):
+        result = []
+        for index, page in enumerate(pages):
+            result_set = ResultSet(page)
+            if index < len(pages) - 1:
+                result_set.next_token = 'token-{0}'.format(index + 1)
+            result.append(result_set)
+        return result
+
+    def test_list_available_resources_stops_at_limit(self):
+        """ Tests that the listing stops fetching pages
+            once the limit is reached.
+        """
+        ctx = self.get_mock_ctx('test_list_available_resources_stops',
+                                {'diagnostics_max_results': 6})
+        current_ctx.set(ctx=ctx)
+        list_function = mock.Mock(side_effect=self.pages(
+                range(0, 5), range(5, 10), range(10, 15)))
+
+        utils.log_available_resources(utils.list_available_resources(
+                list_function, utils.get_diagnostics_filters()))
+
+        self.assertEqual(2, list_function.call_count)
+        first, second = list_function.call_args_list
+        self.assertEqual(
+                dict(filters={'tag:deployment_id':
+                              'test_list_available_resources_stops'},
+                     max_results=7, next_token=None),
+                first[1])
+        self.assertEqual('token-1', second[1]['next_token'])
+        message = ctx.logger.debug.call_args[0][0]
+        self.assertIn('\n'.join(str(i) for i in range(6)), message)
+        self.assertNotIn('\n6', message)
+        self.assertIn('only the first 6 are listed', message)
+
+    def test_list_available_resources_not_paginated(self):
+        """ Tests that a describe function without pagination
+            is called once, with the filters only.
+        """
+        ctx = self.get_mock_ctx('test_list_available_resources_single')
+        current_ctx.set(ctx=ctx)
+        list_function = mock.Mock(return_value=['eip-1', 'eip-2'])
+
+        utils.log_available_resources(utils.list_available_resources(
+                list_function, paginated=False))
+
+        list_function.assert_called_once_with(filters=None)
+        self.assertEqual('Available resources: \neip-1\neip-2',
+                         ctx.logger.debug.call_args[0][0])
+
+    def test_log_available_resources_disabled(self):
+        """ Tests that nothing is listed when
+            diagnostics_max_results is 0.
+        """
+        ctx = self.get_mock_ctx('test_log_available_resources_disabled',
+                                {'diagnostics_max_results': 0})
+        current_ctx.set(ctx=ctx)
+        list_function = mock.Mock(return_value=ResultSet(['i-1']))
+
+        utils.log_available_resources(
+                utils.list_available_resources(list_function))
+
+        self.assertFalse(list_function.called)
+        self.assertFalse(ctx.logger.debug.called)
+
+    def test_is_resource_id(self):
+        """ Tests that short and long resource IDs match
+            and that names and other types do not.
+        """
+        vpc_id_format = constants.VPC['ID_FORMAT']
+        self.assertTrue(utils.is_resource_id('vpc-1a2b3c4d', vpc_id_format))
+        self.assertTrue(utils.is_resource_id(
+                'vpc-0123456789abcdef0', vpc_id_format))
+        self.assertFalse(utils.is_resource_id(
+                'vpc-0123456789abcdef', vpc_id_format))
+        self.assertFalse(utils.is_resource_id('my-vpc', vpc_id_format))
+        self.assertFalse(utils.is_resource_id(
+                'subnet-1a2b3c4d', vpc_id_format))
+        self.assertFalse(utils.is_resource_id(None, vpc_id_format))
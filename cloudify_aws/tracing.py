@@ -0,0 +1,209 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import functools
+import threading
+import time
+
+# Third-party Imports
+from boto.connection import HTTPResponse
+from boto.exception import BotoServerError
+
+# Cloudify Imports
+from . import constants, retry, utils
+from cloudify import ctx
+from cloudify.state import current_ctx
+
+# The traces of the operations that are running in this process, by the
+# id of their context. Threads that an operation starts share its context,
+# so their calls are counted in the operation's trace.
+_traces = {}
+_traces_lock = threading.Lock()
+
+# Functions that are called with the operation's name and the summary of
+# its trace when a traced operation ends, in the operation's context, such
+# as the collector of the benchmarks.
+listeners = []
+
+
+class OperationTrace(object):
+    """Counts the AWS API requests of an operation, with the time they
+    took, the bytes they returned and the errors they failed with.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.apis = {}
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record_request(self, action, seconds, size=None, error_code=None):
+        with self._lock:
+            stats = self.apis.setdefault(
+                action, {'calls': 0, 'time': 0.0, 'bytes': 0, 'errors': {}})
+            stats['calls'] += 1
+            stats['time'] += seconds
+            stats['bytes'] += size or 0
+            if error_code:
+                stats['errors'][error_code] = \
+                    stats['errors'].get(error_code, 0) + 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def summary(self):
+        with self._lock:
+            apis = dict(
+                (action, dict(stats, time=round(stats['time'], 3),
+                              errors=dict(stats['errors'])))
+                for action, stats in self.apis.items())
+        return {
+            'calls': sum(stats['calls'] for stats in apis.values()),
+            'wall_time': round(time.time() - self.started, 3),
+            'aws_time': round(sum(stats['time'] for stats in apis.values()),
+                              3),
+            'retries': self.retries,
+            'apis': apis
+        }
+
+    @staticmethod
+    def format_summary(operation_name, summary):
+        apis = sorted(summary['apis'].items(),
+                      key=lambda item: -item[1]['time'])
+        message = \
+            'AWS API calls of {0}: {1} calls, {2:.2f}s of {3:.2f}s ' \
+            'waiting on AWS, {4} retries.'.format(
+                operation_name, summary['calls'], summary['aws_time'],
+                summary['wall_time'], summary['retries'])
+        for action, stats in apis:
+            message += '\n  {0}: {1} calls, {2:.2f}s{3}'.format(
+                action, stats['calls'], stats['time'],
+                ''.join(', {0} x{1}'.format(code, count)
+                        for code, count in sorted(stats['errors'].items())))
+        return message
+
+
+def _get_context():
+    try:
+        return current_ctx.get_ctx()
+    except RuntimeError:
+        return None
+
+
+def current_trace():
+    """Returns the trace of the operation that is running in this
+    thread, or None if there is none.
+    """
+
+    context = _get_context()
+    if context is None:
+        return None
+    with _traces_lock:
+        return _traces.get(id(context))
+
+
+def record_retry():
+    trace = current_trace()
+    if trace is not None:
+        trace.record_retry()
+
+
+def traced(fn):
+    """Wraps an operation so that its AWS API requests are traced, and a
+    summary of them is logged when it ends. If aws_config has
+    record_api_stats, the summary is also kept in the aws_api_stats
+    runtime property of the node instance, by operation name.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        context = _get_context()
+        key = id(context)
+        with _traces_lock:
+            if context is None or key in _traces:
+                trace = None
+            else:
+                trace = _traces[key] = OperationTrace()
+        if trace is None:
+            return fn(*args, **kwargs)
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with _traces_lock:
+                _traces.pop(key, None)
+            _report(trace, ctx.operation.name or fn.__name__)
+
+    return wrapper
+
+
+def _report(trace, operation_name):
+    summary = trace.summary()
+    for listener in listeners:
+        listener(operation_name, summary)
+    if not summary['calls']:
+        return
+    ctx.logger.info(OperationTrace.format_summary(operation_name, summary))
+
+    if ctx.type != constants.NODE_INSTANCE or \
+            not utils.get_aws_config().get('record_api_stats'):
+        return
+    stats = dict(ctx.instance.runtime_properties.get(
+        constants.API_STATS_PROPERTY) or {})
+    stats[operation_name] = summary
+    ctx.instance.runtime_properties[constants.API_STATS_PROPERTY] = stats
+
+
+def instrument(connection):
+    """Wraps the make_request method of a boto connection, that every
+    AWS API request goes through, so that the requests are counted in the
+    trace of the operation that makes them.
+    """
+
+    make_request = connection.make_request
+
+    def traced_make_request(action, *args, **kwargs):
+        trace = current_trace()
+        if trace is None:
+            return make_request(action, *args, **kwargs)
+
+        started = time.time()
+        response = error_code = None
+        try:
+            response = make_request(action, *args, **kwargs)
+            return response
+        except BotoServerError as e:
+            # Pooled connections raise 5xx responses instead of retrying.
+            error_code = e.error_code or str(e.status)
+            raise
+        finally:
+            size = None
+            if isinstance(response, HTTPResponse):
+                # boto caches the body, so it is not read twice.
+                body = response.read()
+                size = len(body)
+                if response.status >= 400:
+                    match = retry.ERROR_CODE_PATTERN.search(body)
+                    error_code = match.group(1) if match \
+                        else str(response.status)
+            elif response is None and error_code is None:
+                error_code = 'ConnectionError'
+            trace.record_request(action, time.time() - started,
+                                 size=size, error_code=error_code)
+
+    connection.make_request = traced_make_request
+    return connection
@@ -0,0 +1,107 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import bisect
+import os
+
+# Cloudify Imports
+from . import constants, utils
+from cloudify import ctx
+
+
+class TransitionHistogram(object):
+    """Counts how many transitions of a resource type took the seconds of
+    each of constants.TRANSITION_BUCKETS. The counts are halved whenever
+    they add up to TRANSITION_HISTORY_SIZE, so that the histogram follows
+    the recent transitions.
+    """
+
+    def __init__(self, counts=None):
+        size = len(constants.TRANSITION_BUCKETS)
+        self.counts = (list(counts or []) + [0] * size)[:size]
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def add(self, seconds):
+        index = min(bisect.bisect_left(constants.TRANSITION_BUCKETS, seconds),
+                    len(self.counts) - 1)
+        self.counts[index] += 1
+        if self.total >= constants.TRANSITION_HISTORY_SIZE:
+            self.counts = [count / 2.0 for count in self.counts]
+
+    def percentile(self, fraction):
+        """Returns the seconds within which the given fraction of the
+        transitions ended, or None if too few transitions were recorded.
+        """
+
+        total = self.total
+        if total < constants.TRANSITION_MIN_SAMPLES:
+            return None
+        seen = 0
+        for seconds, count in zip(constants.TRANSITION_BUCKETS, self.counts):
+            seen += count
+            if seen >= fraction * total:
+                return seconds
+        return constants.TRANSITION_BUCKETS[-1]
+
+
+class TransitionModel(object):
+    """Keeps the histograms of the transition times of every resource type
+    and operation in an account and region, in a file that the processes
+    on the host share.
+    """
+
+    def __init__(self, path):
+        self.state = utils.StateFile(path)
+
+    @classmethod
+    def from_aws_config(cls, aws_config):
+        """Returns the model of the account and region of aws_config, or
+        None if learning transition times is disabled.
+        """
+
+        aws_config = aws_config or {}
+        if not aws_config.get('learn_transition_times', True) or \
+                utils.fcntl is None:
+            return None
+
+        return cls(os.path.join(
+            utils.get_state_directory(constants.TRANSITION_DIR),
+            utils.get_account_scope(aws_config)))
+
+    @staticmethod
+    def _key(resource_type, operation_name):
+        return '{0}:{1}'.format(resource_type, operation_name)
+
+    def histogram(self, resource_type, operation_name):
+        counts = self.state.read().get(
+            self._key(resource_type, operation_name))
+        return TransitionHistogram(counts)
+
+    def record(self, resource_type, operation_name, seconds):
+
+        def add(document):
+            key = self._key(resource_type, operation_name)
+            histogram = TransitionHistogram(document.get(key))
+            histogram.add(seconds)
+            document[key] = histogram.counts
+
+        self.state.update(add)
+        ctx.logger.debug(
+            'AWS {0} {1} took {2:.1f} seconds.'
+            .format(resource_type, operation_name, seconds))
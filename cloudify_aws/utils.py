@@ -15,6 +15,16 @@
 
 # Built-in Imports
 import os
+import re
+import json
+import hashlib
+import tempfile
+import itertools
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Cloudify Imports
 from . import constants
@@ -22,6 +32,29 @@ from cloudify import ctx
 from cloudify.exceptions import NonRecoverableError
 
 
+# The ID_FORMAT regexes of the resource types in constants, compiled.
+ID_PATTERNS = dict(
+    (resource['ID_FORMAT'], re.compile(resource['ID_FORMAT']))
+    for resource in vars(constants).values()
+    if isinstance(resource, dict) and 'ID_FORMAT' in resource)
+
+
+def is_resource_id(value, id_format):
+    """Checks if value is a resource ID in the given format, so that
+    lookups can be routed by ID or by name, and malformed IDs can be
+    rejected without calling the API.
+
+    :param value: A resource ID or name.
+    :param id_format: The ID_FORMAT of the resource type, such as
+        constants.VPC['ID_FORMAT'].
+    """
+
+    if not isinstance(value, basestring):
+        return False
+    pattern = ID_PATTERNS.get(id_format) or re.compile(id_format)
+    return bool(pattern.match(value))
+
+
 def validate_node_property(key, ctx_node_properties):
     """Checks if the node property exists in the blueprint.
 
@@ -34,17 +67,73 @@ def validate_node_property(key, ctx_node_properties):
 
 
 def log_available_resources(list_of_resources):
-    """This logs a list of available resources.
+    """This logs the first diagnostics_max_results of the available
+    resources. list_of_resources may be a generator, in which case
+    nothing beyond the limit is fetched.
     """
 
-    message = 'Available resources: \n'
+    max_results = get_diagnostics_max_results()
+    if not max_results:
+        return
+
+    resources = [str(resource) for resource in
+                 itertools.islice(list_of_resources, max_results + 1)]
 
-    for resource in list_of_resources:
-        message = '{0}{1}\n'.format(message, resource)
+    message = 'Available resources: \n{0}'.format(
+        '\n'.join(resources[:max_results]))
+    if len(resources) > max_results:
+        message = '{0}\n(only the first {1} are listed)'.format(
+            message, max_results)
 
     ctx.logger.debug(message)
 
 
+def get_diagnostics_max_results():
+    return int(get_aws_config().get(
+        'diagnostics_max_results', constants.DIAGNOSTICS_MAX_RESULTS))
+
+
+def get_diagnostics_filters(vpc_id=None):
+    """Returns the filters that limit a diagnostics listing to the
+    resources of this deployment.
+    """
+
+    filters = {'tag:deployment_id': ctx.deployment.id}
+    if vpc_id:
+        filters['vpc-id'] = vpc_id
+    return filters
+
+
+def list_available_resources(list_function, filters=None, paginated=True):
+    """Yields the resources a describe function returns, one page at a
+    time, so that a caller that stops iterating stops the listing.
+
+    :param list_function: A boto describe function.
+    :param filters: The filters to pass to list_function.
+    :param paginated: Whether list_function takes max_results and
+        next_token.
+    """
+
+    if not paginated:
+        for resource in list_function(filters=filters):
+            yield resource
+        return
+
+    low, high = constants.DIAGNOSTICS_PAGE_SIZE_RANGE
+    page_size = max(low, min(high, get_diagnostics_max_results() + 1))
+    next_token = None
+
+    while True:
+        page = list_function(filters=filters,
+                             max_results=page_size,
+                             next_token=next_token)
+        for resource in page:
+            yield resource
+        next_token = getattr(page, 'next_token', None)
+        if not next_token:
+            return
+
+
 def get_external_resource_id_or_raise(operation, ctx_instance):
     """Checks if the EXTERNAL_RESOURCE_ID runtime_property is set and
     returns it.
@@ -181,6 +270,115 @@ def get_instance_or_source_node_properties():
                         constants.NODE_INSTANCE))
 
 
+def get_aws_config():
+    """Returns the aws_config property of the node, or of the source node
+    in a relationship operation.
+    """
+
+    node_properties = get_instance_or_source_node_properties()
+    return node_properties.get(constants.AWS_CONFIG_PROPERTY) or {}
+
+
+def get_account_scope(aws_config):
+    """Returns a short hash of the access key and region in aws_config,
+    for naming state that is shared by operations against the same
+    account and region.
+    """
+
+    return hashlib.sha1(repr((
+        aws_config.get('aws_access_key_id'),
+        aws_config.get('ec2_region_name') or
+        aws_config.get('elb_region_name')))).hexdigest()[:16]
+
+
+def ensure_directory(path):
+    """Creates the directory at path if it does not exist yet, even if
+    another process creates it at the same time.
+
+    :returns path.
+    """
+
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+    return path
+
+
+def get_state_directory(name):
+    """Returns the directory with the given name under the temp directory,
+    for state that is shared by the processes on the host.
+    """
+
+    return ensure_directory(os.path.join(tempfile.gettempdir(), name))
+
+
+class StateFile(object):
+    """A JSON document in a file that processes on the same host update
+    under an exclusive lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        """Returns the document, or an empty one if there is none yet.
+        """
+
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except OSError:
+            return {}
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            return self._load(fd)
+        finally:
+            os.close(fd)
+
+    def update(self, fn):
+        """Calls fn with the document while holding the lock, and saves
+        the document if fn returns without raising.
+
+        :returns the output of fn.
+        """
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            document = self._load(fd)
+            output = fn(document)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, json.dumps(document))
+        finally:
+            os.close(fd)
+        return output
+
+    @staticmethod
+    def _load(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        content = ''
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            content += chunk
+        try:
+            return json.loads(content)
+        except ValueError:
+            return {}
+
+
+def get_api_name(fn):
+    return getattr(fn, '__name__', None) or repr(fn)
+
+
+def is_describe_call(fn):
+    return get_api_name(fn).startswith(constants.DESCRIBE_API_PREFIXES)
+
+
 def get_single_connected_node_by_type(
         passed_ctx, type_name, if_exists=False):
     nodes = get_connected_nodes_by_type(passed_ctx, type_name)
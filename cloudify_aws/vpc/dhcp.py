@@ -17,7 +17,7 @@
 from cloudify_aws import constants, connection, utils
 from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 
 
 @operation
@@ -96,6 +96,7 @@ class DhcpOptions(AwsBaseNode):
             resource_states=constants.DHCP_OPTIONS['STATES']
         )
         self.not_found_error = constants.DHCP_OPTIONS['NOT_FOUND_ERROR']
+        self.id_format = constants.DHCP_OPTIONS['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_dhcp_options,
             'argument':
@@ -17,7 +17,7 @@
 from cloudify_aws import constants, utils, connection
 from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 
 
 @operation
@@ -127,11 +127,13 @@ class VpnConnection(AwsBaseRelationship):
         if 'routes' not in ctx.source.instance.runtime_properties.keys():
             ctx.source.instance.runtime_properties['routes'] = []
         if self.routes:
-            for route in self.routes:
-                args = self.generate_route_args(vpn_connection.id, route)
-                self.execute(self.client.create_vpn_connection_route,
-                             args, raise_on_falsy=True)
-                ctx.source.instance.runtime_properties['routes'].append(route)
+            self.execute_many(
+                self.client.create_vpn_connection_route,
+                [self.generate_route_args(vpn_connection.id, route)
+                 for route in self.routes],
+                raise_on_falsy=True)
+            ctx.source.instance.runtime_properties['routes'].extend(
+                self.routes)
         return True
 
     def generate_associate_args(self, routes):
@@ -153,13 +155,14 @@ class VpnConnection(AwsBaseRelationship):
 
     def disassociate(self, args):
         if self.routes:
-            for route in self.routes:
-                args = self.generate_route_args(self.vpn_connection_id, route)
-                if self.execute(
-                        self.client.delete_vpn_connection_route,
-                        args, raise_on_falsy=True):
-                    ctx.source.instance.runtime_properties['routes'].remove(
-                        route)
+            routes = list(self.routes)
+            self.execute_many(
+                self.client.delete_vpn_connection_route,
+                [self.generate_route_args(self.vpn_connection_id, route)
+                 for route in routes],
+                raise_on_falsy=True)
+            for route in routes:
+                ctx.source.instance.runtime_properties['routes'].remove(route)
         disassociate_args = dict(vpn_connection_id=self.vpn_connection_id)
         disassociate_args = utils.update_args(disassociate_args, args)
         return self.execute(self.client.delete_vpn_connection,
@@ -244,6 +247,7 @@ class InternetGateway(AwsBaseNode):
             resource_states=constants.INTERNET_GATEWAY['STATES']
         )
         self.not_found_error = constants.INTERNET_GATEWAY['NOT_FOUND_ERROR']
+        self.id_format = constants.INTERNET_GATEWAY['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_internet_gateways,
             'argument':
@@ -276,6 +280,7 @@ class VpnGateway(AwsBaseNode):
             resource_states=constants.VPN_GATEWAY['STATES']
         )
         self.not_found_error = constants.VPN_GATEWAY['NOT_FOUND_ERROR']
+        self.id_format = constants.VPN_GATEWAY['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_vpn_gateways,
             'argument':
@@ -313,6 +318,7 @@ class CustomerGateway(AwsBaseNode):
             resource_states=constants.CUSTOMER_GATEWAY['STATES']
         )
         self.not_found_error = constants.CUSTOMER_GATEWAY['NOT_FOUND_ERROR']
+        self.id_format = constants.CUSTOMER_GATEWAY['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_customer_gateways,
             'argument':
@@ -13,11 +13,14 @@
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
 
+# Built-in Imports
+import itertools
+
 # Cloudify imports
-from cloudify_aws import constants, utils, connection
+from cloudify_aws import constants, utils, connection, compaction
 from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify.exceptions import NonRecoverableError
 
 
@@ -110,6 +113,7 @@ class NetworkAcl(AwsBaseNode):
             resource_states=constants.NETWORK_ACL['STATES']
         )
         self.not_found_error = constants.NETWORK_ACL['NOT_FOUND_ERROR']
+        self.id_format = constants.NETWORK_ACL['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_network_acls,
             'argument':
@@ -154,9 +158,52 @@ class NetworkAcl(AwsBaseNode):
             'adding network acl entries to network acl {0}'
             .format(self.resource_id))
 
-        for acl_network_entry in ctx.node.properties['acl_network_entries']:
+        acl_network_entries = ctx.node.properties['acl_network_entries']
+        if ctx.node.properties.get('compact_rules'):
+            acl_network_entries = \
+                self.compact_network_acl_entries(acl_network_entries)
+
+        for acl_network_entry in acl_network_entries:
             acl_network_entry['network_acl_id'] = self.resource_id
-            self.create_network_acl_entry(acl_network_entry)
+        self.execute_many(self.create_network_acl_entry,
+                          [dict(args=acl_network_entry)
+                           for acl_network_entry in acl_network_entries])
+
+    @staticmethod
+    def compact_network_acl_entries(entries):
+        """Merges entries with contiguous ports or CIDRs without changing
+        which entry matches a packet first. Entries are only merged within
+        a run of entries of the same direction that are consecutive by
+        rule number and have the same rule action, and the compacted
+        entries take the lowest rule numbers of their run.
+        """
+
+        def entry_class(entry):
+            return (unicode(entry['protocol']).lower(),
+                    entry.get('icmp_type'),
+                    entry.get('icmp_code'))
+
+        compacted = []
+        for egress in (False, True):
+            direction_entries = sorted(
+                [entry for entry in entries
+                 if bool(entry.get('egress')) == egress],
+                key=lambda entry: int(entry['rule_number']))
+            for _, run in itertools.groupby(
+                    direction_entries,
+                    key=lambda entry: entry['rule_action'].lower()):
+                run = list(run)
+                compacted_run = compaction.compact(
+                    run, 'cidr_block', 'port_range_from', 'port_range_to',
+                    'protocol', entry_class)
+                for rule_number, entry in zip(
+                        [entry['rule_number'] for entry in run],
+                        compacted_run):
+                    compacted.append(dict(entry, rule_number=rule_number))
+
+        ctx.logger.info('Compacted {0} network acl entries into {1}.'
+                        .format(len(entries), len(compacted)))
+        return compacted
 
     def create_network_acl_entry(self, args):
         ctx.logger.info('create network acl entry {0}'.format(args))
@@ -17,7 +17,7 @@
 from cloudify_aws import constants, utils, connection
 from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship, RouteMixin
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify.exceptions import NonRecoverableError
 
 
@@ -160,6 +160,7 @@ class RouteTable(AwsBaseNode, RouteMixin):
             resource_states=constants.ROUTE_TABLE['STATES']
         )
         self.not_found_error = constants.ROUTE_TABLE['NOT_FOUND_ERROR']
+        self.id_format = constants.ROUTE_TABLE['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_route_tables,
             'argument':
@@ -177,8 +178,7 @@ class RouteTable(AwsBaseNode, RouteMixin):
             self.execute(self.client.create_route_table,
                          create_args, raise_on_falsy=True)
         self.resource_id = route_table.id
-        for route in self.routes:
-            self.create_route(route_table.id, route, ctx.instance)
+        self.create_many_routes(route_table.id, self.routes, ctx.instance)
         return True
 
     def _generate_creation_args(self):
@@ -215,13 +215,12 @@ class RouteTable(AwsBaseNode, RouteMixin):
         return True
 
     def delete(self, args):
-        for route in self.routes:
-            self.delete_route(
-                ctx.instance.runtime_properties.get(
-                    constants.EXTERNAL_RESOURCE_ID),
-                route,
-                route_table_ctx_instance=ctx.instance
-            )
+        self.delete_many_routes(
+            ctx.instance.runtime_properties.get(
+                constants.EXTERNAL_RESOURCE_ID),
+            self.routes,
+            route_table_ctx_instance=ctx.instance
+        )
         delete_args = dict(
             route_table_id=ctx.instance.runtime_properties.get(
                 constants.EXTERNAL_RESOURCE_ID
@@ -17,7 +17,7 @@
 from cloudify_aws import constants, connection, utils
 from cloudify_aws.base import AwsBaseNode
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify.exceptions import NonRecoverableError
 
 
@@ -51,6 +51,7 @@ class Subnet(AwsBaseNode):
             resource_states=constants.SUBNET['STATES']
         )
         self.not_found_error = constants.SUBNET['NOT_FOUND_ERROR']
+        self.id_format = constants.SUBNET['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_subnets,
             'argument': '{0}_ids'.format(constants.SUBNET['AWS_RESOURCE_TYPE'])
@@ -21,10 +21,11 @@ from moto import mock_ec2
 
 # Cloudify Imports
 from cloudify_aws import constants
-from cloudify_aws.vpc import vpc, subnet, routetable, dhcp
+from cloudify_aws.vpc import vpc, subnet, routetable, dhcp, gateway
 from vpc_testcase import VpcTestCase
 from cloudify.state import current_ctx
 from cloudify.exceptions import NonRecoverableError
+from cloudify.mocks import MockCloudifyContext, MockContext
 
 VPC_TYPE = 'cloudify.aws.nodes.VPC'
 SUBNET_TYPE = 'cloudify.aws.nodes.Subnet'
@@ -289,3 +290,59 @@ class TestDhcpModule(VpcTestCase):
         error = self.assertRaises(
             NonRecoverableError, dhcp.delete_dhcp_options, ctx=ctx)
         self.assertIn('returned False', error.message)
+
+
+class TestVpnConnection(VpcTestCase):
+
+    def get_mock_vpn_connection_context(self, test_name, routes=None):
+
+        def node_instance(properties, runtime_properties):
+            return MockContext({
+                'node': MockContext({'properties': dict(
+                    properties,
+                    aws_config={},
+                    use_external_resource=False,
+                    resource_id='')}),
+                'instance': MockContext({
+                    'runtime_properties': runtime_properties})
+            })
+
+        ctx = MockCloudifyContext(
+            node_id=test_name,
+            source=node_instance(
+                {'type': 'ipsec.1', 'bgp_asn': 65000},
+                {constants.EXTERNAL_RESOURCE_ID: 'cgw-abc1234',
+                 'vpn_connection': 'vpn-abc1234',
+                 'routes': routes or []}),
+            target=node_instance(
+                {}, {constants.EXTERNAL_RESOURCE_ID: 'vgw-abc1234'}))
+        current_ctx.set(ctx=ctx)
+        return ctx
+
+    @mock.patch('cloudify_aws.vpc.gateway.connection.VPCConnectionClient')
+    def test_vpn_connection_routes(self, mock_client):
+        """ Tests that the routes of a vpn connection are made
+            together and kept in the order they are given.
+        """
+
+        client = mock_client.return_value.client.return_value
+        client.create_vpn_connection.return_value = mock.Mock(
+            id='vpn-abc1234', vpn_gateway_id='vgw-abc1234')
+        routes = [{'destination_cidr_block': '10.0.{0}.0/24'.format(i)}
+                  for i in range(6)]
+        ctx = self.get_mock_vpn_connection_context(
+            'test_vpn_connection_routes')
+
+        gateway.VpnConnection(routes).associate(None)
+        self.assertEqual(
+            routes, ctx.source.instance.runtime_properties['routes'])
+        self.assertEqual(
+            sorted(route['destination_cidr_block'] for route in routes),
+            sorted(call[1]['destination_cidr_block'] for call in
+                   client.create_vpn_connection_route.call_args_list))
+
+        gateway.VpnConnection().disassociate(None)
+        self.assertEqual(
+            [], ctx.source.instance.runtime_properties['routes'])
+        self.assertEqual(
+            6, client.delete_vpn_connection_route.call_count)
@@ -20,7 +20,7 @@ from boto import exception
 from cloudify_aws import constants, connection, utils
 from cloudify_aws.base import AwsBaseNode, AwsBaseRelationship, RouteMixin
 from cloudify import ctx
-from cloudify.decorators import operation
+from cloudify_aws.decorators import operation
 from cloudify.exceptions import NonRecoverableError, RecoverableError
 
 
@@ -68,7 +68,7 @@ class VpcPeeringConnection(AwsBaseRelationship, RouteMixin):
 
     def __init__(self, target_account_id=None, routes=None, client=None):
         super(VpcPeeringConnection, self).__init__(
-            client=connection.VPCConnectionClient().client()
+            client=client or connection.VPCConnectionClient().client()
         )
         self.not_found_error = 'InvalidVpcPeeringConnectionId.NotFound'
         self.resource_id = None
@@ -85,21 +85,38 @@ class VpcPeeringConnection(AwsBaseRelationship, RouteMixin):
             ctx.source.instance.runtime_properties.get(
                 constants.EXTERNAL_RESOURCE_ID
             )
-        self.source_vpc_peering_connection_id = \
-            self.get_vpc_peering_connection_id(
-                ctx.source.instance,
-                self.source_vpc_id,
-                'vpc_id')
-        self.target_vpc_peering_connection_id = \
-            self.get_vpc_peering_connection_id(
-                ctx.target.instance,
-                self.target_vpc_id,
-                'vpc_peer_id')
         self.source_get_all_handler = {
             'function': self.client.get_all_route_tables,
             'argument':
             '{0}_ids'.format(constants.ROUTE_TABLE['AWS_RESOURCE_TYPE'])
         }
+        self._vpc_peering_connection_ids = {}
+
+    @property
+    def source_vpc_peering_connection_id(self):
+        return self._get_cached_vpc_peering_connection_id(
+            ctx.source.instance,
+            self.source_vpc_id,
+            'vpc_id')
+
+    @property
+    def target_vpc_peering_connection_id(self):
+        return self._get_cached_vpc_peering_connection_id(
+            ctx.target.instance,
+            self.target_vpc_id,
+            'vpc_peer_id')
+
+    def _get_cached_vpc_peering_connection_id(self, ctx_instance,
+                                              vpc_id, property_name):
+        """Looks up a peering connection id in the runtime properties
+        only once, until post_associate adds a peering connection to them.
+        """
+
+        if property_name not in self._vpc_peering_connection_ids:
+            self._vpc_peering_connection_ids[property_name] = \
+                self.get_vpc_peering_connection_id(
+                    ctx_instance, vpc_id, property_name)
+        return self._vpc_peering_connection_ids[property_name]
 
     def associate_helper(self, args):
         if self.use_source_external_resource_naively():
@@ -129,8 +146,8 @@ class VpcPeeringConnection(AwsBaseRelationship, RouteMixin):
                 route_table_id=self.source_route_table_id,
                 vpc_peering_connection_id=self.resource_id
             )
-            self.create_route(self.source_route_table_id, route,
-                              route_table_ctx_instance=ctx.source.instance)
+        self.create_many_routes(self.source_route_table_id, self.routes,
+                                route_table_ctx_instance=ctx.source.instance)
 
         return True
 
@@ -172,18 +189,20 @@ class VpcPeeringConnection(AwsBaseRelationship, RouteMixin):
                 'vpc_peering_connections'] = []
         ctx.target.instance.runtime_properties[
             'vpc_peering_connections'].append(cx)
+        self._vpc_peering_connection_ids.clear()
         return True
 
     def delete_routes(self):
         vpc_peering_connections = \
             ctx.source.instance.runtime_properties \
             .get('vpc_peering_connections')
+        routes = []
         for vpc_peering_connection in vpc_peering_connections:
             ctx.logger.info('{0}'.format(vpc_peering_connection))
-            for route in vpc_peering_connection['routes']:
-                self.delete_route(
-                    self.source_route_table_id, route,
-                    route_table_ctx_instance=ctx.source.instance)
+            routes += vpc_peering_connection['routes']
+        self.delete_many_routes(
+            self.source_route_table_id, routes,
+            route_table_ctx_instance=ctx.source.instance)
 
     def get_vpc_peering_connection_id(self, ctx_instance,
                                       vpc_id, property_name):
@@ -203,6 +222,8 @@ class VpcPeeringConnection(AwsBaseRelationship, RouteMixin):
 
     def accept_vpc_peering_connection(self, args):
 
+        self.invalidate_describe_cache()
+
         try:
             output = self.client.accept_vpc_peering_connection(
                 self.target_vpc_peering_connection_id)
@@ -228,9 +249,9 @@ class VpcPeeringConnection(AwsBaseRelationship, RouteMixin):
 
         source_vpc_cidr_block = ''
 
-        vpcs = self.execute(self.client.get_all_vpcs)
-        for vpc in vpcs:
-            if vpc.id == self.source_vpc_id:
+        if self.source_vpc_id:
+            for vpc in self.query(self.client.get_all_vpcs,
+                                  {'vpc-id': self.source_vpc_id}):
                 source_vpc_cidr_block = vpc.cidr_block
 
         new_route = dict(
@@ -238,17 +259,15 @@ class VpcPeeringConnection(AwsBaseRelationship, RouteMixin):
             vpc_peering_connection_id=self.source_vpc_peering_connection_id
         )
 
-        route_tables = self.execute(self.client.get_all_route_tables)
-        for route_table in route_tables:
-            if route_table.vpc_id == self.target_vpc_id:
-                route_created = self.create_route(
-                    route_table_id=route_table.id,
-                    route=new_route
-                )
-                if not route_created:
-                    return False
+        route_tables = self.query(
+            self.client.get_all_route_tables,
+            {'vpc-id': self.target_vpc_id}) if self.target_vpc_id else []
+        routes_created = self.execute_many(
+            self.create_route,
+            [dict(route_table_id=route_table.id, route=new_route)
+             for route_table in route_tables])
 
-        return True
+        return all(routes_created)
 
 
 class Vpc(AwsBaseNode):
@@ -261,6 +280,7 @@ class Vpc(AwsBaseNode):
             resource_states=constants.VPC['STATES']
         )
         self.not_found_error = constants.VPC['NOT_FOUND_ERROR']
+        self.id_format = constants.VPC['ID_FORMAT']
         self.get_all_handler = {
             'function': self.client.get_all_vpcs,
             'argument': '{0}_ids'.format(constants.VPC['AWS_RESOURCE_TYPE'])
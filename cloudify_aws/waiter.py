@@ -0,0 +1,116 @@
+########
+# Copyright (c) 2015 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+# Built-in Imports
+import time
+
+# Cloudify Imports
+from . import constants
+
+
+class Waiter(object):
+    """Polls a resource that is changing state in the operation's own
+    process, doubling the delay after every poll, so that a resource that
+    gets to its state within seconds does not cost a retry of the whole
+    operation.
+
+    When a histogram of the resource's transition times is given, the
+    first poll waits for the typical transition time, and the operation
+    is retried when the typical or the slow transition time is over.
+    Otherwise the operation is retried after the delay that the next poll
+    would have waited.
+    """
+
+    def __init__(self,
+                 window=constants.WAIT_WINDOW,
+                 initial_delay=constants.WAIT_INITIAL_DELAY,
+                 max_delay=constants.WAIT_MAX_DELAY,
+                 typical=None,
+                 slow=None,
+                 started=None):
+        """
+        :param typical: The seconds that the transition usually takes.
+        :param slow: The seconds that slow transitions take.
+        :param started: The time at which the transition was requested.
+        """
+
+        self.window = float(window)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.typical = typical
+        self.slow = slow
+        self.started = started
+        self.next_delay = initial_delay
+
+    @classmethod
+    def from_aws_config(cls, aws_config, histogram=None, started=None):
+        window = (aws_config or {}).get('wait_window', constants.WAIT_WINDOW)
+        if histogram is None:
+            return cls(window=window, started=started)
+        return cls(
+            window=window,
+            typical=histogram.percentile(
+                constants.TRANSITION_TYPICAL_PERCENTILE),
+            slow=histogram.percentile(constants.TRANSITION_SLOW_PERCENTILE),
+            started=started)
+
+    def polls(self):
+        """Yields the number of the poll, first right away and then after
+        each delay, until the window is over. When the transition times
+        are known, a delay that does not fit in the rest of the window is
+        left to the retry, so a resource that typically takes longer than
+        the window is only polled once.
+        """
+
+        deadline = time.time() + self.window
+        self.next_delay = max(self.initial_delay,
+                              self._remaining(self.typical) or 0)
+        poll = 0
+        yield poll
+
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or \
+                    (self.typical and self.next_delay > remaining):
+                return
+            time.sleep(min(self.next_delay, remaining))
+            self.next_delay = min(self.max_delay, self.next_delay * 2)
+            poll += 1
+            yield poll
+
+    def _remaining(self, seconds):
+        """Returns the seconds left until the transition has taken the
+        given seconds, or None if they are not known.
+        """
+
+        if seconds is None:
+            return None
+        elapsed = time.time() - self.started if self.started else 0
+        return seconds - elapsed
+
+    @property
+    def retry_after(self):
+        """The seconds to wait before retrying the operation, or None to
+        use the retry interval of the workflow when waiting is disabled
+        and no transition times are known.
+        """
+
+        for seconds in (self.typical, self.slow):
+            remaining = self._remaining(seconds)
+            if remaining is not None and remaining > 0:
+                return max(self.initial_delay, remaining)
+        if self.typical is None and self.window <= 0:
+            return None
+        return self.next_delay